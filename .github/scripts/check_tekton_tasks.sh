@@ -14,16 +14,56 @@ fi
 
 echo ">>> Applying and validating Tekton Tasks"
 
+TASK_YAML_PATHS=()
 for TASK_DIR in "$@"; do
     TASK_NAME=$(basename "$(dirname "$TASK_DIR")")
     TASK_YAML_PATH="${TASK_DIR}/${TASK_NAME}.yaml"
 
     if [ -f "$TASK_YAML_PATH" ]; then
         echo ">>> Validating Task: $TASK_YAML_PATH"
-        kubectl apply -f "$TASK_YAML_PATH" --dry-run=server
+        TASK_YAML_PATHS+=("$TASK_YAML_PATH")
     else
         echo "INFO: Task YAML not found at '$TASK_YAML_PATH'. A non-YAML file was changed, skipping..."
     fi
 done
 
-echo ">>> All changed tasks validated successfully."
+if [ "${#TASK_YAML_PATHS[@]}" -eq 0 ]; then
+    echo ">>> All changed tasks validated successfully."
+    exit 0
+fi
+
+# Validate all the tasks with one kubectl process, rather than one per task. kubectl reads
+# the files into one stream of documents, validates each document with the server and
+# reports all the errors at the end. The errors name the files the documents came from.
+FILE_ARGS=()
+for TASK_YAML_PATH in "${TASK_YAML_PATHS[@]}"; do
+    FILE_ARGS+=(-f "$TASK_YAML_PATH")
+done
+
+ERRORS_FILE=$(mktemp)
+trap 'rm -f "$ERRORS_FILE"' EXIT
+
+if kubectl apply --dry-run=server "${FILE_ARGS[@]}" 2>"$ERRORS_FILE"; then
+    echo ">>> All changed tasks validated successfully."
+    exit 0
+fi
+
+# Map the errors back to the task files, e.g.
+#   Error from server (BadRequest): error when creating "task/hello/0.1/hello.yaml": ...
+#   error: error parsing task/hello/0.1/hello.yaml: ...
+while IFS= read -r LINE; do
+    echo "$LINE" >&2
+    if [ "${GITHUB_ACTIONS:-}" != "true" ]; then
+        continue
+    fi
+    for TASK_YAML_PATH in "${TASK_YAML_PATHS[@]}"; do
+        if [[ "$LINE" == *"\"${TASK_YAML_PATH}\""* || "$LINE" == *" ${TASK_YAML_PATH}: "* ]]; then
+            MSG=${LINE//'%'/'%25'}
+            echo "::error file=${TASK_YAML_PATH},line=1,col=0::${MSG}"
+            break
+        fi
+    done
+done <"$ERRORS_FILE"
+
+echo ">>> Validation of the changed tasks failed."
+exit 1
@@ -0,0 +1,471 @@
+#!/usr/bin/env python
+"""Script for running the task tests in a Kubernetes cluster with Tekton."""
+
+# <TEMPLATED FILE!>
+# This file comes from the templates at https://github.com/konflux-ci/task-repo-shared-ci.
+# Please consider sending a PR upstream instead of editing the file directly.
+# See the SHARED-CI.md document in this repo for more details.
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, TextIO
+
+WORKSPACE_TEMPLATE = Path(__file__).resolve().parent.parent / "resources/workspace-template.yaml"
+
+ASSERT_TASK_FAILURE_ANNOTATION = "test/assert-task-failure"
+# How long to wait for a test pipeline to show up after applying it
+PIPELINE_CREATE_TIMEOUT = "60s"
+
+
+class TestError(Exception):
+    """A test (or the setup for the tests) failed."""
+
+
+class InvalidTestItem(Exception):
+    """A test item is not a task directory or a test file."""
+
+
+@dataclass
+class TaskTests:
+    """The tests of a task version, they run in a namespace of their own."""
+
+    task_dir: Path  # task/{name}/{version}
+    test_paths: list[Path]
+
+    @property
+    def name(self) -> str:
+        return self.task_dir.parts[1]
+
+    @property
+    def task_path(self) -> Path:
+        return self.task_dir / f"{self.name}.yaml"
+
+    @property
+    def tests_dir(self) -> Path:
+        return self.task_dir / "tests"
+
+    @property
+    def namespace(self) -> str:
+        version = self.task_dir.parts[2]
+        return f"{self.name}-{version.replace('.', '-')}"
+
+
+def collect_tests(items: list[str]) -> list[TaskTests]:
+    """Group the tests from the test items by task version.
+
+    The items are task directories including the version, or paths to test files.
+    """
+    for item in items:
+        is_test_file = Path(item).match("tests/test-*.yaml") and os.path.isfile(item)
+        if not is_test_file and not os.path.isdir(item):
+            raise InvalidTestItem(f"Invalid test yaml file or task directory: {item}")
+
+    tasks: dict[Path, TaskTests] = {}
+    for item in items:
+        task_dir = Path(*Path(item).parts[:3])
+        task = tasks.setdefault(task_dir, TaskTests(task_dir, []))
+        if not task.task_path.is_file():
+            raise InvalidTestItem(f"Task file does not exist: {task.task_path}")
+        if not task.tests_dir.is_dir():
+            raise InvalidTestItem(f"tests dir does not exist: {task.tests_dir}")
+        if len(task_dir.parts) < 3:
+            # The version is part of the namespace of the tests
+            raise InvalidTestItem(f"Task directory without a version: {item}")
+
+        if Path(item).match("tests/test-*.yaml"):
+            test_paths = [Path(item)]
+        else:
+            test_paths = sorted(task.tests_dir.glob("test-*.yaml"))
+            if not test_paths:
+                print(f"WARNING: No tests for test item {item} ... Skipping...")
+        task.test_paths.extend(path for path in test_paths if path not in task.test_paths)
+
+    return [task for task in tasks.values() if task.test_paths]
+
+
+class Cluster:
+    """Runs the kubectl and tkn commands in a test namespace, writes their output to a log."""
+
+    def __init__(self, kubectl: list[str], namespace: str, log: TextIO) -> None:
+        self.kubectl_cmd = kubectl
+        self.namespace = namespace
+        self.log = log
+
+    def run(self, cmd: list[str]) -> str:
+        """Run the command, return its stdout. Its stderr goes to the log."""
+        self.log.flush()
+        try:
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=self.log, text=True)
+        except OSError as e:
+            raise TestError(f"cannot run {cmd[0]}: {e}") from e
+        if proc.returncode != 0:
+            self.log.write(proc.stdout)
+            raise TestError(f"command failed: {shlex.join(cmd)}")
+        return proc.stdout
+
+    def kubectl(self, *args: str) -> str:
+        return self.run([*self.kubectl_cmd, "-n", self.namespace, *args])
+
+    def tkn(self, *args: str) -> str:
+        return self.run(["tkn", *args, "-n", self.namespace])
+
+    def get_json(self, *args: str) -> Any:
+        output = self.kubectl(*args, "-o", "json")
+        try:
+            return json.loads(output)
+        except json.JSONDecodeError as e:
+            raise TestError(f"unexpected output of kubectl {' '.join(args)}: {e}") from e
+
+    def exists(self, *args: str) -> bool:
+        proc = subprocess.run(
+            [*self.kubectl_cmd, "-n", self.namespace, "get", *args],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        return proc.returncode == 0
+
+    def wait_for_create(self, kind: str, name: str, timeout: str) -> None:
+        """Watch the resources of the kind until the named one exists, or the timeout.
+
+        Works with any kubectl version, 'kubectl wait --for=create' needs kubectl >= 1.31.
+        """
+        cmd = [
+            *self.kubectl_cmd,
+            "-n",
+            self.namespace,
+            "get",
+            kind,
+            "--field-selector",
+            f"metadata.name={name}",
+            "--watch",
+            "-o",
+            "name",
+            f"--request-timeout={timeout}",
+        ]
+        self.log.flush()
+        # The watch lists the existing resources first, then prints the ones that get created
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=self.log, text=True) as proc:
+            assert proc.stdout is not None
+            for line in proc.stdout:
+                if line.strip():
+                    proc.terminate()
+                    return
+        raise TestError(f"timed out waiting for {kind} {name} to be created")
+
+    def wait_for_pipelinerun(self, name: str, timeout: float) -> None:
+        """Watch the PipelineRun until its status is no longer Unknown, or the timeout."""
+        deadline = time.monotonic() + timeout
+        jsonpath = 'jsonpath={.status.conditions[0].status}{"\\n"}'
+        while (remaining := deadline - time.monotonic()) > 0:
+            # The watch prints the status whenever the PipelineRun changes
+            cmd = [
+                *self.kubectl_cmd,
+                "-n",
+                self.namespace,
+                "get",
+                "pipelinerun",
+                name,
+                "--watch",
+                "-o",
+                jsonpath,
+                f"--request-timeout={int(remaining) + 1}s",
+            ]
+            self.log.flush()
+            with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=self.log, text=True) as proc:
+                assert proc.stdout is not None
+                for line in proc.stdout:
+                    status = line.strip()
+                    if status in ("True", "False"):
+                        proc.terminate()
+                        return
+                    self.log.write(
+                        f"DEBUG: PipelineRun {name} is in progress (status {status or 'None'}). "
+                        "Waiting for update...\n"
+                    )
+            if proc.returncode != 0 and time.monotonic() < deadline:
+                raise TestError(f"failed to watch pipelinerun {name}")
+            # Otherwise, the watch just ended, start another one
+        raise TestError(f"timed out waiting for pipelinerun {name} to finish")
+
+
+def _condition_status(resource: dict[str, Any]) -> str | None:
+    conditions = resource.get("status", {}).get("conditions") or [{}]
+    return conditions[0].get("status")
+
+
+def setup_namespace(cluster: Cluster, task: TaskTests, task_copy: Path) -> None:
+    """Create the namespace, run the pre-apply hook and install the task."""
+    log = cluster.log
+    if not cluster.exists("namespace", cluster.namespace):
+        cluster.run([*cluster.kubectl_cmd, "create", "namespace", cluster.namespace])
+
+    hook = task.tests_dir / "pre-apply-task-hook.sh"
+    if hook.is_file():
+        log.write(f"Found pre-apply-task-hook.sh file in dir: {task.tests_dir}. Executing...\n")
+        log.write(cluster.run([str(hook), str(task_copy), cluster.namespace]))
+
+    # Create the service account appstudio-pipeline (konflux specific requirement)
+    if not cluster.exists("sa", "appstudio-pipeline"):
+        cluster.kubectl("create", "sa", "appstudio-pipeline")
+
+    # dry-run this YAML to validate and also get formatting side-effects.
+    log.write(cluster.kubectl("create", "-f", str(task_copy), "--dry-run=client", "-o", "yaml"))
+
+    log.write("INFO: Installing task\n")
+    log.write(cluster.kubectl("apply", "-f", str(task_copy)))
+
+
+@dataclass
+class TestResult:
+    test_path: str
+    namespace: str
+    passed: bool
+    message: str
+    log: str
+    pipelinerun: str | None = None
+
+
+def _find_pipeline(applied: dict[str, Any], test_path: Path) -> dict[str, Any]:
+    """Find the Pipeline in the output of 'kubectl apply -o json' for a test file.
+
+    For a file with several documents, kubectl outputs a List of the applied resources.
+    """
+    resources = applied.get("items", []) if applied.get("kind") == "List" else [applied]
+    pipelines = [resource for resource in resources if resource.get("kind") == "Pipeline"]
+    if len(pipelines) != 1:
+        raise TestError(f"expected one Pipeline in {test_path}, found {len(pipelines)}")
+    return pipelines[0]
+
+
+def _error_message(error: Exception, log: TextIO) -> str:
+    """Make the result message for an error, log the traceback if the error is unexpected."""
+    if isinstance(error, TestError):
+        return str(error)
+    log.write("".join(traceback.format_exception(error)))
+    return f"unexpected error: {error!r}"
+
+
+def run_test(cluster: Cluster, test_path: Path, timeout: float) -> tuple[bool, str, str | None]:
+    """Run the test pipeline, check the result. Return (passed, message, pipelinerun name)."""
+    log = cluster.log
+    log.write(f"========== Starting Test Pipeline: {test_path} ==========\n")
+    log.write(f"INFO: Installing test pipeline: {test_path}\n")
+    pipeline = _find_pipeline(cluster.get_json("apply", "-f", str(test_path)), test_path)
+    test_name = pipeline["metadata"]["name"]
+    annotations = pipeline["metadata"].get("annotations") or {}
+    assert_task_failure = annotations.get(ASSERT_TASK_FAILURE_ANNOTATION)
+
+    # Sometimes the pipeline is not available immediately
+    cluster.wait_for_create("pipeline", test_name, PIPELINE_CREATE_TIMEOUT)
+
+    started = cluster.tkn(
+        "pipeline",
+        "start",
+        test_name,
+        "-w",
+        f"name=tests-workspace,volumeClaimTemplateFile={WORKSPACE_TEMPLATE}",
+        "-o",
+        "json",
+    )
+    try:
+        pipelinerun = json.loads(started)["metadata"]["name"]
+    except (json.JSONDecodeError, KeyError) as e:
+        raise TestError(f"unexpected output of tkn pipeline start: {started}") from e
+    log.write(f"INFO: Started pipelinerun: {pipelinerun}\n")
+
+    cluster.wait_for_pipelinerun(pipelinerun, timeout)
+    log.write(cluster.tkn("pipelinerun", "logs", pipelinerun))
+
+    pr = cluster.get_json("get", "pipelinerun", pipelinerun)
+    succeeded = _condition_status(pr) == "True"
+
+    if not assert_task_failure:
+        if succeeded:
+            return True, f"Pipelinerun {test_name} succeeded", pipelinerun
+        return False, f"Pipelinerun {test_name} failed", pipelinerun
+
+    if succeeded:
+        return False, f"Pipeline {test_name} is succeeded but was expected to fail", pipelinerun
+
+    log.write(
+        f"DEBUG: Pipeline {test_name} failed (expected). "
+        f"Checking that it failed in task {assert_task_failure}...\n"
+    )
+    # Check that the pipelinerun failed on the tested task and not somewhere else
+    taskruns = [
+        ref["name"]
+        for ref in pr.get("status", {}).get("childReferences", [])
+        if ref.get("pipelineTaskName") == assert_task_failure
+    ]
+    if not taskruns:
+        return (
+            False,
+            f"Unable to find task {assert_task_failure} in childReferences of pipelinerun "
+            f"{pipelinerun}. Pipelinerun failed earlier?",
+            pipelinerun,
+        )
+    log.write(f"DEBUG: Found taskrun {taskruns[0]}\n")
+
+    tr = cluster.get_json("get", "taskrun", taskruns[0])
+    if _condition_status(tr) != "False":
+        return False, "Taskrun did not fail - pipelinerun failed later on?", pipelinerun
+    return True, "Taskrun failed as expected", pipelinerun
+
+
+def run_task_tests(
+    task: TaskTests, kubectl: list[str], logs_dir: Path, timeout: float
+) -> list[TestResult]:
+    """Set up the namespace for the task version, then run its tests one by one."""
+    ns_logs_dir = logs_dir / task.namespace
+    ns_logs_dir.mkdir(parents=True, exist_ok=True)
+    # Use a copy of the task file to prevent modifying the original task file
+    task_copy = ns_logs_dir / task.task_path.name
+
+    # Any error fails the tests of this task version, the other task versions keep going
+    setup_log = ns_logs_dir / "setup.log"
+    with setup_log.open("w") as log:
+        log.write(f"Test item: {task.task_dir}\n")
+        try:
+            shutil.copyfile(task.task_path, task_copy)
+            setup_namespace(Cluster(kubectl, task.namespace, log), task, task_copy)
+        except Exception as e:
+            message = f"setup failed: {_error_message(e, log)}"
+            log.write(f"ERROR: {message}\n")
+            return [
+                TestResult(str(path), task.namespace, False, message, str(setup_log))
+                for path in task.test_paths
+            ]
+
+    results = []
+    for test_path in task.test_paths:
+        test_log = ns_logs_dir / f"{test_path.stem}.log"
+        with test_log.open("w") as log:
+            pipelinerun = None
+            try:
+                passed, message, pipelinerun = run_test(
+                    Cluster(kubectl, task.namespace, log), test_path, timeout
+                )
+            except Exception as e:
+                passed, message = False, _error_message(e, log)
+            log.write(f"{'INFO' if passed else 'ERROR'}: {message}\n")
+            log.write(f"========== Completed: {test_path} ==========\n")
+        results.append(
+            TestResult(str(test_path), task.namespace, passed, message, str(test_log), pipelinerun)
+        )
+    return results
+
+
+def run_tests(
+    items: list[str], jobs: int | None = None, timeout: float = 3600, logs_dir: Path | None = None
+) -> int:
+    """Run the tests of different task versions in parallel. Return 1 if any of them failed."""
+    try:
+        tasks = collect_tests(items)
+    except InvalidTestItem as e:
+        print(f"ERROR: {e}")
+        return 1
+
+    kubectl = shlex.split(os.getenv("KUBECTL_CMD") or "kubectl")
+    if logs_dir is None:
+        logs_dir = Path(tempfile.mkdtemp(prefix="task-tests-"))
+    logs_dir.mkdir(parents=True, exist_ok=True)
+
+    results: list[TestResult] = []
+    # One task version per worker, which runs the tests of that version one by one
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        futures = [
+            executor.submit(run_task_tests, task, kubectl, logs_dir, timeout) for task in tasks
+        ]
+        # Show the logs of each task version as a whole, as soon as its tests are done
+        for future in as_completed(futures):
+            task_results = future.result()
+            # The setup log first, unless the setup failed and it's the log of all the tests
+            setup_log = str(Path(task_results[0].log).with_name("setup.log"))
+            for log_path in dict.fromkeys([setup_log, *(result.log for result in task_results)]):
+                print(Path(log_path).read_text(), end="", flush=True)
+            results.extend(task_results)
+
+    results.sort(key=lambda result: result.test_path)
+    (logs_dir / "results.json").write_text(json.dumps([asdict(r) for r in results], indent=2))
+
+    print("========== Summary ==========")
+    for result in results:
+        print(f"{'PASSED' if result.passed else 'FAILED'}: {result.test_path}: {result.message}")
+    print(f"INFO: Logs and results of the tests are in {logs_dir}")
+
+    return 0 if all(result.passed for result in results) else 1
+
+
+# Same as positive_int in hack/cli_args.py, which is not on the import path of this script
+def _positive_int(value: str) -> int:
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer: {value}")
+    return n
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Run the task tests: the test-*.yaml pipelines in the tests/ directories of the "
+            "tasks. Each task version gets a namespace of its own, the different task versions "
+            "get tested in parallel."
+        ),
+        epilog=(
+            "Requires a connection to a cluster with Tekton (and Konflux) installed and tkn. "
+            "Set KUBECTL_CMD to use a custom kubectl command."
+        ),
+    )
+    parser.add_argument(
+        "items",
+        nargs="*",
+        help=(
+            "Task directories including the version (e.g. task/git-clone/0.1) or paths to "
+            "test files (default: $TEST_ITEMS)"
+        ),
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=_positive_int,
+        default=None,
+        help="Number of task versions to test in parallel (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=_positive_int,
+        default=3600,
+        help="Seconds to wait for a test pipelinerun to finish (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--logs-dir",
+        type=Path,
+        default=None,
+        help=(
+            "Directory for the logs of the tests ({namespace}/{test}.log) and the results "
+            "(results.json). Default: a new temporary directory"
+        ),
+    )
+    args = parser.parse_args()
+
+    items = args.items or os.getenv("TEST_ITEMS", "").split()
+    if not items:
+        parser.error("no task directories or test files")
+    return run_tests(items, args.jobs, args.timeout, args.logs_dir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,401 @@
+#!/usr/bin/env python
+"""Script for building the manifests of kustomized tasks."""
+
+# <TEMPLATED FILE!>
+# This file comes from the templates at https://github.com/konflux-ci/task-repo-shared-ci.
+# Please consider sending a PR upstream instead of editing the file directly.
+# See the SHARED-CI.md document in this repo for more details.
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Literal
+
+from cli_args import positive_int
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+WARNING_MESSAGE = "# WARNING: This is an auto generated file, do not modify this file directly"
+KUSTOMIZATION_FILENAMES = ("kustomization.yaml", "kustomization.yml", "Kustomization")
+
+# Kustomization fields that list local files or directories
+_PATH_LIST_FIELDS = frozenset(
+    {
+        "resources",
+        "components",
+        "bases",
+        "crds",
+        "configurations",
+        "generators",
+        "transformers",
+        "validators",
+        "patchesStrategicMerge",
+    }
+)
+# Fields of the nested objects (patches, replacements, generators, helm charts, ...) that
+# name local files or directories
+_PATH_FIELDS = frozenset(
+    {"path", "files", "envs", "env", "chartHome", "valuesFile", "additionalValuesFiles"}
+)
+# A 'key: value' or '- key: value' line of YAML, the value may be empty
+_FIELD_RE = re.compile(r"""^(\s*)(-\s+)?["']?([\w.-]+)["']?\s*:(?:\s+(.*))?$""")
+_RESOURCES_RE = re.compile(r"^resources:\s*(?:\[(.*)\])?\s*(?:#.*)?$")
+_LIST_ITEM_RE = re.compile(r"""^\s*-\s+["']?([^"'#]*?)["']?\s*(?:\s#.*)?$""")
+
+
+class BuildError(Exception):
+    """Failed to build a task manifest."""
+
+
+@dataclass(frozen=True)
+class KustomizedTask:
+    """A task/{name}/{version}/ directory with a kustomization.yaml."""
+
+    name: str
+    version: str
+
+    @property
+    def directory(self) -> Path:
+        return Path("task", self.name, self.version)
+
+    @property
+    def kustomization(self) -> Path:
+        return self.directory / "kustomization.yaml"
+
+    @property
+    def manifest(self) -> Path:
+        return self.directory / f"{self.name}.yaml"
+
+    def __str__(self) -> str:
+        return f"{self.name}/{self.version}"
+
+
+def find_kustomized_tasks(task_dir: Path, skip_tasks: Iterable[str] = ()) -> list[KustomizedTask]:
+    """Find all the task/{name}/{version}/kustomization.yaml files, in one walk of the tree."""
+    skip_tasks = set(skip_tasks)
+    tasks = []
+    for name_entry in _scandir_sorted(task_dir):
+        if not name_entry.is_dir() or name_entry.name in skip_tasks:
+            continue
+        for version_entry in _scandir_sorted(name_entry.path):
+            if not version_entry.is_dir():
+                continue
+            if os.path.isfile(os.path.join(version_entry.path, "kustomization.yaml")):
+                tasks.append(KustomizedTask(name_entry.name, version_entry.name))
+    return tasks
+
+
+def _scandir_sorted(path: str | Path) -> list[os.DirEntry[str]]:
+    try:
+        with os.scandir(path) as entries:
+            return sorted(entries, key=lambda entry: entry.name)
+    except FileNotFoundError:
+        return []
+
+
+def read_resources(kustomization: Path) -> list[str] | None:
+    """Read the 'resources' list from a kustomization file. Return None if there isn't one."""
+    lines = kustomization.read_text().splitlines()
+    for i, line in enumerate(lines):
+        if m := _RESOURCES_RE.match(line):
+            break
+    else:
+        return None
+
+    if flow_items := m.group(1):
+        return [item.strip().strip("\"'") for item in flow_items.split(",") if item.strip()]
+
+    resources = []
+    for line in lines[i + 1 :]:
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        if not (m := _LIST_ITEM_RE.match(line)):
+            break
+        resources.append(m.group(1))
+    return resources
+
+
+def collect_inputs(kustomization_dir: Path, inputs: set[Path]) -> bool:
+    """Add all the local files that building the kustomization may read to 'inputs'.
+
+    Looks only at the fields that name files or directories (see read_path_values()). Skips
+    the paths that don't exist or point outside of the repo. Recurses into the directories
+    that have a kustomization file of their own.
+
+    Return False if some of the resources are not local files (e.g. remote URLs). Then the
+    inputs are not known and the build can't be skipped.
+    """
+    kustomization = _find_kustomization_file(kustomization_dir)
+    if kustomization is None:
+        # Kustomize will fail to build it, nothing to skip
+        return False
+    if kustomization in inputs:
+        return True
+    inputs.add(kustomization)
+
+    resources = read_resources(kustomization) or []
+    if not all((kustomization_dir / resource).exists() for resource in resources):
+        return False
+
+    for value in read_path_values(kustomization):
+        if os.path.isabs(value):
+            continue
+        path = kustomization_dir / value
+        if not path.exists() or not path.resolve().is_relative_to(REPO_ROOT):
+            continue
+        if path.is_file():
+            inputs.add(path)
+        elif _find_kustomization_file(path) is not None:
+            if not collect_inputs(path, inputs):
+                return False
+        else:
+            inputs.update(p for p in path.rglob("*") if p.is_file())
+
+    return True
+
+
+def read_path_values(kustomization: Path) -> list[str]:
+    """Read the values of the kustomization fields that name local files or directories.
+
+    Knows the fields from _PATH_LIST_FIELDS and _PATH_FIELDS, in block or flow style. Some
+    of the values may not be paths after all, e.g. inline patches or remote URLs.
+    """
+    values = []
+    top_field = field = None
+    for line in kustomization.read_text().splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        if m := _FIELD_RE.match(line):
+            indent, dash, field, value = m.groups()
+            if not indent and not dash:
+                top_field = field
+        elif m := _LIST_ITEM_RE.match(line):
+            # An item of the list that the last field holds
+            value = m.group(1)
+        else:
+            continue
+
+        if not value or not (
+            (field == top_field and top_field in _PATH_LIST_FIELDS) or field in _PATH_FIELDS
+        ):
+            continue
+        value = value.split(" #", 1)[0].strip()
+        if value.startswith("[") and value.endswith("]"):
+            items = value[1:-1].split(",")
+        else:
+            items = [value]
+        for item in items:
+            item = item.strip().strip("\"'")
+            if field == "files":
+                # configMapGenerator/secretGenerator files can be 'key=path'
+                item = item.partition("=")[2] or item
+            if item:
+                values.append(item)
+    return values
+
+
+def _find_kustomization_file(directory: Path) -> Path | None:
+    for filename in KUSTOMIZATION_FILENAMES:
+        if (path := directory / filename).is_file():
+            return path
+    return None
+
+
+def build_hash(task: KustomizedTask, tool_version: str) -> str | None:
+    """Hash everything that goes into the manifest of the task, and the manifest itself.
+
+    If the hash didn't change since the last build, building again would give the same result.
+    Return None if the inputs are not known.
+    """
+    inputs: set[Path] = set()
+    if not collect_inputs(task.directory, inputs):
+        return None
+
+    h = hashlib.sha256(tool_version.encode())
+    # The manifest is an output, but including it means manual edits trigger a rebuild
+    for path in sorted(inputs | {task.manifest}):
+        data = path.read_bytes() if path.is_file() else b""
+        h.update(b"\0%s\0%d\0" % (path.as_posix().encode(), len(data)))
+        h.update(data)
+    return h.hexdigest()
+
+
+def build_manifest(task: KustomizedTask) -> None:
+    """Build the manifest of the task with 'oc kustomize'."""
+    proc = subprocess.run(["oc", "kustomize", f"{task.directory}/"], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise BuildError(proc.stderr.strip())
+
+    content = f"{WARNING_MESSAGE}\n{proc.stdout}"
+    # Don't touch the manifest if it's the same, for the sake of tools that watch mtimes
+    if not task.manifest.is_file() or task.manifest.read_text() != content:
+        task.manifest.write_text(content)
+
+
+class BuildRecords:
+    """The hashes of the last builds of each task, stored in the .git directory.
+
+    See build_hash() for what the hash covers.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, path: Path | None, hashes: dict[str, str]) -> None:
+        self.path = path
+        self.hashes = hashes
+
+    @staticmethod
+    def default_path() -> Path | None:
+        proc = subprocess.run(
+            ["git", "rev-parse", "--git-path", "manifest-builds.json"],
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            # Not a git repo, don't record anything
+            return None
+        return Path(proc.stdout.strip())
+
+    @classmethod
+    def load(cls, path: Path | None) -> BuildRecords:
+        if path is None:
+            return cls(path, {})
+        try:
+            data = json.loads(path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls(path, {})
+        if data.get("format_version") != cls.FORMAT_VERSION:
+            return cls(path, {})
+        return cls(path, data["builds"])
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        data = {"format_version": self.FORMAT_VERSION, "builds": self.hashes}
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(data, indent=2, sort_keys=True))
+        tmp_path.replace(self.path)
+
+
+BuildStatus = Literal["built", "up-to-date", "not-kustomized", "failed"]
+
+
+@dataclass(frozen=True)
+class BuildResult:
+    task: KustomizedTask
+    status: BuildStatus
+    hash: str | None = None
+    error: str = ""
+
+
+def _build(task: KustomizedTask, tool_version: str, last_hash: str | None) -> BuildResult:
+    # A kustomization of just the task file itself, the task file is not generated
+    if read_resources(task.kustomization) == [task.manifest.name]:
+        return BuildResult(task, "not-kustomized")
+
+    hash_before = build_hash(task, tool_version)
+    if hash_before is not None and hash_before == last_hash:
+        return BuildResult(task, "up-to-date", hash_before)
+
+    try:
+        build_manifest(task)
+    except BuildError as e:
+        return BuildResult(task, "failed", error=str(e))
+
+    # The manifest may have changed, hash again
+    return BuildResult(task, "built", build_hash(task, tool_version))
+
+
+def _tool_version() -> str:
+    proc = subprocess.run(["oc", "version", "--client"], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise BuildError(f"'oc version --client' failed:\n{proc.stderr.strip()}")
+    return proc.stdout
+
+
+def build(
+    jobs: int | None = None, skip_tasks: list[str] | None = None, rebuild: bool = False
+) -> int:
+    """Build the manifests of all the kustomized tasks. Return 1 if any of the builds failed."""
+    os.chdir(REPO_ROOT)
+    tasks = find_kustomized_tasks(Path("task"), skip_tasks or ())
+    if not tasks:
+        return 0
+
+    try:
+        tool_version = _tool_version()
+    except (BuildError, FileNotFoundError) as e:
+        print(f"failed to get the oc version: {e}", file=sys.stderr)
+        return 1
+
+    records = BuildRecords.load(BuildRecords.default_path())
+    last_hashes = {} if rebuild else records.hashes
+
+    def build_one(task: KustomizedTask) -> BuildResult:
+        return _build(task, tool_version, last_hashes.get(str(task.directory)))
+
+    exitcode = 0
+    # One 'oc kustomize' process per task, the results come out in the order of the tasks
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        for result in executor.map(build_one, tasks):
+            match result.status:
+                case "built":
+                    print(f"Built task manifest for: {result.task}")
+                case "up-to-date":
+                    print(f"Task manifest is up to date: {result.task}")
+                case "not-kustomized":
+                    print(f"Skip generating manifest for the task: {result.task}")
+                case "failed":
+                    print(f"failed to build task: {result.task}\n{result.error}", file=sys.stderr)
+                    exitcode = 1
+
+            if result.hash is not None:
+                records.hashes[str(result.task.directory)] = result.hash
+            else:
+                records.hashes.pop(str(result.task.directory), None)
+
+    records.save()
+    return exitcode
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Build the task/{name}/{version}/{name}.yaml manifests of kustomized tasks. "
+            "Skips the tasks whose inputs didn't change since the last build."
+        )
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=positive_int,
+        default=None,
+        help="Number of manifests to build in parallel (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--skip",
+        dest="skip_tasks",
+        action="append",
+        default=[],
+        metavar="TASK_NAME",
+        help="Don't build the manifests of this task (can be repeated)",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Build all the manifests, even if their inputs didn't change",
+    )
+    args = parser.parse_args()
+    return build(**vars(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+"""Script for generating the Trusted Artifacts variants of tasks from their recipes."""
+
+# <TEMPLATED FILE!>
+# This file comes from the templates at https://github.com/konflux-ci/task-repo-shared-ci.
+# Please consider sending a PR upstream instead of editing the file directly.
+# See the SHARED-CI.md document in this repo for more details.
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+
+from cli_args import positive_int
+
+_BASE_RE = re.compile(r"""^base:\s*["']?([^"'\s#]+)""", re.MULTILINE)
+
+
+class GenerateError(Exception):
+    """Failed to generate a task from its recipe."""
+
+
+def run_git(*args: str) -> str:
+    proc = subprocess.run(["git", *args], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise GenerateError(f"git {args[0]} failed:\n{proc.stderr.strip()}")
+    return proc.stdout
+
+
+@dataclass(frozen=True, order=True)
+class Recipe:
+    """A task/{name}/**/recipe.yaml file and the task it generates (next to it)."""
+
+    path: Path
+
+    @property
+    def task_path(self) -> Path:
+        task_name = self.path.parent.parent.name
+        return self.path.parent / f"{task_name}.yaml"
+
+    def base_task_path(self) -> Path | None:
+        """The path to the base task that the recipe references, if any."""
+        if m := _BASE_RE.search(self.path.read_text()):
+            return self.path.parent / m.group(1)
+        return None
+
+
+def find_recipes(task_dir: Path) -> list[Recipe]:
+    """Find all the recipe.yaml files under the task directory, in one walk of the tree."""
+    return sorted(
+        Recipe(Path(dirpath, "recipe.yaml"))
+        for dirpath, _, filenames in os.walk(task_dir)
+        if "recipe.yaml" in filenames
+    )
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(1024 * 1024):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def recipe_hash(recipe: Recipe, generator_sha: str) -> str:
+    """Hash everything that goes into the generated task, and the generated task itself.
+
+    If the hash didn't change since the last generation, generating again would give the same
+    result. Covers the recipe, the base task and the generator binary. The generated task is an
+    output, but including it means manual edits trigger a re-generation.
+    """
+    h = hashlib.sha256(generator_sha.encode())
+    base_task_path = recipe.base_task_path()
+    for path in recipe.path, base_task_path, recipe.task_path:
+        data = path.read_bytes() if path is not None and path.is_file() else b""
+        h.update(b"\0%d\0" % len(data))
+        h.update(data)
+    return h.hexdigest()
+
+
+def generate_task(recipe: Recipe, generator: Path) -> None:
+    """Generate the task from the recipe with the trusted-artifacts generator."""
+    proc = subprocess.run(
+        [generator, recipe.path.resolve()], capture_output=True, text=True, cwd="task"
+    )
+    if proc.returncode != 0:
+        raise GenerateError(proc.stderr.strip())
+
+    content = proc.stdout.rstrip("\n") + "\n"
+    # Don't touch the task if it's the same, for the sake of tools that watch mtimes
+    if not recipe.task_path.is_file() or recipe.task_path.read_text() != content:
+        recipe.task_path.write_text(content)
+
+
+class GenerationRecords:
+    """The hashes of the last generations of each task, stored in the .git directory.
+
+    See recipe_hash() for what the hash covers.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, path: Path, hashes: dict[str, str]) -> None:
+        self.path = path
+        self.hashes = hashes
+
+    @staticmethod
+    def default_path() -> Path:
+        return Path(run_git("rev-parse", "--git-path", "ta-generations.json").strip())
+
+    @classmethod
+    def load(cls, path: Path) -> GenerationRecords:
+        try:
+            data = json.loads(path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls(path, {})
+        if data.get("format_version") != cls.FORMAT_VERSION:
+            return cls(path, {})
+        return cls(path, data["generations"])
+
+    def save(self) -> None:
+        data = {"format_version": self.FORMAT_VERSION, "generations": self.hashes}
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(data, indent=2, sort_keys=True))
+        tmp_path.replace(self.path)
+
+
+GenerateStatus = Literal["generated", "up-to-date", "failed"]
+
+
+@dataclass(frozen=True)
+class GenerateResult:
+    recipe: Recipe
+    status: GenerateStatus
+    hash: str | None = None
+    error: str = ""
+
+
+def _generate(
+    recipe: Recipe, generator: Path, generator_sha: str, last_hash: str | None
+) -> GenerateResult:
+    hash_before = recipe_hash(recipe, generator_sha)
+    if hash_before == last_hash:
+        return GenerateResult(recipe, "up-to-date", hash_before)
+
+    try:
+        generate_task(recipe, generator)
+    except GenerateError as e:
+        return GenerateResult(recipe, "failed", error=str(e))
+
+    # The task may have changed, hash again
+    return GenerateResult(recipe, "generated", recipe_hash(recipe, generator_sha))
+
+
+def emit(file: str, msg: str) -> None:
+    if os.getenv("GITHUB_ACTIONS") == "true":
+        print(f"::error file={file},line=1,col=0::{msg}")
+    else:
+        print(f"INFO: \033[1m{file}\033[0m {msg}")
+
+
+def generate(generator: Path, jobs: int | None = None, regenerate: bool = False) -> int:
+    """Generate all the Trusted Artifacts tasks, report the ones that changed compared to HEAD.
+
+    Return 1 if any of the generations failed, or if running in GitHub Actions and some of the
+    tasks are out of date.
+    """
+    generator = generator.resolve()
+    os.chdir(run_git("rev-parse", "--show-toplevel").strip())
+    recipes = find_recipes(Path("task"))
+    if not recipes:
+        return 0
+
+    generator_sha = file_sha256(generator)
+    records = GenerationRecords.load(GenerationRecords.default_path())
+    last_hashes = {} if regenerate else records.hashes
+
+    def generate_one(recipe: Recipe) -> GenerateResult:
+        return _generate(recipe, generator, generator_sha, last_hashes.get(str(recipe.task_path)))
+
+    exitcode = 0
+    # One generator process per recipe, the results come out in the order of the recipes
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        for result in executor.map(generate_one, recipes):
+            if result.status == "failed":
+                print(
+                    f"failed to generate {result.recipe.task_path} from {result.recipe.path}:\n"
+                    f"{result.error}",
+                    file=sys.stderr,
+                )
+                exitcode = 1
+
+            if result.hash is not None:
+                records.hashes[str(result.recipe.task_path)] = result.hash
+            else:
+                records.hashes.pop(str(result.recipe.task_path), None)
+
+    records.save()
+
+    # One diff for all the tasks, not one per task. Compares to HEAD, so this also reports the
+    # tasks that were generated by a previous run but not committed yet.
+    task_paths = [str(recipe.task_path) for recipe in recipes]
+    changed = run_git("diff", "--name-only", "HEAD", "--", *task_paths).splitlines()
+
+    in_github_actions = os.getenv("GITHUB_ACTIONS") == "true"
+    if in_github_actions:
+        msg = (
+            "File is out of date, run `hack/generate-ta-tasks.sh` "
+            "and include the updated file with your changes."
+        )
+    else:
+        msg = "File is out of date and has been updated"
+
+    for task_path in changed:
+        emit(task_path, msg)
+
+    if changed:
+        if in_github_actions:
+            print(
+                "::notice title=Apply the attached patch::"
+                "Download the attached `ta.patch` file and run `git apply ta.patch`"
+            )
+            patch = run_git("diff", "-u")
+            print(patch, end="")
+            Path("ta.patch").write_text(patch)
+            exitcode = 1
+        else:
+            print(
+                "INFO: \033[1mMake sure to include the regenerated files in your changeset\033[0m"
+            )
+
+    return exitcode
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Generate the Trusted Artifacts variants of tasks from their recipe.yaml files. "
+            "Skips the recipes whose inputs didn't change since the last generation."
+        )
+    )
+    parser.add_argument(
+        "--generator",
+        type=Path,
+        required=True,
+        help="Path to the trusted-artifacts generator binary",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=positive_int,
+        default=None,
+        help="Number of tasks to generate in parallel (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--regenerate",
+        action="store_true",
+        help="Generate all the tasks, even if their inputs didn't change",
+    )
+    args = parser.parse_args()
+    try:
+        return generate(**vars(args))
+    except GenerateError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+"""Script for checking that tasks which use workspaces have a Trusted Artifacts variant."""
+
+# <TEMPLATED FILE!>
+# This file comes from the templates at https://github.com/konflux-ci/task-repo-shared-ci.
+# Please consider sending a PR upstream instead of editing the file directly.
+# See the SHARED-CI.md document in this repo for more details.
+
+from __future__ import annotations
+
+import fnmatch
+import json
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from versioning import Version, VersionParseError
+
+IGNORE_FILES = (".github/.ta-ignore.yaml", ".ta-ignore.yaml")
+NON_TASK_FILES = frozenset({"kustomization.yaml", "recipe.yaml", "patch.yaml"})
+
+_KEY_RE = re.compile(r"""^( *)(-\s+)?["']?([\w.-]+)["']?\s*:(?:\s+(.*?))?\s*$""")
+_LIST_ITEM_RE = re.compile(r"""^( *)-\s+["']?([^"'#]*?)["']?\s*(?:\s#.*)?$""")
+
+
+def _scalar(value: str) -> str:
+    """Strip the comment and the quotes off a scalar value."""
+    return value.split(" #", 1)[0].strip().strip("\"'")
+
+
+@dataclass
+class IgnoreFile:
+    """The .ta-ignore.yaml file: task paths (glob patterns) and workspaces to ignore."""
+
+    path: str | None = None
+    paths: list[str] = field(default_factory=list)
+    workspaces: list[str] = field(default_factory=list)
+
+    @classmethod
+    def find(cls) -> IgnoreFile:
+        """Load the first ignore file that exists. Return an empty one if there's none."""
+        for path in IGNORE_FILES:
+            if os.path.isfile(path):
+                lists = _read_top_level_lists(Path(path).read_text().splitlines())
+                return cls(path, lists.get("paths", []), lists.get("workspaces", []))
+        return cls()
+
+    def ignores_path(self, task_path: str) -> bool:
+        # Like bash [[ $path == $pattern ]], '*' matches '/' as well
+        return any(fnmatch.fnmatchcase(task_path, pattern) for pattern in self.paths)
+
+
+def _read_top_level_lists(lines: list[str]) -> dict[str, list[str]]:
+    """Read the lists of scalars under the top-level keys of a simple YAML document."""
+    lists: dict[str, list[str]] = {}
+    current: list[str] | None = None
+    for line in lines:
+        if not line.strip() or line.lstrip().startswith("#") or line == "---":
+            continue
+        if m := _LIST_ITEM_RE.match(line):
+            if current is not None:
+                current.append(m.group(2))
+        elif (m := _KEY_RE.match(line)) and not m.group(1):
+            current = lists.setdefault(m.group(3), [])
+        else:
+            current = None
+    return lists
+
+
+@dataclass(frozen=True)
+class TaskInfo:
+    """The parts of a task file that matter for the check."""
+
+    kind: str | None
+    workspaces: list[str]
+
+
+def read_task_info(lines: Iterable[str]) -> TaskInfo:
+    """Read the kind and the spec.workspaces names from a task file, in one pass.
+
+    Understands the block style YAML that task files are written in, not YAML in general.
+    Only reads the first document.
+    """
+    kind = None
+    workspaces: list[str] = []
+    in_spec = False
+    workspaces_indent: int | None = None
+    spec_indent: int | None = None
+    seen_content = False
+
+    for line in lines:
+        line = line.rstrip("\n")
+        if line.startswith("---"):
+            if seen_content:
+                break
+            continue
+        stripped = line.lstrip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        seen_content = True
+        indent = len(line) - len(stripped)
+
+        if indent == 0 and not stripped.startswith("-"):
+            in_spec = stripped.startswith("spec:")
+            workspaces_indent = None
+            if m := _KEY_RE.match(line):
+                if m.group(3) == "kind" and m.group(4):
+                    kind = _scalar(m.group(4))
+            continue
+
+        if not in_spec:
+            continue
+        if spec_indent is None:
+            spec_indent = indent
+
+        if workspaces_indent is not None:
+            # Lists under a key may be at the same indentation as the key
+            if indent < workspaces_indent or (
+                indent == workspaces_indent and not stripped.startswith("-")
+            ):
+                workspaces_indent = None
+            else:
+                m = _KEY_RE.match(line)
+                if m and m.group(3) == "name" and m.group(4):
+                    workspaces.append(_scalar(m.group(4)))
+                continue
+
+        if indent == spec_indent and (m := _KEY_RE.match(line)) and m.group(3) == "workspaces":
+            workspaces_indent = indent
+            if flow := m.group(4):
+                workspaces.extend(re.findall(r"""name:\s*["']?([\w.-]+)""", flow))
+
+    return TaskInfo(kind, workspaces)
+
+
+def find_task_files(task_dir: str) -> Iterator[str]:
+    """Find the task/**/*.yaml files, in one walk of the tree (doesn't follow symlinks)."""
+    for dirpath, dirnames, filenames in os.walk(task_dir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith(".yaml"):
+                yield os.path.join(dirpath, filename)
+
+
+def _parse_version(version_str: str) -> Version | None:
+    try:
+        return Version.parse(version_str)
+    except VersionParseError:
+        return None
+
+
+def has_newer_version(task_path: str) -> bool:
+    """Is there a newer version of the task, e.g. task/hello/0.10/ for task/hello/0.9/hello.yaml?
+
+    Compares the versions as versions (0.10 > 0.9), not as strings.
+    """
+    version_dir = os.path.dirname(task_path)
+    version = _parse_version(os.path.basename(version_dir))
+    if version is None:
+        return False
+
+    with os.scandir(os.path.dirname(version_dir)) as entries:
+        for entry in entries:
+            if entry.is_dir() and (other := _parse_version(entry.name)) and other > version:
+                return True
+    return False
+
+
+def ta_variant_dir(task_path: str) -> str:
+    """task/{name}/{version}/{name}.yaml => task/{name}-oci-ta/{version}/"""
+    *parents, name_dir, version_dir, _ = task_path.split("/")
+    return "/".join([*parents, f"{name_dir}-oci-ta", version_dir, ""])
+
+
+def emit(kind: str, file: str, msg: str) -> None:
+    if os.getenv("GITHUB_ACTIONS") == "true":
+        print(f"::{kind} file={file},line=1,col=0::{msg}")
+    else:
+        print(f"{kind.upper()}: \033[1m{file}\033[0m {msg}")
+
+
+def check() -> int:
+    """Report the tasks that use workspaces but don't have a Trusted Artifacts variant.
+
+    Return 1 if running in GitHub Actions and some of the variants are missing.
+    """
+    git_root = subprocess.run(
+        ["git", "rev-parse", "--show-toplevel"], capture_output=True, text=True, check=True
+    ).stdout.strip()
+    os.chdir(git_root)
+
+    ignore = IgnoreFile.find()
+    if ignore.path:
+        print(f"Using ignorefile: {ignore.path}")
+        print(f"Ignored paths: {' '.join(ignore.paths)}")
+        print(f"Ignored workspaces: {' '.join(ignore.workspaces)}")
+
+    missing = 0
+    for task_path in find_task_files("task"):
+        # archived tasks need to be skipped
+        if os.path.realpath(task_path) != os.path.join(git_root, task_path):
+            print(f"skipping {task_path} (is a symlink) ...")
+            continue
+        if os.path.basename(task_path) in NON_TASK_FILES or ignore.ignores_path(task_path):
+            continue
+
+        with open(task_path) as f:
+            task_info = read_task_info(f)
+        if task_info.kind != "Task":
+            continue
+
+        # is the task using a workspace(s) to share files?
+        disallowed = [ws for ws in task_info.workspaces if ws not in ignore.workspaces]
+        if not disallowed or has_newer_version(task_path):
+            continue
+
+        ta_dir = ta_variant_dir(task_path)
+        if not os.path.isdir(ta_dir):
+            workspaces = json.dumps(disallowed, separators=(",", ":"))
+            emit(
+                "error",
+                task_path,
+                f"Task is using a workspace(s): {workspaces}, to share data and needs a "
+                f"corresponding Trusted Artifacts Task variant in {ta_dir}",
+            )
+            missing += 1
+
+    if missing and os.getenv("GITHUB_ACTIONS") == "true":
+        print(
+            "::notice title=Missing Trusted Artifact Task Variant::Found Tasks that share data "
+            "via workspaces without a corresponding Trusted Artifacts Variant. "
+            "Please create the Trusted Artifacts Variant of the Task as well"
+        )
+        return 1
+    return 0
+
+
+def main() -> int:
+    return check()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
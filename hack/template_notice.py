@@ -1,8 +1,14 @@
 #!/usr/bin/env python
 import argparse
+import os
+import shutil
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Callable, Literal, assert_never
+from typing import BinaryIO, Callable, Literal, NamedTuple, assert_never
+
+from cli_args import positive_int
 
 # If you change the header, you'll need to fix it manually in all templated files.
 NOTICE_HEADER = "<TEMPLATED FILE!>"
@@ -16,29 +22,161 @@ NOTICE_COMMENT = [
 
 SupportedFiletype = Literal["sh", "py", "yaml"]
 
+# The notice comment is near the top of the file. If it isn't within this many lines,
+# process the whole file rather than just the head.
+MAX_HEAD_LINES = 50
+
 
 class UnsupportedFiletype(ValueError):
     pass
 
 
-def _ensure_notice_comment(filepath: Path) -> None:
+def _ensure_notice_comment(filepath: Path, write: bool = True) -> bool:
+    """Make sure the file has the expected notice comment.
+
+    Return True if the file needed a fix. Only write the fix if 'write' is True.
+    """
     suffix = filepath.suffix.removeprefix(".")
     if suffix not in ("sh", "py", "yaml"):
         raise UnsupportedFiletype(suffix)
 
     filetype: SupportedFiletype = suffix
 
-    lines = filepath.read_text().splitlines()
-    original_lines = lines
+    with filepath.open("rb") as f:
+        head = _read_head(f, filetype)
+        if head is None:
+            # Can't tell from the head where the notice comment is or goes, take the whole file
+            f.seek(0)
+            content = f.read()
+            head = _Head(content.decode().splitlines(), len(content), _newline_of(content))
+
+        fixed_lines = _fix_notice_comment(filetype, head.lines)
+        if fixed_lines == head.lines:
+            return False
+
+        if write:
+            _rewrite_head(filepath, f, head, fixed_lines)
+    return True
+
 
+def _fix_notice_comment(filetype: SupportedFiletype, lines: list[str]) -> list[str]:
     # do a drop -> re-add so that if we change the comment and/or the place
     # where we want it in the files, re-running this script will autofix it
     lines = _drop_notice_comment(lines)
-    lines = _add_notice_comment(filetype, lines)
+    return _add_notice_comment(filetype, lines)
+
+
+class _Head(NamedTuple):
+    """The first lines of a file, enough to fix the notice comment without the rest."""
+
+    lines: list[str]
+    size: int  # in bytes, the rest of the file starts at this offset
+    newline: str
+
+
+def _read_head(f: BinaryIO, filetype: SupportedFiletype) -> _Head | None:
+    """Read the lines up to the end of the notice comment and the place where it goes.
+
+    If fixing just those lines gives the same result as fixing the whole file, the rest of
+    the file doesn't matter. Return None if that's not the case within MAX_HEAD_LINES lines.
+    """
+    lines: list[str] = []
+    size = 0
+    in_notice = False
+    notice_ended = False
+    newline = "\n"
+
+    for raw_line in f:
+        if not lines and raw_line.endswith(b"\r\n"):
+            newline = "\r\n"
+        size += len(raw_line)
+        line = raw_line.decode().removesuffix("\n").removesuffix("\r")
+        lines.append(line)
+
+        if not in_notice:
+            in_notice = line.startswith("#") and NOTICE_HEADER in line
+        elif not line.startswith("#"):
+            # The first non-comment line ends the notice (if it's blank, it gets dropped too)
+            notice_ended = True
+
+        if notice_ended and _finds_insert_point(filetype, lines):
+            return _Head(lines, size, newline)
+        if len(lines) >= MAX_HEAD_LINES:
+            break
+    else:
+        # Reached the end of the file, the head is the whole file
+        return _Head(lines, size, newline)
+
+    if (
+        not in_notice
+        and not _contains(f, NOTICE_HEADER.encode())
+        and _finds_insert_point(filetype, lines)
+    ):
+        # No notice comment anywhere (yet)
+        return _Head(lines, size, newline)
+    return None
+
+
+def _finds_insert_point(filetype: SupportedFiletype, lines: list[str]) -> bool:
+    """Can _add_notice_comment tell where the notice comment goes from these lines alone?"""
+    lines = _drop_notice_comment(lines)
+    match filetype:
+        case "sh" | "py":
+            return _first_index(lambda line: not line, lines) is not None
+        case "yaml":
+            return _first_index(lambda line: line != "---", lines) is not None
+        case _:
+            assert_never(filetype)
+
+
+def _contains(f: BinaryIO, data: bytes, chunk_size: int = 1024 * 1024) -> bool:
+    """Does the rest of the file contain the data? Reads the file in chunks."""
+    overlap = b""
+    while chunk := f.read(chunk_size):
+        if data in overlap + chunk:
+            return True
+        overlap = chunk[-(len(data) - 1) :]
+    return False
+
 
-    if lines != original_lines:
-        with filepath.open("w") as f:
-            f.writelines(line + "\n" for line in lines)
+def _newline_of(content: bytes) -> str:
+    first_line_end = content.find(b"\n")
+    return "\r\n" if first_line_end > 0 and content[first_line_end - 1] == ord("\r") else "\n"
+
+
+def _rewrite_head(filepath: Path, f: BinaryIO, head: _Head, fixed_lines: list[str]) -> None:
+    """Replace the head of the file with the fixed lines, keep the rest of the bytes as they are.
+
+    Writes a temporary file and renames it over the original, the file is never half-written.
+    """
+    filepath = filepath.resolve()  # replace the file, not the symlink to it
+    fd, tmp_path = tempfile.mkstemp(dir=filepath.parent, prefix=f".{filepath.name}.")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write("".join(line + head.newline for line in fixed_lines).encode())
+            tmp.flush()
+            _copy_rest(f.fileno(), tmp.fileno(), head.size)
+        shutil.copymode(filepath, tmp_path)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _copy_rest(src_fd: int, dst_fd: int, offset: int) -> None:
+    """Copy the source file from the offset to the end, at the current position in dest.
+
+    Lets the kernel copy the data if it can, without passing it through userspace.
+    """
+    while True:
+        try:
+            copied = os.copy_file_range(src_fd, dst_fd, 1024 * 1024 * 1024, offset)
+        except (AttributeError, OSError):
+            # Not Linux, or the filesystems don't support it
+            copied = os.write(dst_fd, os.pread(src_fd, 1024 * 1024, offset))
+        if not copied:
+            return
+        offset += copied
 
 
 def _drop_notice_comment(lines: list[str]) -> list[str]:
@@ -97,33 +235,80 @@ def _first_index(pred: Callable[[str], bool], lines: list[str]) -> int | None:
     return next((i for i, line in enumerate(lines) if pred(line)), None)
 
 
-def fix(template_dir: str) -> None:
-    for filepath in Path(template_dir).rglob("*"):
-        if filepath.is_dir():
-            continue
+def fix(template_dir: str, jobs: int | None = None) -> int:
+    """Add or fix the notice comments in all the supported files."""
+    for filepath, needed_fix in _process_files(template_dir, jobs, write=True):
+        if needed_fix is None:
+            msg = f"skipping file, unsupported suffix ({filepath.suffix.removeprefix('.')})"
+        elif needed_fix:
+            msg = "fixed file"
+        else:
+            msg = "processed file"
+        print(f"{msg}: {filepath}", file=sys.stderr)
+    return 0
+
+
+def check(template_dir: str, jobs: int | None = None) -> int:
+    """Check the notice comments without changing any files. Return 1 if any need a fix."""
+    exitcode = 0
+    for filepath, needed_fix in _process_files(template_dir, jobs, write=False):
+        if needed_fix:
+            print(f"notice comment is missing or outdated: {filepath}", file=sys.stderr)
+            exitcode = 1
+    return exitcode
+
 
+def _process_files(
+    template_dir: str, jobs: int | None, write: bool
+) -> list[tuple[Path, bool | None]]:
+    """Process all the files in the template_dir, return (path, needed fix?) pairs.
+
+    None instead of needed fix? => unsupported file type.
+    """
+
+    def process(filepath: Path) -> tuple[Path, bool | None]:
         try:
-            _ensure_notice_comment(filepath)
-            msg = "processed file"
-        except UnsupportedFiletype as e:
-            msg = f"skipping file, unsupported suffix ({e})"
+            return filepath, _ensure_notice_comment(filepath, write)
+        except UnsupportedFiletype:
+            return filepath, None
 
-        print(f"{msg}: {filepath}", file=sys.stderr)
+    filepaths = sorted(
+        Path(dirpath, filename)
+        for dirpath, _, filenames in os.walk(template_dir)
+        for filename in filenames
+    )
+    # Report the files in the sorted order, however the processing gets spread over workers
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        return list(executor.map(process, filepaths))
 
 
-def main() -> None:
+def main() -> int:
     parser = argparse.ArgumentParser()
     subcommands = parser.add_subparsers(title="subcommands", required=True)
 
-    fix_command = subcommands.add_parser("fix")
+    fix_command = subcommands.add_parser("fix", help="Add or fix the notice comments")
     fix_command.set_defaults(fn=fix)
-    fix_command.add_argument("template_dir", default="{{cookiecutter.repo_root}}", nargs="?")
+
+    check_command = subcommands.add_parser(
+        "check", help="Check the notice comments, exit with 1 if any need a fix"
+    )
+    check_command.set_defaults(fn=check)
+
+    for command in fix_command, check_command:
+        command.add_argument("template_dir", default="{{cookiecutter.repo_root}}", nargs="?")
+        command.add_argument(
+            "-j",
+            "--jobs",
+            type=positive_int,
+            default=None,
+            help="Number of files to process in parallel (default: number of CPUs)",
+        )
 
     args = vars(parser.parse_args())
 
     fn = args.pop("fn")
-    fn(**args)
+    return fn(**args)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
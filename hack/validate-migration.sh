@@ -10,7 +10,7 @@
 # This script can be run in the CI against a PR or in local from a topic branch.
 # Before run, all local changes have to be committed.
 #
-# Network is required to execute this script.
+# Network is required to execute this script, unless OFFLINE is set (see below).
 #
 # Checks are implemented as functions whose name has prefix `check_`. Each of
 # them exits with status code 0 to indicate pass, otherwise exits
@@ -23,6 +23,14 @@
 #   https://tekton.dev/docs/pipelines/install/#installation
 #
 # - Set IN_CLUSTER to true.
+#
+# Set MIGRATION_JOBS to limit the number of pipelines that the migration is
+# applied to in parallel (default: number of CPUs).
+#
+# The pipelines fetched from the bundles in the build pipeline config are cached
+# by the bundle digests in PIPELINES_CACHE_DIR (default:
+# ~/.cache/validate-migration). Set OFFLINE to true to take the build pipeline
+# config and the pipelines from the cache only, without network.
 
 set -euo pipefail
 
@@ -43,6 +51,15 @@ declare -r DEFAULT_BRANCH
 : "${IN_CLUSTER:=""}"
 declare -r IN_CLUSTER
 
+: "${MIGRATION_JOBS:=""}"
+declare -r MIGRATION_JOBS
+
+: "${PIPELINES_CACHE_DIR:=""}"
+declare -r PIPELINES_CACHE_DIR
+
+: "${OFFLINE:=""}"
+declare -r OFFLINE
+
 info() {
     echo "info: $*" >&2
 }
@@ -55,56 +72,14 @@ warning() {
     echo "warning: $*" >&2
 }
 
-format_yaml_in_python() {
-    local -r filepath=$1
-    python3 -c "
-import sys
-from ruamel.yaml import YAML
-yaml = YAML()
-# These settings are same as pipeline-migration-tool
-yaml.preserve_quotes = True
-yaml.width = 8192
-yaml_file = sys.argv[1]
-with open(yaml_file, 'r', encoding='utf-8') as f:
-    data = yaml.load(f)
-with open(yaml_file, 'w', encoding='utf-8') as f:
-    yaml.dump(data, f)
-" "$filepath"
-}
-
-wrapped_diff() {
-    set +e
-    echo "\`\`\`diff"
-    diff "$@"
-    status=$?
-    echo "\`\`\`"
-    return $status
-}
-
-
+# Get the pipelines in the build pipeline config into ${WORK_DIR}/pipelines/pushed/.
+# The pipelines get cached by the bundle digests, see 'hack/validate_migration.py --help'.
 prepare_pipelines() {
-    local -a pl_names_in_config
-    local pushed_pipelines
-
-    mkdir -p "${WORK_DIR}/pipelines/pushed"
-
-    # Download pushed pipeline bundles from ConfigMap
-    pushed_pipelines=$(
-        curl --fail -sL "$BUILD_PIPELINE_CONFIG" | yq '.data."config.yaml"' | yq '.pipelines[] | .name + " " + .bundle'
-    )
-
-    while read -r pl_name pl_bundle; do
-        pl_names_in_config+=("$pl_name")
-        pl_file="${WORK_DIR}/pipelines/pushed/${pl_name}.yaml"
-        info "fetch pipeline $pl_name from bundle $pl_bundle -> $pl_file"
-        tkn bundle list "$pl_bundle" pipeline "$pl_name" -o yaml >"$pl_file"
-    done <<<"$pushed_pipelines"
-
-    return 0
-}
-
-list_preprocessed_pipelines() {
-    find "${WORK_DIR}/pipelines" -type f -name "*.yaml"
+    python3 hack/validate_migration.py prepare-pipelines \
+        --config "$BUILD_PIPELINE_CONFIG" \
+        ${PIPELINES_CACHE_DIR:+--cache-dir "$PIPELINES_CACHE_DIR"} \
+        ${OFFLINE:+--offline} \
+        "${WORK_DIR}/pipelines"
 }
 
 # Check the migration does not break build pipelines.
@@ -115,44 +90,11 @@ list_preprocessed_pipelines() {
 # The modified pipeline is saved into a separate file with suffix '.modified'.
 check_apply_on_pipelines() {
     local -r migration_file=$1
-    local -r run_log_file=$(mktemp --suffix=-migration-run-test)
-    local -r prepared_pipelines=$(list_preprocessed_pipelines)
-    local failed=
-    local file_path=
-    local updated=
-    local pl_copy_file_path=
-    while read -r file_path; do
-        pl_copy_file_path="${file_path}.copy"
-        cp "$file_path" "$pl_copy_file_path"
-        info "apply migration $migration_file to pipeline $pl_copy_file_path"
-        if ! bash -x "$migration_file" "$pl_copy_file_path" 2>"$run_log_file" >&2; then
-            error "failed to run migration file $migration_file on pipeline $file_path:"
-            cat "$run_log_file" >&2
-            failed=true
-        else
-            info "diff to see if pipeline is modified by the migration"
-            format_yaml_in_python "$pl_copy_file_path"
-            if ! wrapped_diff -u "$file_path" "$pl_copy_file_path"; then
-                updated=true
-                mv "$pl_copy_file_path" "${file_path}.modified"
-            fi
-        fi
-    done <<<"$prepared_pipelines"
-    rm "$run_log_file"
-    if [ -z "$updated" ]; then
-        mapfile -t pl_names < <(
-            while read -r file_path; do
-                yq ".metadata.name" "$file_path"
-            done <<<"$prepared_pipelines" \
-                | sort | uniq
-        )
-        info "${FUNCNAME[0]}: migration file does not modify any of pipelines ${pl_names[*]}"
-    fi
-    if [ -n "$failed" ] || [ -z "$updated" ]; then
-        return 1
-    else
-        return 0
-    fi
+    # The migration runs on all the pipelines in parallel, the pipelines get formatted and
+    # diffed in a single Python process. See 'hack/validate_migration.py --help'.
+    python3 hack/validate_migration.py apply-on-pipelines \
+        ${MIGRATION_JOBS:+--jobs "$MIGRATION_JOBS"} \
+        "$migration_file" "${WORK_DIR}/pipelines"
 }
 
 # Run shellcheck against the given migration file without rules customization.
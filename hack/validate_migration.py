@@ -0,0 +1,414 @@
+#!/usr/bin/env python
+"""Script for checking task migrations against the Konflux standard pipelines."""
+
+# <TEMPLATED FILE!>
+# This file comes from the templates at https://github.com/konflux-ci/task-repo-shared-ci.
+# Please consider sending a PR upstream instead of editing the file directly.
+# See the SHARED-CI.md document in this repo for more details.
+
+from __future__ import annotations
+
+import argparse
+import difflib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from cli_args import positive_int
+
+
+def info(msg: str) -> None:
+    print(f"info: {msg}", file=sys.stderr)
+
+
+def error(msg: str) -> None:
+    print(f"error: {msg}", file=sys.stderr)
+
+
+class InvalidYaml(Exception):
+    """The YAML content cannot be loaded."""
+
+
+class YamlFormatter:
+    """Formats YAML the same way as pipeline-migration-tool, with a ruamel.yaml round trip.
+
+    Formatting both the original and the migrated pipelines makes the diffs show only the
+    changes made by the migration, not the formatting differences.
+    """
+
+    def __init__(self) -> None:
+        from ruamel.yaml import YAML
+        from ruamel.yaml.error import YAMLError
+
+        self._error = YAMLError
+        self._yaml = YAML()
+        self._yaml.preserve_quotes = True
+        self._yaml.width = 8192
+
+    def load(self, text: str) -> Any:
+        try:
+            return self._yaml.load(text)
+        except self._error as e:
+            raise InvalidYaml(str(e)) from e
+
+    def dump(self, data: Any) -> str:
+        stream = io.StringIO()
+        self._yaml.dump(data, stream)
+        return stream.getvalue()
+
+    def format(self, text: str) -> str:
+        return self.dump(self.load(text))
+
+
+def _load_formatter() -> YamlFormatter | None:
+    try:
+        return YamlFormatter()
+    except ImportError as e:
+        error(f"processing pipelines requires the ruamel.yaml Python package: {e}")
+        return None
+
+
+class PrepareError(Exception):
+    """Failed to get the pipelines from the build-pipeline-config."""
+
+
+@dataclass(frozen=True)
+class PipelineBundle:
+    """A pipeline from the build-pipeline-config and the bundle it's pushed in."""
+
+    name: str
+    bundle: str
+
+    @property
+    def digest(self) -> str | None:
+        _, sep, digest = self.bundle.partition("@")
+        return digest if sep else None
+
+
+class PipelineCache:
+    """The pipelines extracted from bundles, stored by the bundle digests, and the last config.
+
+    The layout of the cache directory:
+
+        build-pipeline-config.yaml               the last downloaded build-pipeline-config
+        bundles/{algorithm}-{hex}/{name}.yaml    the pipeline from the bundle with that digest
+
+    What a digest refers to never changes, so the cached pipelines never get stale. Bundles
+    referenced by tag only are not cached. Offline, the cache directory is the only source.
+    """
+
+    CONFIG_FILE = "build-pipeline-config.yaml"
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    @staticmethod
+    def default_path() -> Path:
+        cache_home = os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache"
+        return Path(cache_home, "validate-migration")
+
+    @property
+    def config_path(self) -> Path:
+        return self.path / self.CONFIG_FILE
+
+    def pipeline_path(self, pipeline: PipelineBundle) -> Path | None:
+        if pipeline.digest is None:
+            return None
+        return self.path / "bundles" / pipeline.digest.replace(":", "-") / f"{pipeline.name}.yaml"
+
+    @staticmethod
+    def store(path: Path, content: str) -> None:
+        """Write the file atomically, parallel runs can share the cache."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(content)
+        tmp_path.replace(path)
+
+
+def read_build_pipeline_config(content: str, formatter: YamlFormatter) -> list[PipelineBundle]:
+    """Read the pipelines from the build-pipeline-config ConfigMap."""
+    configmap = formatter.load(content)
+    config = formatter.load(configmap["data"]["config.yaml"])
+    return [PipelineBundle(str(pl["name"]), str(pl["bundle"])) for pl in config["pipelines"]]
+
+
+def download(url: str) -> str:
+    try:
+        with urllib.request.urlopen(url, timeout=60) as response:
+            return response.read().decode()
+    except OSError as e:
+        raise PrepareError(f"failed to download {url}: {e}") from e
+
+
+def fetch_pipeline(pipeline: PipelineBundle) -> str:
+    proc = subprocess.run(
+        ["tkn", "bundle", "list", pipeline.bundle, "pipeline", pipeline.name, "-o", "yaml"],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise PrepareError(
+            f"failed to fetch pipeline {pipeline.name} from bundle {pipeline.bundle}:\n"
+            f"{proc.stderr.strip()}"
+        )
+    return proc.stdout
+
+
+def _get_pipeline(
+    pipeline: PipelineBundle, cache: PipelineCache, offline: bool
+) -> tuple[str, bool]:
+    """Return the pipeline content and whether it came from the cache."""
+    cache_path = cache.pipeline_path(pipeline)
+    if cache_path is not None and cache_path.is_file():
+        return cache_path.read_text(), True
+    if offline:
+        raise PrepareError(
+            f"pipeline {pipeline.name} from bundle {pipeline.bundle} is not in the cache "
+            f"{cache.path} (offline)"
+        )
+    content = fetch_pipeline(pipeline)
+    if cache_path is not None:
+        cache.store(cache_path, content)
+    return content, False
+
+
+def prepare_pipelines(
+    pipelines_dir: Path,
+    config: str,
+    cache_dir: Path | None = None,
+    offline: bool = False,
+    jobs: int | None = None,
+) -> int:
+    """Get the pipelines from the build-pipeline-config into {pipelines_dir}/pushed/.
+
+    The 'config' is a URL or a local file. Online, the downloaded config gets saved into the
+    cache. Offline, the config is read from the cache (unless it's a local file).
+    """
+    formatter = _load_formatter()
+    if formatter is None:
+        return 1
+    cache = PipelineCache(cache_dir or PipelineCache.default_path())
+
+    try:
+        if "://" not in config:
+            config_content = Path(config).read_text()
+        elif offline:
+            info(f"offline, use the cached build-pipeline-config {cache.config_path}")
+            config_content = cache.config_path.read_text()
+        else:
+            config_content = download(config)
+            cache.store(cache.config_path, config_content)
+        pipelines = read_build_pipeline_config(config_content, formatter)
+    except (OSError, InvalidYaml, KeyError, TypeError, PrepareError) as e:
+        error(f"cannot read the build-pipeline-config {config}: {e}")
+        return 1
+
+    pushed_dir = pipelines_dir / "pushed"
+    pushed_dir.mkdir(parents=True, exist_ok=True)
+    exitcode = 0
+
+    def get_pipeline(pipeline: PipelineBundle) -> tuple[str, bool]:
+        return _get_pipeline(pipeline, cache, offline)
+
+    # Fetch the bundles concurrently, but write the pipelines and report errors in list order
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        futures = [(pipeline, executor.submit(get_pipeline, pipeline)) for pipeline in pipelines]
+        for pipeline, future in futures:
+            pl_file = pushed_dir / f"{pipeline.name}.yaml"
+            try:
+                content, cached = future.result()
+            except PrepareError as e:
+                error(str(e))
+                exitcode = 1
+                continue
+            how = "use cached" if cached else "fetch"
+            info(f"{how} pipeline {pipeline.name} from bundle {pipeline.bundle} -> {pl_file}")
+            pl_file.write_text(content)
+
+    return exitcode
+
+
+@dataclass(frozen=True)
+class MigrationRun:
+    """The result of running a migration on a copy of a pipeline file."""
+
+    pipeline_path: Path
+    copy_path: Path
+    returncode: int
+    log: str
+
+
+def pipeline_name(pipeline: Any) -> str:
+    return str(pipeline["metadata"]["name"])
+
+
+def list_pipeline_files(pipelines_dir: Path) -> list[Path]:
+    return sorted(pipelines_dir.rglob("*.yaml"))
+
+
+def run_migration(migration_file: Path, pipeline_path: Path) -> MigrationRun:
+    """Run the migration on a copy of the pipeline file, collect the output and the trace."""
+    copy_path = pipeline_path.with_name(f"{pipeline_path.name}.copy")
+    shutil.copyfile(pipeline_path, copy_path)
+    proc = subprocess.run(
+        ["bash", "-x", migration_file, copy_path],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    return MigrationRun(pipeline_path, copy_path, proc.returncode, proc.stdout)
+
+
+def unified_diff(original: str, modified: str, fromfile: str, tofile: str) -> str:
+    return "".join(
+        difflib.unified_diff(
+            original.splitlines(keepends=True),
+            modified.splitlines(keepends=True),
+            fromfile,
+            tofile,
+        )
+    )
+
+
+def diff_migrated(run: MigrationRun, formatter: YamlFormatter) -> tuple[str, str]:
+    """Return the formatted migrated pipeline and its diff to the formatted original pipeline.
+
+    Formatting is the slow part, so skip it if the migration didn't touch the pipeline at all.
+    """
+    original = run.pipeline_path.read_text()
+    migrated = run.copy_path.read_text()
+    if migrated == original:
+        return "", ""
+
+    original = formatter.format(original)
+    modified = formatter.format(migrated)
+    return modified, unified_diff(original, modified, str(run.pipeline_path), str(run.copy_path))
+
+
+def apply_on_pipelines(migration_file: Path, pipelines_dir: Path, jobs: int | None = None) -> int:
+    """Check that the migration runs successfully on the pipelines, and that it modifies some.
+
+    Saves the modified pipelines into {pipeline}.yaml.modified files. Return 1 if the migration
+    failed on any of the pipelines or didn't modify any of them.
+    """
+    formatter = _load_formatter()
+    if formatter is None:
+        return 1
+
+    pipeline_paths = list_pipeline_files(pipelines_dir)
+    failed = False
+    updated = False
+
+    # Each worker runs the migration on its own copy of a pipeline. Meanwhile, the main thread
+    # formats and diffs the results as they come.
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        runs = executor.map(lambda path: run_migration(migration_file, path), pipeline_paths)
+        for run in runs:
+            info(f"apply migration {migration_file} to pipeline {run.copy_path}")
+            if run.returncode != 0:
+                error(
+                    f"failed to run migration file {migration_file} on pipeline {run.pipeline_path}:"
+                )
+                sys.stderr.write(run.log)
+                failed = True
+                continue
+
+            info("diff to see if pipeline is modified by the migration")
+            try:
+                modified, diff = diff_migrated(run, formatter)
+            except InvalidYaml as e:
+                error(f"migration file {migration_file} made pipeline {run.pipeline_path} invalid:")
+                print(e, file=sys.stderr)
+                failed = True
+                continue
+            print(f"```diff\n{diff}```", flush=True)
+            if diff:
+                updated = True
+                run.copy_path.with_name(f"{run.pipeline_path.name}.modified").write_text(modified)
+            run.copy_path.unlink()
+
+    if not updated:
+        names = set()
+        for path in pipeline_paths:
+            try:
+                names.add(pipeline_name(formatter.load(path.read_text())))
+            except InvalidYaml as e:
+                error(f"pipeline {path} is invalid:")
+                print(e, file=sys.stderr)
+                failed = True
+        info(
+            "check_apply_on_pipelines: migration file does not modify any of pipelines "
+            + " ".join(sorted(names))
+        )
+
+    return 1 if failed or not updated else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    subcommands = parser.add_subparsers(title="subcommands", required=True)
+
+    prepare_parser = subcommands.add_parser(
+        "prepare-pipelines",
+        help=(
+            "Get the pipelines from the build-pipeline-config, from the cache if the bundle "
+            "digests didn't change"
+        ),
+    )
+    prepare_parser.add_argument("pipelines_dir", type=Path)
+    prepare_parser.add_argument(
+        "--config", required=True, help="URL or path of the build-pipeline-config ConfigMap"
+    )
+    prepare_parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help="Directory for the cached pipelines (default: $XDG_CACHE_HOME/validate-migration)",
+    )
+    prepare_parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Don't use the network, get the config and the pipelines from the cache directory",
+    )
+    prepare_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=positive_int,
+        default=None,
+        help="Number of bundles to fetch in parallel (default: number of CPUs)",
+    )
+    prepare_parser.set_defaults(fn=prepare_pipelines)
+
+    apply_parser = subcommands.add_parser(
+        "apply-on-pipelines",
+        help=(
+            "Apply a migration to all the pipelines in a directory, check that it succeeds "
+            "and modifies some of them"
+        ),
+    )
+    apply_parser.add_argument("migration_file", type=Path)
+    apply_parser.add_argument("pipelines_dir", type=Path)
+    apply_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=positive_int,
+        default=None,
+        help="Number of pipelines to apply the migration to in parallel (default: number of CPUs)",
+    )
+    apply_parser.set_defaults(fn=apply_on_pipelines)
+
+    args = vars(parser.parse_args())
+    fn = args.pop("fn")
+    return fn(**args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
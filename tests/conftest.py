@@ -0,0 +1,11 @@
+"""Helpers shared by the integration tests."""
+
+from pathlib import Path
+
+
+def write_files(path: Path, files: dict[str, str]) -> None:
+    """Create a file tree at 'path'."""
+    for filepath, content in files.items():
+        full_path = path / filepath
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        full_path.write_text(content)
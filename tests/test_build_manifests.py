@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+"""Integration tests for hack/build_manifests.py.
+
+Each test writes some kustomized tasks into a directory at tmp_path, executes the
+hack/build_manifests.py script with a stub 'oc' command and checks the results.
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+from conftest import write_files
+
+SCRIPT_PATH = Path(__file__).parent.parent / "hack" / "build_manifests.py"
+WARNING = "# WARNING: This is an auto generated file, do not modify this file directly\n"
+
+# Outputs the YAML files of the kustomization (and of the kustomizations it references),
+# except for previously built manifests. Logs the 'oc kustomize' calls to $OC_STUB_LOG
+STUB_OC = dedent(
+    """\
+    #!{python}
+    import os, sys
+    from pathlib import Path
+
+    if sys.argv[1:] == ["version", "--client"]:
+        print(os.getenv("OC_STUB_VERSION", "Client Version: 4.17.0"))
+        sys.exit(0)
+
+    assert sys.argv[1] == "kustomize", sys.argv
+    with open(os.environ["OC_STUB_LOG"], "a") as log:
+        print(*sys.argv[1:], file=log)
+
+    def dump(directory):
+        kustomization = (directory / "kustomization.yaml").read_text()
+        if "INVALID" in kustomization:
+            sys.exit(f"error: invalid kustomization in {{directory}}")
+        for line in kustomization.splitlines():
+            if line.startswith("- ../"):
+                dump(directory / line.removeprefix("- "))
+        for path in sorted(directory.glob("*.yaml")):
+            content = path.read_text()
+            if path.name != "kustomization.yaml" and not content.startswith("# WARNING"):
+                print(content, end="")
+
+    dump(Path(sys.argv[2]))
+    """
+)
+
+
+def kustomization(*resources: str, patch: bool = False) -> str:
+    content = "apiVersion: kustomize.config.k8s.io/v1beta1\nkind: Kustomization\n\nresources:\n"
+    content += "".join(f"- {resource}\n" for resource in resources)
+    if patch:
+        content += "\npatches:\n- path: patch.yaml\n  target:\n    kind: Task\n"
+    return content
+
+
+@pytest.fixture
+def repo_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """A git repo with build_manifests.py (+ cli_args.py) and kustomized tasks, 'oc' is a stub."""
+    repo_path = tmp_path / "repo"
+    (repo_path / "hack").mkdir(parents=True)
+    for script in SCRIPT_PATH, SCRIPT_PATH.with_name("cli_args.py"):
+        (repo_path / "hack" / script.name).write_text(script.read_text())
+    subprocess.run(["git", "init", "-q", repo_path], check=True)
+
+    write_files(
+        repo_path,
+        {
+            # Not kustomized, the kustomization is just the task itself
+            "task/base/0.1/kustomization.yaml": kustomization("base.yaml"),
+            "task/base/0.1/base.yaml": "kind: Task\nname: base\n",
+            "task/modified/0.1/kustomization.yaml": kustomization("../../base/0.1", patch=True),
+            "task/modified/0.1/patch.yaml": "patch: modified\n",
+            "task/other/0.1/kustomization.yaml": (
+                kustomization("../../base/0.1", patch=True)
+                # Only the fields that hold paths are inputs, not any value that names a file
+                + "\ncommonAnnotations:\n  docs: README.md\n"
+                + "\nconfigMapGenerator:\n- name: scripts\n  files:\n  - run=script.sh\n"
+            ),
+            "task/other/0.1/patch.yaml": "patch: other\n",
+            "task/other/0.1/script.sh": "#!/bin/bash\n",
+            "task/other/0.1/README.md": "# other task\n",
+            # No kustomization
+            "task/plain/0.1/plain.yaml": "kind: Task\nname: plain\n",
+        },
+    )
+
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    stub_oc = bin_dir / "oc"
+    stub_oc.write_text(STUB_OC.format(python=sys.executable))
+    stub_oc.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("OC_STUB_LOG", str(tmp_path / "oc.log"))
+
+    return repo_path
+
+
+def run_build_manifests(
+    repo_path: Path, *args: str, expect_failure: bool = False
+) -> tuple[subprocess.CompletedProcess[str], list[str]]:
+    """Run the build_manifests script, return the process and the 'oc kustomize' calls."""
+    oc_log = Path(os.environ["OC_STUB_LOG"])
+    oc_log.unlink(missing_ok=True)
+
+    result = subprocess.run(
+        [sys.executable, repo_path / "hack" / "build_manifests.py", *args],
+        capture_output=True,
+        text=True,
+    )
+
+    if not expect_failure and result.returncode != 0:
+        pytest.fail(
+            f"build_manifests.py failed unexpectedly:\n"
+            f"stdout: {result.stdout}\nstderr: {result.stderr}"
+        )
+
+    oc_calls = oc_log.read_text().splitlines() if oc_log.exists() else []
+    return result, sorted(oc_calls)
+
+
+def test_build(repo_path: Path) -> None:
+    """build should build the manifests of the kustomized tasks."""
+    result, oc_calls = run_build_manifests(repo_path, "--jobs", "2")
+
+    assert result.stdout == dedent(
+        """\
+        Skip generating manifest for the task: base/0.1
+        Built task manifest for: modified/0.1
+        Built task manifest for: other/0.1
+        """
+    )
+    assert oc_calls == ["kustomize task/modified/0.1/", "kustomize task/other/0.1/"]
+
+    base = "kind: Task\nname: base\n"
+    assert (repo_path / "task/modified/0.1/modified.yaml").read_text() == (
+        WARNING + base + "patch: modified\n"
+    )
+    assert (repo_path / "task/other/0.1/other.yaml").read_text() == (
+        WARNING + base + "patch: other\n"
+    )
+    assert (repo_path / "task/plain/0.1/plain.yaml").read_text() == "kind: Task\nname: plain\n"
+
+
+@pytest.mark.parametrize(
+    "change, rebuilt",
+    [
+        pytest.param({}, [], id="no-changes"),
+        pytest.param(
+            {"task/modified/0.1/patch.yaml": "patch: changed\n"},
+            ["kustomize task/modified/0.1/"],
+            id="patch",
+        ),
+        pytest.param(
+            {"task/base/0.1/base.yaml": "kind: Task\nname: changed\n"},
+            ["kustomize task/modified/0.1/", "kustomize task/other/0.1/"],
+            id="referenced-resource",
+        ),
+        pytest.param(
+            {"task/other/0.1/other.yaml": "manual edit\n"},
+            ["kustomize task/other/0.1/"],
+            id="manual-edit",
+        ),
+        pytest.param(
+            {"task/other/0.1/script.sh": "#!/bin/bash -e\n"},
+            ["kustomize task/other/0.1/"],
+            id="generator-file",
+        ),
+        pytest.param(
+            # Not an input of the build
+            {"task/other/0.1/README.md": "# changed\n"},
+            [],
+            id="readme",
+        ),
+    ],
+)
+def test_rebuild_changed(repo_path: Path, change: dict[str, str], rebuilt: list[str]) -> None:
+    """build should only rebuild the manifests whose inputs changed since the last build."""
+    run_build_manifests(repo_path)
+    write_files(repo_path, change)
+
+    result, oc_calls = run_build_manifests(repo_path)
+
+    assert oc_calls == rebuilt
+    for task_name in "modified", "other":
+        task_ref = f"{task_name}/0.1"
+        if f"kustomize task/{task_ref}/" in rebuilt:
+            assert f"Built task manifest for: {task_ref}\n" in result.stdout
+        else:
+            assert f"Task manifest is up to date: {task_ref}\n" in result.stdout
+
+
+def test_rebuild_all(repo_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """--rebuild and a different oc version should rebuild everything."""
+    run_build_manifests(repo_path)
+    all_builds = ["kustomize task/modified/0.1/", "kustomize task/other/0.1/"]
+
+    _, oc_calls = run_build_manifests(repo_path, "--rebuild")
+    assert oc_calls == all_builds
+
+    monkeypatch.setenv("OC_STUB_VERSION", "Client Version: 4.18.0")
+    _, oc_calls = run_build_manifests(repo_path)
+    assert oc_calls == all_builds
+
+
+def test_skip(repo_path: Path) -> None:
+    """--skip should leave out the specified tasks."""
+    result, oc_calls = run_build_manifests(repo_path, "--skip", "other", "--skip", "base")
+
+    assert result.stdout == "Built task manifest for: modified/0.1\n"
+    assert oc_calls == ["kustomize task/modified/0.1/"]
+    assert not (repo_path / "task/other/0.1/other.yaml").exists()
+
+
+def test_build_failure(repo_path: Path) -> None:
+    """A failed build should be reported, the other builds should go on."""
+    write_files(repo_path, {"task/modified/0.1/kustomization.yaml": "INVALID\n"})
+
+    result, _ = run_build_manifests(repo_path, expect_failure=True)
+
+    assert result.returncode == 1
+    assert result.stderr == dedent(
+        """\
+        failed to build task: modified/0.1
+        error: invalid kustomization in task/modified/0.1
+        """
+    )
+    assert "Built task manifest for: other/0.1\n" in result.stdout
+
+    # Failed builds are not recorded, they get retried
+    _, oc_calls = run_build_manifests(repo_path, expect_failure=True)
+    assert oc_calls == ["kustomize task/modified/0.1/"]
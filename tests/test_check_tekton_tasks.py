@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""Integration tests for .github/scripts/check_tekton_tasks.sh.
+
+Each test creates some tasks at tmp_path, executes the check_tekton_tasks.sh script with
+a stub kubectl and checks the output. The stub rejects the tasks that contain INVALID.
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+from conftest import write_files
+
+SCRIPT_PATH = Path(__file__).parent.parent / ".github" / "scripts" / "check_tekton_tasks.sh"
+
+# Logs the arguments to $KUBECTL_STUB_LOG, validates the -f files like the server would
+STUB_KUBECTL = dedent(
+    """\
+    #!{python}
+    import os, re, sys
+    from pathlib import Path
+
+    with open(os.environ["KUBECTL_STUB_LOG"], "a") as log:
+        print(*sys.argv[1:], file=log)
+
+    failed = False
+    paths = [arg for prev, arg in zip(sys.argv, sys.argv[1:]) if prev == "-f"]
+    for path in paths:
+        content = Path(path).read_text()
+        if "INVALID" in content:
+            print(
+                f'Error from server (BadRequest): error when creating "{{path}}": admission '
+                'webhook "validation.webhook.pipeline.tekton.dev" denied the request: 100% invalid',
+                file=sys.stderr,
+            )
+            failed = True
+        else:
+            name = re.search(r"^  name: (\\S+)", content, re.MULTILINE).group(1)
+            print(f"task.tekton.dev/{{name}} created (server dry run)")
+    sys.exit(1 if failed else 0)
+    """
+)
+
+
+def task(name: str, valid: bool = True) -> str:
+    return (
+        f"kind: Task\nmetadata:\n  name: {name}\nspec:\n  steps: {'[]' if valid else 'INVALID'}\n"
+    )
+
+
+@pytest.fixture
+def repo_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """A repo with some tasks, and the stub kubectl in PATH."""
+    repo_path = tmp_path / "repo"
+    write_files(
+        repo_path,
+        {
+            "task/hello/0.1/hello.yaml": task("hello"),
+            "task/hello/0.2/hello.yaml": task("hello"),
+            "task/world/0.1/world.yaml": task("world"),
+            "task/kustomized/0.1/kustomization.yaml": "resources: []\n",
+        },
+    )
+
+    kubectl = tmp_path / "bin" / "kubectl"
+    write_files(kubectl.parent, {"kubectl": STUB_KUBECTL.format(python=sys.executable)})
+    kubectl.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{kubectl.parent}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("KUBECTL_STUB_LOG", str(tmp_path / "kubectl.log"))
+    monkeypatch.setenv("GITHUB_ACTIONS", "false")
+    return repo_path
+
+
+def run_check(
+    repo_path: Path, *task_dirs: str
+) -> tuple[subprocess.CompletedProcess[str], list[str]]:
+    """Run the check, return the process and the kubectl calls."""
+    result = subprocess.run(
+        ["bash", SCRIPT_PATH, *task_dirs], cwd=repo_path, capture_output=True, text=True
+    )
+    kubectl_log = Path(os.environ["KUBECTL_STUB_LOG"])
+    calls = kubectl_log.read_text().splitlines() if kubectl_log.exists() else []
+    return result, calls
+
+
+def test_valid_tasks(repo_path: Path) -> None:
+    """All the changed tasks should be validated with a single kubectl call."""
+    result, calls = run_check(
+        repo_path, "task/hello/0.1", "task/hello/0.2", "task/kustomized/0.1", "task/world/0.1"
+    )
+
+    assert result.returncode == 0
+    assert calls == [
+        "apply --dry-run=server -f task/hello/0.1/hello.yaml -f task/hello/0.2/hello.yaml "
+        "-f task/world/0.1/world.yaml"
+    ]
+    assert result.stdout == dedent(
+        """\
+        >>> Applying and validating Tekton Tasks
+        >>> Validating Task: task/hello/0.1/hello.yaml
+        >>> Validating Task: task/hello/0.2/hello.yaml
+        INFO: Task YAML not found at 'task/kustomized/0.1/kustomized.yaml'. A non-YAML file was changed, skipping...
+        >>> Validating Task: task/world/0.1/world.yaml
+        task.tekton.dev/hello created (server dry run)
+        task.tekton.dev/hello created (server dry run)
+        task.tekton.dev/world created (server dry run)
+        >>> All changed tasks validated successfully.
+        """
+    )
+
+
+@pytest.mark.parametrize("github_actions", [False, True])
+def test_invalid_tasks(
+    repo_path: Path, monkeypatch: pytest.MonkeyPatch, github_actions: bool
+) -> None:
+    """The errors should be mapped to the task files, all the tasks should still be validated."""
+    monkeypatch.setenv("GITHUB_ACTIONS", str(github_actions).lower())
+    write_files(
+        repo_path,
+        {
+            "task/hello/0.2/hello.yaml": task("hello", valid=False),
+            "task/world/0.1/world.yaml": task("world", valid=False),
+        },
+    )
+
+    result, calls = run_check(repo_path, "task/hello/0.1", "task/hello/0.2", "task/world/0.1")
+
+    assert result.returncode == 1
+    assert len(calls) == 1
+    error = (
+        'Error from server (BadRequest): error when creating "{path}": admission webhook '
+        '"validation.webhook.pipeline.tekton.dev" denied the request: 100{percent} invalid'
+    )
+    assert result.stderr == "".join(
+        error.format(path=path, percent="%") + "\n"
+        for path in ("task/hello/0.2/hello.yaml", "task/world/0.1/world.yaml")
+    )
+
+    annotations = [line for line in result.stdout.splitlines() if line.startswith("::error")]
+    if github_actions:
+        assert annotations == [
+            f"::error file={path},line=1,col=0::" + error.format(path=path, percent="%25")
+            for path in ("task/hello/0.2/hello.yaml", "task/world/0.1/world.yaml")
+        ]
+    else:
+        assert annotations == []
+    assert "task.tekton.dev/hello created (server dry run)\n" in result.stdout
+    assert result.stdout.endswith(">>> Validation of the changed tasks failed.\n")
+
+
+def test_nothing_to_validate(repo_path: Path) -> None:
+    """kubectl should not be called without any task files."""
+    result, calls = run_check(repo_path)
+    assert result.stdout == "No changed task directories provided, nothing to validate\n"
+
+    result, calls = run_check(repo_path, "task/kustomized/0.1")
+    assert result.returncode == 0
+    assert calls == []
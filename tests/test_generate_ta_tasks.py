@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+"""Integration tests for hack/generate_ta_tasks.py.
+
+Each test creates a git repo at tmp_path with a task and a recipe for its Trusted Artifacts
+variant, executes the hack/generate_ta_tasks.py script with a stub generator and checks
+the results.
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+from conftest import write_files
+
+SCRIPT_PATH = Path(__file__).parent.parent / "hack" / "generate_ta_tasks.py"
+
+# Outputs the base task of the recipe with '-oci-ta' appended to the name,
+# logs the recipes to $GENERATOR_STUB_LOG
+STUB_GENERATOR = dedent(
+    """\
+    #!{python}
+    import os, re, sys
+    from pathlib import Path
+
+    recipe = Path(sys.argv[1])
+    with open(os.environ["GENERATOR_STUB_LOG"], "a") as log:
+        print(recipe.relative_to(Path.cwd()), file=log)
+
+    base = re.search(r"^base: (.*)$", recipe.read_text(), re.MULTILINE).group(1)
+    if base == "INVALID":
+        sys.exit("error: invalid base task")
+    task = (recipe.parent / base).read_text()
+    print(re.sub(r"^(  name: .*)$", r"\\1-oci-ta", task, flags=re.MULTILINE))
+    """
+)
+
+
+def task(name: str, step: str = "build") -> str:
+    return f"kind: Task\nmetadata:\n  name: {name}\nspec:\n  steps:\n    - name: {step}\n"
+
+
+def recipe(base: str) -> str:
+    return f"---\nbase: {base}\nremoveWorkspaces:\n  - source\n"
+
+
+def git(repo_path: Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", "-c", "user.name=Test User", "-c", "user.email=test@example.com", *args],
+        cwd=repo_path,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+
+@pytest.fixture(autouse=True)
+def disable_github_actions(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Disable GitHub Actions mode for all tests by default."""
+    monkeypatch.setenv("GITHUB_ACTIONS", "false")
+
+
+@pytest.fixture
+def generator(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """The stub trusted-artifacts generator."""
+    generator = tmp_path / "bin" / "trusted-artifacts"
+    generator.parent.mkdir()
+    generator.write_text(STUB_GENERATOR.format(python=sys.executable))
+    generator.chmod(0o755)
+    monkeypatch.setenv("GENERATOR_STUB_LOG", str(tmp_path / "generator.log"))
+    return generator
+
+
+@pytest.fixture
+def repo_path(tmp_path: Path) -> Path:
+    """A git repo with two tasks and up-to-date Trusted Artifacts variants, all committed."""
+    repo_path = tmp_path / "repo"
+    write_files(
+        repo_path,
+        {
+            "task/hello/0.1/hello.yaml": task("hello"),
+            "task/hello-oci-ta/0.1/recipe.yaml": recipe("../../hello/0.1/hello.yaml"),
+            "task/hello-oci-ta/0.1/hello-oci-ta.yaml": task("hello-oci-ta"),
+            "task/world/0.1/world.yaml": task("world"),
+            "task/world-oci-ta/0.1/recipe.yaml": recipe("../../world/0.1/world.yaml"),
+            "task/world-oci-ta/0.1/world-oci-ta.yaml": task("world-oci-ta"),
+        },
+    )
+    git(repo_path, "init", "-q")
+    git(repo_path, "add", ".")
+    git(repo_path, "commit", "-q", "-m", "Initial commit")
+    return repo_path
+
+
+def run_generate_ta_tasks(
+    repo_path: Path, generator: Path, *args: str, expect_failure: bool = False
+) -> tuple[subprocess.CompletedProcess[str], list[str]]:
+    """Run the generate_ta_tasks script, return the process and the recipes it generated."""
+    generator_log = Path(os.environ["GENERATOR_STUB_LOG"])
+    generator_log.unlink(missing_ok=True)
+
+    result = subprocess.run(
+        [sys.executable, SCRIPT_PATH, "--generator", generator, *args],
+        cwd=repo_path,
+        capture_output=True,
+        text=True,
+    )
+
+    if not expect_failure and result.returncode != 0:
+        pytest.fail(
+            f"generate_ta_tasks.py failed unexpectedly:\n"
+            f"stdout: {result.stdout}\nstderr: {result.stderr}"
+        )
+
+    generated = generator_log.read_text().splitlines() if generator_log.exists() else []
+    return result, sorted(generated)
+
+
+ALL_RECIPES = ["hello-oci-ta/0.1/recipe.yaml", "world-oci-ta/0.1/recipe.yaml"]
+
+
+def test_up_to_date(repo_path: Path, generator: Path) -> None:
+    """Up-to-date tasks should not be reported, or generated again."""
+    result, generated = run_generate_ta_tasks(repo_path, generator, "--jobs", "2")
+    assert result.stdout == ""
+    assert generated == ALL_RECIPES
+
+    result, generated = run_generate_ta_tasks(repo_path, generator)
+    assert result.stdout == ""
+    assert generated == []
+
+
+def test_out_of_date(repo_path: Path, generator: Path) -> None:
+    """Tasks whose base task changed should be generated again and reported."""
+    run_generate_ta_tasks(repo_path, generator)
+    write_files(repo_path, {"task/hello/0.1/hello.yaml": task("hello", step="changed")})
+
+    result, generated = run_generate_ta_tasks(repo_path, generator)
+
+    assert generated == ["hello-oci-ta/0.1/recipe.yaml"]
+    assert (repo_path / "task/hello-oci-ta/0.1/hello-oci-ta.yaml").read_text() == task(
+        "hello-oci-ta", step="changed"
+    )
+    expected_output = dedent(
+        """\
+        INFO: \033[1mtask/hello-oci-ta/0.1/hello-oci-ta.yaml\033[0m File is out of date and has been updated
+        INFO: \033[1mMake sure to include the regenerated files in your changeset\033[0m
+        """
+    )
+    assert result.stdout == expected_output
+
+    # Not generated again, but still different from HEAD
+    result, generated = run_generate_ta_tasks(repo_path, generator)
+    assert generated == []
+    assert result.stdout == expected_output
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        pytest.param(
+            {"task/world-oci-ta/0.1/recipe.yaml": "---\nbase: ../../world/0.1/world.yaml\n"},
+            id="recipe",
+        ),
+        pytest.param(
+            {"task/world-oci-ta/0.1/world-oci-ta.yaml": "manual edit\n"}, id="manual-edit"
+        ),
+    ],
+)
+def test_regenerate_changed(repo_path: Path, generator: Path, change: dict[str, str]) -> None:
+    """Changes to the recipe or to the generated task itself should trigger a re-generation."""
+    run_generate_ta_tasks(repo_path, generator)
+    write_files(repo_path, change)
+
+    _, generated = run_generate_ta_tasks(repo_path, generator)
+
+    assert generated == ["world-oci-ta/0.1/recipe.yaml"]
+
+
+def test_regenerate_all(repo_path: Path, generator: Path) -> None:
+    """--regenerate and a different generator binary should generate all the tasks."""
+    run_generate_ta_tasks(repo_path, generator)
+
+    _, generated = run_generate_ta_tasks(repo_path, generator, "--regenerate")
+    assert generated == ALL_RECIPES
+
+    generator.write_text(generator.read_text() + "# new version\n")
+    _, generated = run_generate_ta_tasks(repo_path, generator)
+    assert generated == ALL_RECIPES
+
+
+def test_github_actions(repo_path: Path, generator: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """In GitHub Actions, out-of-date tasks are errors and the fix gets saved in ta.patch."""
+    monkeypatch.setenv("GITHUB_ACTIONS", "true")
+    write_files(repo_path, {"task/hello/0.1/hello.yaml": task("hello", step="changed")})
+
+    result, _ = run_generate_ta_tasks(repo_path, generator, expect_failure=True)
+
+    assert result.returncode == 1
+    patch = (repo_path / "ta.patch").read_text()
+    assert "-    - name: build\n+    - name: changed\n" in patch
+    assert result.stdout == (
+        "::error file=task/hello-oci-ta/0.1/hello-oci-ta.yaml,line=1,col=0::"
+        "File is out of date, run `hack/generate-ta-tasks.sh` and include the updated file "
+        "with your changes.\n"
+        "::notice title=Apply the attached patch::"
+        "Download the attached `ta.patch` file and run `git apply ta.patch`\n" + patch
+    )
+
+
+def test_generator_failure(repo_path: Path, generator: Path) -> None:
+    """A failed generation should be reported, the other generations should go on."""
+    write_files(repo_path, {"task/hello-oci-ta/0.1/recipe.yaml": recipe("INVALID")})
+
+    result, generated = run_generate_ta_tasks(repo_path, generator, expect_failure=True)
+
+    assert result.returncode == 1
+    assert generated == ALL_RECIPES
+    assert result.stderr == dedent(
+        """\
+        failed to generate task/hello-oci-ta/0.1/hello-oci-ta.yaml from task/hello-oci-ta/0.1/recipe.yaml:
+        error: invalid base task
+        """
+    )
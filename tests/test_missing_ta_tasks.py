@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+"""Integration tests for hack/missing_ta_tasks.py.
+
+Each test creates a git repo at tmp_path with some tasks, executes the
+hack/missing_ta_tasks.py script in the repo and checks the output.
+"""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+from conftest import write_files
+
+HACK_DIR = Path(__file__).parent.parent / "hack"
+
+
+def task(*workspaces: str, kind: str = "Task") -> str:
+    """Generate task YAML content."""
+    content = dedent(
+        f"""\
+        apiVersion: tekton.dev/v1
+        kind: {kind}
+        metadata:
+          name: test
+        spec:
+          steps:
+            - name: test
+              image: test:latest
+              script: |
+                echo "workspaces:"
+        """
+    )
+    if workspaces:
+        content += "  workspaces:\n"
+        content += "".join(f"    - name: {ws}\n      optional: false\n" for ws in workspaces)
+    return content
+
+
+@pytest.fixture(autouse=True)
+def disable_github_actions(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Disable GitHub Actions mode for all tests by default."""
+    monkeypatch.setenv("GITHUB_ACTIONS", "false")
+
+
+@pytest.fixture
+def repo_path(tmp_path: Path) -> Path:
+    """A git repo with the script and the versioning.py module it imports."""
+    (tmp_path / "hack").mkdir()
+    for script in ("missing_ta_tasks.py", "versioning.py"):
+        (tmp_path / "hack" / script).write_text((HACK_DIR / script).read_text())
+    subprocess.run(["git", "init", "-q", tmp_path], check=True)
+    return tmp_path
+
+
+def run_missing_ta_tasks(
+    repo_path: Path, expect_failure: bool = False
+) -> subprocess.CompletedProcess[str]:
+    """Run the missing_ta_tasks script and return the completed process."""
+    result = subprocess.run(
+        [sys.executable, "hack/missing_ta_tasks.py"],
+        cwd=repo_path,
+        capture_output=True,
+        text=True,
+    )
+
+    if not expect_failure and result.returncode != 0:
+        pytest.fail(
+            f"missing_ta_tasks.py failed unexpectedly:\n"
+            f"stdout: {result.stdout}\nstderr: {result.stderr}"
+        )
+
+    return result
+
+
+def missing_error(task_path: str, workspaces: str, ta_dir: str) -> str:
+    return (
+        f"ERROR: \033[1m{task_path}\033[0m Task is using a workspace(s): {workspaces}, to share "
+        f"data and needs a corresponding Trusted Artifacts Task variant in {ta_dir}\n"
+    )
+
+
+def test_missing_ta_variants(repo_path: Path) -> None:
+    """Tasks that use workspaces need a TA variant, unless there's a newer version."""
+    write_files(
+        repo_path,
+        {
+            "task/needs-ta/0.1/needs-ta.yaml": task("source", "cache"),
+            "task/has-ta/0.1/has-ta.yaml": task("source"),
+            "task/has-ta-oci-ta/0.1/has-ta-oci-ta.yaml": task(),
+            "task/no-workspaces/0.1/no-workspaces.yaml": task(),
+            "task/not-a-task/0.1/not-a-task.yaml": task("source", kind="Pipeline"),
+            "task/not-a-task/0.1/kustomization.yaml": task("source"),
+            # 0.10 is newer than 0.9, even though "0.10" < "0.9"
+            "task/old/0.9/old.yaml": task("source"),
+            "task/old/0.10/old.yaml": task(),
+            "task/latest/0.10/latest.yaml": task("source"),
+            "task/latest/0.9/latest.yaml": task(),
+        },
+    )
+
+    result = run_missing_ta_tasks(repo_path)
+
+    assert result.stdout == (
+        missing_error("task/latest/0.10/latest.yaml", '["source"]', "task/latest-oci-ta/0.10/")
+        + missing_error(
+            "task/needs-ta/0.1/needs-ta.yaml", '["source","cache"]', "task/needs-ta-oci-ta/0.1/"
+        )
+    )
+
+
+@pytest.mark.parametrize(
+    "workspaces_yaml",
+    [
+        pytest.param("  workspaces:\n  - name: source\n  - name: cache\n", id="indentless"),
+        pytest.param(
+            "  workspaces:\n    - description: Source\n      name: 'source'\n"
+            '    - name: "cache" # comment\n',
+            id="name-not-first",
+        ),
+        pytest.param("  workspaces: [{name: source}, {name: cache}]\n", id="flow"),
+    ],
+)
+def test_workspaces_yaml_styles(repo_path: Path, workspaces_yaml: str) -> None:
+    """The workspaces should be found in the various styles of YAML."""
+    write_files(
+        repo_path,
+        {
+            "task/hello/0.1/hello.yaml": task() + workspaces_yaml + "  params: []\n",
+        },
+    )
+
+    result = run_missing_ta_tasks(repo_path)
+
+    assert result.stdout == missing_error(
+        "task/hello/0.1/hello.yaml", '["source","cache"]', "task/hello-oci-ta/0.1/"
+    )
+
+
+def test_ignore_file(repo_path: Path) -> None:
+    """The ignore file should ignore task paths and workspaces, .github/ takes precedence."""
+    write_files(
+        repo_path,
+        {
+            ".github/.ta-ignore.yaml": dedent(
+                """\
+                # Task paths (glob patterns) to ignore
+                paths:
+                  - task/ignored*
+                workspaces:
+                  - netrc
+                """
+            ),
+            ".ta-ignore.yaml": "paths:\n  - task/*\n",
+            "task/ignored-task/0.1/ignored-task.yaml": task("source"),
+            "task/only-netrc/0.1/only-netrc.yaml": task("netrc"),
+            "task/netrc-and-source/0.1/netrc-and-source.yaml": task("netrc", "source"),
+        },
+    )
+
+    result = run_missing_ta_tasks(repo_path)
+
+    assert result.stdout == (
+        "Using ignorefile: .github/.ta-ignore.yaml\n"
+        "Ignored paths: task/ignored*\n"
+        "Ignored workspaces: netrc\n"
+        + missing_error(
+            "task/netrc-and-source/0.1/netrc-and-source.yaml",
+            '["source"]',
+            "task/netrc-and-source-oci-ta/0.1/",
+        )
+    )
+
+
+def test_symlinks_skipped(repo_path: Path) -> None:
+    """Symlinked (archived) tasks should be skipped."""
+    write_files(repo_path, {"archive/hello/0.1/hello.yaml": task("source")})
+    (repo_path / "task" / "hello" / "0.1").mkdir(parents=True)
+    (repo_path / "task" / "hello" / "0.1" / "hello.yaml").symlink_to(
+        repo_path / "archive" / "hello" / "0.1" / "hello.yaml"
+    )
+
+    result = run_missing_ta_tasks(repo_path)
+
+    assert result.stdout == "skipping task/hello/0.1/hello.yaml (is a symlink) ...\n"
+
+
+def test_github_actions(repo_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """In GitHub Actions, missing variants are errors and fail the check."""
+    monkeypatch.setenv("GITHUB_ACTIONS", "true")
+    write_files(repo_path, {"task/hello/0.1/hello.yaml": task("source")})
+
+    result = run_missing_ta_tasks(repo_path, expect_failure=True)
+
+    assert result.returncode == 1
+    assert result.stdout == (
+        "::error file=task/hello/0.1/hello.yaml,line=1,col=0::Task is using a workspace(s): "
+        '["source"], to share data and needs a corresponding Trusted Artifacts Task variant '
+        "in task/hello-oci-ta/0.1/\n"
+        "::notice title=Missing Trusted Artifact Task Variant::Found Tasks that share data via "
+        "workspaces without a corresponding Trusted Artifacts Variant. Please create the "
+        "Trusted Artifacts Variant of the Task as well\n"
+    )
@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+"""Integration tests for .github/scripts/run_task_tests.py.
+
+Each test creates a repo at tmp_path with some tasks and their tests, executes the
+run_task_tests.py script with stub kubectl and tkn commands and checks the results.
+The stubs simulate the pipelineruns: they finish after a couple of status updates and
+fail if the test pipeline has a stub/fails-in annotation.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+from conftest import write_files
+
+SCRIPT_PATH = Path(__file__).parent.parent / ".github" / "scripts" / "run_task_tests.py"
+
+STUB_KUBECTL = dedent(
+    """\
+    #!{python}
+    import json, os, re, sys, time
+    from pathlib import Path
+
+    args = sys.argv[1:]
+    ns = None
+    if "-n" in args:
+        i = args.index("-n")
+        ns = args[i + 1]
+        del args[i : i + 2]
+    state = Path(os.environ["STUB_STATE_DIR"])
+    with open(state / "kubectl.log", "a") as log:
+        print(ns, *args, file=log)
+
+    def marker(kind, name):
+        return state / (f"{{kind}}-{{name}}" if kind == "namespace" else f"{{ns}}-{{kind}}-{{name}}")
+
+    def pipelinerun(name):
+        pipeline = (state / f"{{ns}}-pipelinerun-{{name}}").read_text()
+        fails_in = re.search(r"stub/fails-in: (\\S+)", pipeline)
+        return fails_in.group(1) if fails_in else None
+
+    def conditions(status):
+        return {{"conditions": [{{"type": "Succeeded", "status": status}}]}}
+
+    match args:
+        case ["get", ("namespace" | "sa") as kind, name]:
+            sys.exit(0 if marker(kind, name).exists() else 1)
+        case ["create", ("namespace" | "sa") as kind, name]:
+            marker(kind, name).touch()
+        case ["create", "-f", path, "--dry-run=client", "-o", "yaml"]:
+            print(Path(path).read_text(), end="")
+        case ["apply", "-f", path]:
+            print(f"task.tekton.dev/{{Path(path).stem}} configured")
+        case ["apply", "-f", path, "-o", "json"]:
+            resources = []
+            for content in Path(path).read_text().split("---\\n"):
+                kind = re.search(r"^kind: (\\S+)", content, re.MULTILINE).group(1)
+                name = re.search(r"^  name: (\\S+)", content, re.MULTILINE).group(1)
+                marker(kind.lower(), name).write_text(content)
+                annotations = dict(re.findall(r"^    (\\S+): (\\S+)", content, re.MULTILINE))
+                resources.append({{"kind": kind, "metadata": {{"name": name, "annotations": annotations}}}})
+            if len(resources) > 1:
+                print(json.dumps({{"kind": "List", "items": resources}}))
+            else:
+                print(json.dumps(resources[0]))
+        case ["get", kind, "--field-selector", selector, "--watch", "-o", "name", _]:
+            name = selector.removeprefix("metadata.name=")
+            if marker(kind, name).exists():
+                print(f"{{kind}}.tekton.dev/{{name}}", flush=True)
+                time.sleep(60)  # a watch doesn't end by itself
+            # otherwise, the watch times out
+        case ["get", "pipelinerun", name, "--watch", "-o", _, _]:
+            # Wait for the other watches, if there should be some in parallel
+            marker("watching", name).touch()
+            deadline = time.monotonic() + 5
+            while len(list(state.glob("*-watching-*"))) < int(os.getenv("STUB_WATCHES", "1")):
+                if time.monotonic() > deadline:
+                    sys.exit("error: no other watches")
+                time.sleep(0.05)
+            for status in "", "Unknown", "False" if pipelinerun(name) else "True":
+                print(status, flush=True)
+                time.sleep(0.05)
+            # A watch doesn't end by itself
+            time.sleep(60)
+        case ["get", "pipelinerun", name, "-o", "json"]:
+            fails_in = pipelinerun(name)
+            refs = [{{"name": f"{{name}}-{{task}}", "pipelineTaskName": task}} for task in ("prepare", fails_in) if task]
+            status = conditions("False" if fails_in else "True") | {{"childReferences": refs}}
+            print(json.dumps({{"status": status}}))
+        case ["get", "taskrun", name, "-o", "json"]:
+            print(json.dumps({{"status": conditions("True" if name.endswith("-prepare") else "False")}}))
+        case _:
+            sys.exit(f"stub kubectl: unexpected arguments: {{args}}")
+    """
+)
+
+STUB_TKN = dedent(
+    """\
+    #!{python}
+    import json, os, sys
+    from pathlib import Path
+
+    state = Path(os.environ["STUB_STATE_DIR"])
+    match sys.argv[1:]:
+        case ["pipeline", "start", name, "-w", workspace, "-o", "json", "-n", ns]:
+            assert workspace.startswith("name=tests-workspace,volumeClaimTemplateFile=")
+            assert Path(workspace.rpartition("=")[2]).is_file()
+            run_name = f"{{name}}-run"
+            pipeline = (state / f"{{ns}}-pipeline-{{name}}").read_text()
+            (state / f"{{ns}}-pipelinerun-{{run_name}}").write_text(pipeline)
+            print(json.dumps({{"metadata": {{"name": run_name}}}}))
+        case ["pipelinerun", "logs", name, "-n", ns]:
+            print(f"[{{ns}}/{{name}}] test logs")
+        case args:
+            sys.exit(f"stub tkn: unexpected arguments: {{args}}")
+    """
+)
+
+
+def pipeline_yaml(name: str, fails_in: str | None = None, assert_failure: str | None = None) -> str:
+    annotations = ""
+    if fails_in:
+        annotations += f"    stub/fails-in: {fails_in}\n"
+    if assert_failure:
+        annotations += f"    test/assert-task-failure: {assert_failure}\n"
+    if annotations:
+        annotations = "  annotations:\n" + annotations
+    return f"apiVersion: tekton.dev/v1\nkind: Pipeline\nmetadata:\n  name: {name}\n{annotations}"
+
+
+HOOK = dedent(
+    """\
+    #!/bin/bash
+    echo "hook: $(basename "$1") $2"
+    sed -i 's/hello/modified/' "$1"
+    """
+)
+
+
+@pytest.fixture
+def repo_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """A repo with two tasks with tests, and the stub kubectl and tkn."""
+    repo_path = tmp_path / "repo"
+    write_files(
+        repo_path,
+        {
+            "task/hello/0.1/hello.yaml": "kind: Task\nmetadata:\n  name: hello\n",
+            "task/hello/0.1/tests/test-hello.yaml": pipeline_yaml("test-hello"),
+            "task/hello/0.1/tests/test-hello-fails.yaml": pipeline_yaml(
+                "test-hello-fails", fails_in="run-task", assert_failure="run-task"
+            ),
+            "task/hello/0.1/tests/pre-apply-task-hook.sh": HOOK,
+            "task/world/0.2/world.yaml": "kind: Task\nmetadata:\n  name: world\n",
+            "task/world/0.2/tests/test-world.yaml": pipeline_yaml("test-world"),
+            "task/no-tests/0.1/no-tests.yaml": "kind: Task\n",
+            "task/no-tests/0.1/tests/README.md": "",
+            "task/unversioned/unversioned.yaml": "kind: Task\n",
+            "task/unversioned/tests/test-unversioned.yaml": pipeline_yaml("test-unversioned"),
+        },
+    )
+    (repo_path / "task/hello/0.1/tests/pre-apply-task-hook.sh").chmod(0o755)
+
+    bin_dir = tmp_path / "bin"
+    for name, stub in ("kubectl", STUB_KUBECTL), ("tkn", STUB_TKN):
+        write_files(bin_dir, {name: stub.format(python=sys.executable)})
+        (bin_dir / name).chmod(0o755)
+    state_dir = tmp_path / "state"
+    state_dir.mkdir()
+
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("KUBECTL_CMD", str(bin_dir / "kubectl"))
+    monkeypatch.setenv("STUB_STATE_DIR", str(state_dir))
+    monkeypatch.delenv("TEST_ITEMS", raising=False)
+    return repo_path
+
+
+def run_task_tests(
+    repo_path: Path, *args: str, expect_failure: bool = False
+) -> subprocess.CompletedProcess[str]:
+    result = subprocess.run(
+        [sys.executable, SCRIPT_PATH, "--logs-dir", repo_path.parent / "logs", *args],
+        cwd=repo_path,
+        capture_output=True,
+        text=True,
+    )
+
+    if not expect_failure and result.returncode != 0:
+        pytest.fail(
+            f"run_task_tests.py failed unexpectedly:\n"
+            f"stdout: {result.stdout}\nstderr: {result.stderr}"
+        )
+
+    return result
+
+
+def read_results(repo_path: Path) -> dict[str, tuple[bool, str]]:
+    results = json.loads((repo_path.parent / "logs" / "results.json").read_text())
+    return {result["test_path"]: (result["passed"], result["message"]) for result in results}
+
+
+def test_run_tests(repo_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The task versions should be tested in parallel, each in its own namespace."""
+    # The stub watches wait until both task versions are being tested
+    monkeypatch.setenv("STUB_WATCHES", "2")
+
+    result = run_task_tests(repo_path, "task/hello/0.1", "task/world/0.2", "--jobs", "2")
+
+    assert read_results(repo_path) == {
+        "task/hello/0.1/tests/test-hello-fails.yaml": (True, "Taskrun failed as expected"),
+        "task/hello/0.1/tests/test-hello.yaml": (True, "Pipelinerun test-hello succeeded"),
+        "task/world/0.2/tests/test-world.yaml": (True, "Pipelinerun test-world succeeded"),
+    }
+    assert result.stdout.endswith(
+        dedent(
+            f"""\
+            ========== Summary ==========
+            PASSED: task/hello/0.1/tests/test-hello-fails.yaml: Taskrun failed as expected
+            PASSED: task/hello/0.1/tests/test-hello.yaml: Pipelinerun test-hello succeeded
+            PASSED: task/world/0.2/tests/test-world.yaml: Pipelinerun test-world succeeded
+            INFO: Logs and results of the tests are in {repo_path.parent / "logs"}
+            """
+        )
+    )
+
+    logs_dir = repo_path.parent / "logs"
+    test_log = (logs_dir / "hello-0-1" / "test-hello.log").read_text()
+    assert test_log == dedent(
+        """\
+        ========== Starting Test Pipeline: task/hello/0.1/tests/test-hello.yaml ==========
+        INFO: Installing test pipeline: task/hello/0.1/tests/test-hello.yaml
+        INFO: Started pipelinerun: test-hello-run
+        DEBUG: PipelineRun test-hello-run is in progress (status None). Waiting for update...
+        DEBUG: PipelineRun test-hello-run is in progress (status Unknown). Waiting for update...
+        [hello-0-1/test-hello-run] test logs
+        INFO: Pipelinerun test-hello succeeded
+        ========== Completed: task/hello/0.1/tests/test-hello.yaml ==========
+        """
+    )
+    assert test_log in result.stdout
+
+    # The hook modifies a copy of the task
+    setup_log = (logs_dir / "hello-0-1" / "setup.log").read_text()
+    assert "hook: hello.yaml hello-0-1\n" in setup_log
+    assert (logs_dir / "hello-0-1" / "hello.yaml").read_text() == (
+        "kind: Task\nmetadata:\n  name: modified\n"
+    )
+    assert (repo_path / "task/hello/0.1/hello.yaml").read_text() == (
+        "kind: Task\nmetadata:\n  name: hello\n"
+    )
+
+    kubectl_log = (repo_path.parent / "state" / "kubectl.log").read_text().splitlines()
+    assert "None create namespace world-0-2" in kubectl_log
+    assert "world-0-2 create sa appstudio-pipeline" in kubectl_log
+
+
+def test_failures(repo_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Failed tests should be reported, the other tests should still run."""
+    write_files(
+        repo_path,
+        {
+            "task/world/0.2/tests/test-world.yaml": pipeline_yaml("test-world", fails_in="x"),
+            "task/world/0.2/tests/test-world-succeeds.yaml": pipeline_yaml(
+                "test-world-succeeds", assert_failure="run-task"
+            ),
+            "task/world/0.2/tests/test-world-elsewhere.yaml": pipeline_yaml(
+                "test-world-elsewhere", fails_in="prepare", assert_failure="run-task"
+            ),
+        },
+    )
+    monkeypatch.setenv("TEST_ITEMS", "task/hello/0.1/tests/test-hello.yaml task/world/0.2")
+
+    result = run_task_tests(repo_path, "-j", "1", expect_failure=True)
+
+    assert result.returncode == 1
+    assert read_results(repo_path) == {
+        "task/hello/0.1/tests/test-hello.yaml": (True, "Pipelinerun test-hello succeeded"),
+        "task/world/0.2/tests/test-world-elsewhere.yaml": (
+            False,
+            "Unable to find task run-task in childReferences of pipelinerun "
+            "test-world-elsewhere-run. Pipelinerun failed earlier?",
+        ),
+        "task/world/0.2/tests/test-world-succeeds.yaml": (
+            False,
+            "Pipeline test-world-succeeds is succeeded but was expected to fail",
+        ),
+        "task/world/0.2/tests/test-world.yaml": (False, "Pipelinerun test-world failed"),
+    }
+    assert "FAILED: task/world/0.2/tests/test-world.yaml: Pipelinerun test-world failed\n" in (
+        result.stdout
+    )
+
+
+def test_several_documents(repo_path: Path) -> None:
+    """A test file can define other resources besides the Pipeline."""
+    configmap = "apiVersion: v1\nkind: ConfigMap\nmetadata:\n  name: test-data\n"
+    write_files(
+        repo_path,
+        {"task/world/0.2/tests/test-world.yaml": f"{configmap}---\n{pipeline_yaml('test-world')}"},
+    )
+
+    run_task_tests(repo_path, "task/world/0.2")
+
+    assert read_results(repo_path) == {
+        "task/world/0.2/tests/test-world.yaml": (True, "Pipelinerun test-world succeeded"),
+    }
+
+
+def test_errors_fail_single_tests(repo_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Errors (a missing tkn, a test file without a Pipeline) should not abort the whole run."""
+    configmap = "apiVersion: v1\nkind: ConfigMap\nmetadata:\n  name: test-data\n"
+    write_files(repo_path, {"task/world/0.2/tests/test-world.yaml": configmap})
+    # Drop the directory of the stubs, the kubectl stub is still in KUBECTL_CMD
+    monkeypatch.setenv("PATH", os.environ["PATH"].partition(os.pathsep)[2])
+
+    result = run_task_tests(
+        repo_path, "task/hello/0.1/tests/test-hello.yaml", "task/world/0.2", expect_failure=True
+    )
+
+    assert result.returncode == 1
+    assert read_results(repo_path) == {
+        "task/hello/0.1/tests/test-hello.yaml": (
+            False,
+            "cannot run tkn: [Errno 2] No such file or directory: 'tkn'",
+        ),
+        "task/world/0.2/tests/test-world.yaml": (
+            False,
+            "expected one Pipeline in task/world/0.2/tests/test-world.yaml, found 0",
+        ),
+    }
+    assert result.stdout.endswith(
+        f"INFO: Logs and results of the tests are in {repo_path.parent / 'logs'}\n"
+    )
+
+
+@pytest.mark.parametrize(
+    "item, error",
+    [
+        ("task/nope/0.1", "Invalid test yaml file or task directory: task/nope/0.1"),
+        ("task/no-tests/0.1/no-tests.yaml", "Invalid test yaml file or task directory: "),
+        ("task/no-tests", "Task file does not exist: task/no-tests/no-tests.yaml"),
+        ("task/unversioned", "Task directory without a version: task/unversioned"),
+    ],
+)
+def test_invalid_items(repo_path: Path, item: str, error: str) -> None:
+    """Invalid test items should fail the script before running any tests."""
+    result = run_task_tests(repo_path, "task/hello/0.1", item, expect_failure=True)
+
+    assert result.returncode == 1
+    assert result.stdout.startswith(f"ERROR: {error}")
+    assert not (repo_path.parent / "state" / "kubectl.log").exists()
+
+
+def test_no_tests(repo_path: Path) -> None:
+    """Task versions without tests should be skipped."""
+    result = run_task_tests(repo_path, "task/no-tests/0.1")
+
+    assert result.stdout.startswith(
+        "WARNING: No tests for test item task/no-tests/0.1 ... Skipping...\n"
+    )
+    assert read_results(repo_path) == {}
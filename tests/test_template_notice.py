@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+"""Integration tests for hack/template_notice.py.
+
+Each test writes some files into a directory at tmp_path, executes the
+hack/template_notice.py script on the directory and checks the results.
+"""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+from conftest import write_files
+
+SCRIPT_PATH = Path(__file__).parent.parent / "hack" / "template_notice.py"
+
+NOTICE = dedent(
+    """\
+    # <TEMPLATED FILE!>
+    # This file comes from the templates at https://github.com/konflux-ci/task-repo-shared-ci.
+    # Please consider sending a PR upstream instead of editing the file directly.
+    # See the SHARED-CI.md document in this repo for more details.
+    """
+)
+
+
+def read_files(path: Path) -> dict[str, str]:
+    """Read a file tree at 'path'."""
+    return {
+        filepath.relative_to(path).as_posix(): filepath.read_text()
+        for filepath in sorted(path.rglob("*"))
+        if filepath.is_file()
+    }
+
+
+def run_template_notice_script(
+    *args: str, expect_failure: bool = False
+) -> subprocess.CompletedProcess[str]:
+    """Run the template_notice script and return the completed process."""
+    result = subprocess.run(
+        [sys.executable, SCRIPT_PATH, *args],
+        capture_output=True,
+        text=True,
+    )
+
+    if not expect_failure and result.returncode != 0:
+        pytest.fail(
+            f"template_notice.py failed unexpectedly:\n"
+            f"stdout: {result.stdout}\nstderr: {result.stderr}"
+        )
+
+    return result
+
+
+@pytest.fixture
+def template_dir(tmp_path: Path) -> Path:
+    """A template directory with files that need the notice comment in various ways."""
+    write_files(
+        tmp_path,
+        {
+            "hack/script.sh": "#!/bin/bash\nset -e\n\necho hello\n",
+            "hack/no-blank-line.sh": "#!/bin/bash\necho hello\n",
+            "hack/outdated.py": (
+                "#!/usr/bin/env python\n\n# <TEMPLATED FILE!>\n# Outdated notice\n\nprint()\n"
+            ),
+            "resources/document.yaml": "---\nkind: Task\n",
+            "resources/up-to-date.yaml": NOTICE + "\nkind: Task\n",
+            "README.md": "# Hello\n",
+        },
+    )
+    return tmp_path
+
+
+EXPECTED_FILES = {
+    "README.md": "# Hello\n",
+    "hack/no-blank-line.sh": "#!/bin/bash\n\n" + NOTICE + "\necho hello\n",
+    "hack/outdated.py": "#!/usr/bin/env python\n\n" + NOTICE + "\nprint()\n",
+    "hack/script.sh": "#!/bin/bash\nset -e\n\n" + NOTICE + "\necho hello\n",
+    "resources/document.yaml": "---\n" + NOTICE + "\nkind: Task\n",
+    "resources/up-to-date.yaml": NOTICE + "\nkind: Task\n",
+}
+
+
+@pytest.mark.parametrize("jobs", ["1", "4"])
+def test_fix(template_dir: Path, jobs: str) -> None:
+    """fix should add or update the notice comments, in place."""
+    result = run_template_notice_script("fix", str(template_dir), "--jobs", jobs)
+
+    assert read_files(template_dir) == EXPECTED_FILES
+    assert result.stderr == dedent(
+        f"""\
+        skipping file, unsupported suffix (md): {template_dir}/README.md
+        fixed file: {template_dir}/hack/no-blank-line.sh
+        fixed file: {template_dir}/hack/outdated.py
+        fixed file: {template_dir}/hack/script.sh
+        fixed file: {template_dir}/resources/document.yaml
+        processed file: {template_dir}/resources/up-to-date.yaml
+        """
+    )
+
+    # Fixed files stay fixed
+    result = run_template_notice_script("check", str(template_dir))
+    assert result.stderr == ""
+
+
+def test_check(template_dir: Path) -> None:
+    """check should report the files that need a fix, without changing them."""
+    files = read_files(template_dir)
+
+    result = run_template_notice_script("check", str(template_dir), expect_failure=True)
+
+    assert result.returncode == 1
+    assert result.stderr == dedent(
+        f"""\
+        notice comment is missing or outdated: {template_dir}/hack/no-blank-line.sh
+        notice comment is missing or outdated: {template_dir}/hack/outdated.py
+        notice comment is missing or outdated: {template_dir}/hack/script.sh
+        notice comment is missing or outdated: {template_dir}/resources/document.yaml
+        """
+    )
+    assert read_files(template_dir) == files
+
+
+def test_fix_large_file(tmp_path: Path) -> None:
+    """fix should rewrite just the head of the file and keep the rest byte for byte."""
+    script = tmp_path / "script.sh"
+    # CRLF line endings and no newline at the end, fix should keep both
+    body = "".join(f"echo {i}\r\n" for i in range(10_000)) + "exit 0"
+    script.write_bytes(f"#!/bin/bash\r\n\r\n{body}".encode())
+    script.chmod(0o755)
+
+    run_template_notice_script("fix", str(tmp_path))
+
+    notice = NOTICE.replace("\n", "\r\n")
+    assert script.read_bytes() == f"#!/bin/bash\r\n\r\n{notice}\r\n{body}".encode()
+    assert script.stat().st_mode & 0o777 == 0o755
+    assert [path.name for path in tmp_path.iterdir()] == ["script.sh"]
@@ -0,0 +1,429 @@
+#!/usr/bin/env python
+"""Integration tests for hack/validate_migration.py.
+
+The apply-on-pipelines tests create a directory of pipelines at tmp_path and a migration
+script, the prepare-pipelines tests create a build-pipeline-config and a stub tkn. Then they
+execute the hack/validate_migration.py script and check the results.
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+# The script needs ruamel.yaml (see requirements-test.txt), fail right away if it's missing
+import ruamel.yaml  # noqa: F401
+
+from conftest import write_files
+
+SCRIPT_PATH = Path(__file__).parent.parent / "hack" / "validate_migration.py"
+
+# Outputs a pipeline named like the requested one, logs the bundles to $TKN_STUB_LOG
+STUB_TKN = dedent(
+    """\
+    #!/usr/bin/env bash
+    set -euo pipefail
+    # tkn bundle list <bundle> pipeline <name> -o yaml
+    echo "$3" >>"$TKN_STUB_LOG"
+    if [[ "$3" == *broken* ]]; then
+        echo "Error: failed to pull $3" >&2
+        exit 1
+    fi
+    printf 'kind: Pipeline\\nmetadata:\\n  name: %s\\n  annotations:\\n    bundle: %s\\n' "$5" "$3"
+    """
+)
+
+
+def pipeline(name: str, image: str = "quay.io/konflux-ci/buildah:0.1") -> str:
+    """Generate pipeline YAML content, with the sequences indented unlike ruamel.yaml does."""
+    return dedent(
+        f"""\
+        apiVersion: tekton.dev/v1
+        kind: Pipeline
+        metadata:
+          name: {name}
+        spec:
+          tasks:
+            - name: build
+              taskRef:
+                params:
+                  - name: bundle
+                    value: '{image}'
+        """
+    )
+
+
+@pytest.fixture
+def pipelines_dir(tmp_path: Path) -> Path:
+    pipelines_dir = tmp_path / "pipelines"
+    (pipelines_dir / "pushed").mkdir(parents=True)
+    (pipelines_dir / "pushed" / "docker-build.yaml").write_text(pipeline("docker-build"))
+    (pipelines_dir / "pushed" / "fbc-builder.yaml").write_text(
+        pipeline("fbc-builder", image="quay.io/konflux-ci/opm:0.1")
+    )
+    (pipelines_dir / "pushed" / "tekton-bundle-builder.yaml").write_text(
+        pipeline("tekton-bundle-builder")
+    )
+    return pipelines_dir
+
+
+def write_migration(tmp_path: Path, script: str) -> Path:
+    migration_file = tmp_path / "0.2.sh"
+    migration_file.write_text("#!/usr/bin/env bash\nset -euo pipefail\n" + dedent(script))
+    return migration_file
+
+
+def run_validate_migration(
+    migration_file: Path, pipelines_dir: Path, *args: str, expect_failure: bool = False
+) -> subprocess.CompletedProcess[str]:
+    """Run the apply-on-pipelines check and return the completed process."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            SCRIPT_PATH,
+            "apply-on-pipelines",
+            migration_file,
+            pipelines_dir,
+            *args,
+        ],
+        capture_output=True,
+        text=True,
+    )
+
+    if not expect_failure and result.returncode != 0:
+        pytest.fail(
+            f"validate_migration.py failed unexpectedly:\n"
+            f"stdout: {result.stdout}\nstderr: {result.stderr}"
+        )
+
+    return result
+
+
+def list_files(pipelines_dir: Path) -> list[str]:
+    return sorted(str(path.relative_to(pipelines_dir)) for path in pipelines_dir.rglob("*.*"))
+
+
+def test_modifies_pipelines(tmp_path: Path, pipelines_dir: Path) -> None:
+    """The modified pipelines should be saved into .modified files, and shown in diffs."""
+    migration_file = write_migration(
+        tmp_path,
+        """\
+        echo "migrating $1"
+        sed -i 's/buildah:0.1/buildah:0.2/' "$1"
+        """,
+    )
+
+    result = run_validate_migration(migration_file, pipelines_dir, "--jobs", "2")
+
+    assert list_files(pipelines_dir) == [
+        "pushed/docker-build.yaml",
+        "pushed/docker-build.yaml.modified",
+        "pushed/fbc-builder.yaml",
+        "pushed/tekton-bundle-builder.yaml",
+        "pushed/tekton-bundle-builder.yaml.modified",
+    ]
+    # Formatted the way pipeline-migration-tool formats YAML
+    assert (pipelines_dir / "pushed" / "docker-build.yaml.modified").read_text() == dedent(
+        """\
+        apiVersion: tekton.dev/v1
+        kind: Pipeline
+        metadata:
+          name: docker-build
+        spec:
+          tasks:
+          - name: build
+            taskRef:
+              params:
+              - name: bundle
+                value: 'quay.io/konflux-ci/buildah:0.2'
+        """
+    )
+
+    docker_build = pipelines_dir / "pushed" / "docker-build.yaml"
+    fbc_builder = pipelines_dir / "pushed" / "fbc-builder.yaml"
+    # The diffs only show the changes made by the migration, not the formatting
+    assert result.stdout.startswith(
+        dedent(
+            f"""\
+            ```diff
+            --- {docker_build}
+            +++ {docker_build}.copy
+            @@ -8,4 +8,4 @@
+                 taskRef:
+                   params:
+                   - name: bundle
+            -        value: 'quay.io/konflux-ci/buildah:0.1'
+            +        value: 'quay.io/konflux-ci/buildah:0.2'
+            ```
+            ```diff
+            ```
+            """
+        )
+    )
+    assert result.stdout.count("```diff\n") == 3
+    assert f"info: apply migration {migration_file} to pipeline {fbc_builder}.copy\n" in (
+        result.stderr
+    )
+    # Like the trace, the output of the migration is only shown if it fails
+    assert "migrating" not in result.stderr
+
+
+def test_migration_fails(tmp_path: Path, pipelines_dir: Path) -> None:
+    """A failed migration should be reported with its trace, the other pipelines still checked."""
+    migration_file = write_migration(
+        tmp_path,
+        """\
+        grep -q opm "$1" && echo "no opm support" && exit 1
+        sed -i 's/buildah:0.1/buildah:0.2/' "$1"
+        """,
+    )
+
+    result = run_validate_migration(migration_file, pipelines_dir, expect_failure=True)
+
+    assert result.returncode == 1
+    fbc_builder = pipelines_dir / "pushed" / "fbc-builder.yaml"
+    assert (
+        f"error: failed to run migration file {migration_file} on pipeline {fbc_builder}:\n"
+        f"+ set -euo pipefail\n"
+        f"+ grep -q opm {fbc_builder}.copy\n"
+        f"+ echo 'no opm support'\n"
+        f"no opm support\n"
+        f"+ exit 1\n"
+    ) in result.stderr
+    assert "pushed/docker-build.yaml.modified" in list_files(pipelines_dir)
+
+
+def test_invalid_yaml(tmp_path: Path, pipelines_dir: Path) -> None:
+    """A migration that breaks the YAML syntax should be reported as failed."""
+    migration_file = write_migration(
+        tmp_path,
+        """\
+        sed -i 's/buildah:0.1/buildah:0.2/' "$1"
+        grep -q opm "$1" && echo "  - [invalid" >>"$1"
+        exit 0
+        """,
+    )
+
+    result = run_validate_migration(migration_file, pipelines_dir, expect_failure=True)
+
+    assert result.returncode == 1
+    fbc_builder = pipelines_dir / "pushed" / "fbc-builder.yaml"
+    assert (
+        f"error: migration file {migration_file} made pipeline {fbc_builder} invalid:\n"
+        in result.stderr
+    )
+    assert "pushed/docker-build.yaml.modified" in list_files(pipelines_dir)
+
+
+def test_modifies_nothing(tmp_path: Path, pipelines_dir: Path) -> None:
+    """A migration that modifies none of the pipelines fails, reformatting doesn't count."""
+    migration_file = write_migration(
+        tmp_path,
+        """\
+        # Add spaces after the colons and at the ends of lines
+        sed -i -e 's/: /:   /' -e 's/$/  /' "$1"
+        """,
+    )
+
+    result = run_validate_migration(migration_file, pipelines_dir, expect_failure=True)
+
+    assert result.returncode == 1
+    assert result.stdout == "```diff\n```\n" * 3
+    assert result.stderr.endswith(
+        "info: check_apply_on_pipelines: migration file does not modify any of pipelines "
+        "docker-build fbc-builder tekton-bundle-builder\n"
+    )
+    assert list_files(pipelines_dir) == [
+        "pushed/docker-build.yaml",
+        "pushed/fbc-builder.yaml",
+        "pushed/tekton-bundle-builder.yaml",
+    ]
+
+
+def test_invalid_pipeline(tmp_path: Path, pipelines_dir: Path) -> None:
+    """An invalid pipeline should be reported, not crash the listing of the pipeline names."""
+    fbc_builder = pipelines_dir / "pushed" / "fbc-builder.yaml"
+    fbc_builder.write_text(fbc_builder.read_text() + "  - [invalid\n")
+    migration_file = write_migration(tmp_path, "true\n")
+
+    result = run_validate_migration(migration_file, pipelines_dir, expect_failure=True)
+
+    assert result.returncode == 1
+    assert f"error: pipeline {fbc_builder} is invalid:\n" in result.stderr
+    assert result.stderr.endswith(
+        "info: check_apply_on_pipelines: migration file does not modify any of pipelines "
+        "docker-build tekton-bundle-builder\n"
+    )
+
+
+def build_pipeline_config(**bundles: str) -> str:
+    """Generate a build-pipeline-config ConfigMap with the pipelines from the bundles."""
+    pipelines = "".join(
+        f"      - name: {name}\n        bundle: {bundle}\n" for name, bundle in bundles.items()
+    )
+    return (
+        "apiVersion: v1\nkind: ConfigMap\nmetadata:\n  name: build-pipeline-config\n"
+        "data:\n  config.yaml: |\n    default-pipeline-name: docker-build\n    pipelines:\n"
+        + pipelines
+    )
+
+
+DIGEST_A = "sha256:" + "a" * 64
+DIGEST_B = "sha256:" + "b" * 64
+BUNDLES = {
+    "docker-build": f"quay.io/konflux-ci/pipeline-docker-build:devel@{DIGEST_A}",
+    "fbc-builder": f"quay.io/konflux-ci/pipeline-fbc-builder:devel@{DIGEST_B}",
+}
+
+
+@pytest.fixture
+def tkn_log(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Put the stub tkn in PATH, return the path to the log of the bundles it fetched."""
+    tkn = tmp_path / "bin" / "tkn"
+    tkn.parent.mkdir()
+    tkn.write_text(STUB_TKN)
+    tkn.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tkn.parent}{os.pathsep}{os.environ['PATH']}")
+    tkn_log = tmp_path / "tkn.log"
+    monkeypatch.setenv("TKN_STUB_LOG", str(tkn_log))
+    return tkn_log
+
+
+def run_prepare_pipelines(
+    tmp_path: Path, *args: str, expect_failure: bool = False
+) -> tuple[subprocess.CompletedProcess[str], Path]:
+    """Run prepare-pipelines with the cache in tmp_path, return the process and pipelines dir."""
+    pipelines_dir = tmp_path / "work" / "pipelines"
+    if pipelines_dir.exists():
+        for path in pipelines_dir.rglob("*.yaml"):
+            path.unlink()
+
+    result = subprocess.run(
+        [
+            sys.executable,
+            SCRIPT_PATH,
+            "prepare-pipelines",
+            "--cache-dir",
+            tmp_path / "cache",
+            *args,
+            pipelines_dir,
+        ],
+        capture_output=True,
+        text=True,
+    )
+
+    if not expect_failure and result.returncode != 0:
+        pytest.fail(
+            f"validate_migration.py failed unexpectedly:\n"
+            f"stdout: {result.stdout}\nstderr: {result.stderr}"
+        )
+
+    return result, pipelines_dir
+
+
+def read_log(log: Path) -> list[str]:
+    lines = log.read_text().splitlines() if log.exists() else []
+    log.unlink(missing_ok=True)
+    return sorted(lines)
+
+
+def test_prepare_pipelines_cached(tmp_path: Path, tkn_log: Path) -> None:
+    """The pipelines should be fetched once per bundle digest, then taken from the cache."""
+    config = tmp_path / "build-pipeline-config.yaml"
+    config.write_text(build_pipeline_config(**BUNDLES))
+
+    result, pipelines_dir = run_prepare_pipelines(tmp_path, "--config", str(config))
+
+    assert read_log(tkn_log) == sorted(BUNDLES.values())
+    assert list_files(pipelines_dir) == ["pushed/docker-build.yaml", "pushed/fbc-builder.yaml"]
+    docker_build = (pipelines_dir / "pushed" / "docker-build.yaml").read_text()
+    assert "  name: docker-build\n" in docker_build
+    assert f"info: fetch pipeline docker-build from bundle {BUNDLES['docker-build']}" in (
+        result.stderr
+    )
+
+    result, pipelines_dir = run_prepare_pipelines(tmp_path, "--config", str(config))
+
+    assert read_log(tkn_log) == []
+    assert (pipelines_dir / "pushed" / "docker-build.yaml").read_text() == docker_build
+    assert f"info: use cached pipeline docker-build from bundle {BUNDLES['docker-build']}" in (
+        result.stderr
+    )
+
+    # A new digest is a new bundle, a tag can point to a different bundle at any time
+    new_bundle = f"quay.io/konflux-ci/pipeline-docker-build:devel@sha256:{'c' * 64}"
+    tag_bundle = "quay.io/konflux-ci/pipeline-fbc-builder:devel"
+    config.write_text(
+        build_pipeline_config(**{"docker-build": new_bundle, "fbc-builder": tag_bundle})
+    )
+
+    run_prepare_pipelines(tmp_path, "--config", str(config), "--jobs", "1")
+    assert read_log(tkn_log) == [new_bundle, tag_bundle]
+    run_prepare_pipelines(tmp_path, "--config", str(config), "--jobs", "1")
+    assert read_log(tkn_log) == [tag_bundle]
+
+    assert sorted(p.name for p in (tmp_path / "cache" / "bundles").iterdir()) == [
+        f"sha256-{c * 64}" for c in "abc"
+    ]
+
+
+def test_prepare_pipelines_offline(tmp_path: Path, tkn_log: Path) -> None:
+    """Offline, the config and the pipelines should only come from the cache directory."""
+    cache_dir = tmp_path / "cache"
+    write_files(
+        cache_dir,
+        {
+            "build-pipeline-config.yaml": build_pipeline_config(**BUNDLES),
+            f"bundles/sha256-{'a' * 64}/docker-build.yaml": pipeline("docker-build"),
+            f"bundles/sha256-{'b' * 64}/fbc-builder.yaml": pipeline("fbc-builder"),
+        },
+    )
+
+    _, pipelines_dir = run_prepare_pipelines(
+        tmp_path, "--offline", "--config", "https://example.com/build-pipeline-config.yaml"
+    )
+
+    assert read_log(tkn_log) == []
+    assert (pipelines_dir / "pushed" / "fbc-builder.yaml").read_text() == pipeline("fbc-builder")
+
+    (cache_dir / f"bundles/sha256-{'b' * 64}/fbc-builder.yaml").unlink()
+    result, _ = run_prepare_pipelines(
+        tmp_path,
+        "--offline",
+        "--config",
+        "https://example.com/build-pipeline-config.yaml",
+        expect_failure=True,
+    )
+
+    assert result.returncode == 1
+    assert read_log(tkn_log) == []
+    assert (
+        f"error: pipeline fbc-builder from bundle {BUNDLES['fbc-builder']} is not in the cache "
+        f"{cache_dir} (offline)\n"
+    ) in result.stderr
+
+
+def test_prepare_pipelines_tkn_fails(tmp_path: Path, tkn_log: Path) -> None:
+    """A failed fetch should be reported, and not cached."""
+    broken_bundle = f"quay.io/konflux-ci/pipeline-broken:devel@{DIGEST_B}"
+    config = tmp_path / "build-pipeline-config.yaml"
+    config.write_text(
+        build_pipeline_config(**{"docker-build": BUNDLES["docker-build"], "broken": broken_bundle})
+    )
+
+    result, pipelines_dir = run_prepare_pipelines(
+        tmp_path, "--config", str(config), expect_failure=True
+    )
+
+    assert result.returncode == 1
+    assert (
+        f"error: failed to fetch pipeline broken from bundle {broken_bundle}:\n"
+        f"Error: failed to pull {broken_bundle}\n"
+    ) in result.stderr
+    assert list_files(pipelines_dir) == ["pushed/docker-build.yaml"]
+    assert not (tmp_path / "cache" / "bundles" / f"sha256-{'b' * 64}").exists()
@@ -3,20 +3,51 @@
 
 Typically, each test works like this:
 
-- Create a new repo at tmp_path
+- Create a new repo at tmp_path (a cheap clone of a template repo, made once per session)
 - Write some task files into it, optionally commit the changes
-- Execute the hack/versioning.py script in the repo, check the output
+- Run the hack/versioning.py script in the repo, check the output
+
+The script runs in-process (see run_versioning_script), except for the tests that need
+a real process. The tests don't share any state, so they can run with pytest-xdist too.
 """
 
 from __future__ import annotations
 
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import queue
+import select
+import signal
+import sqlite3
 import subprocess
 import sys
+import threading
 from pathlib import Path
 from textwrap import dedent
+from types import ModuleType
 
 import pytest
 
+from conftest import write_files
+
+VERSIONING_PY = Path(__file__).parent.parent / "hack" / "versioning.py"
+
+
+def _import_versioning() -> ModuleType:
+    spec = importlib.util.spec_from_file_location("versioning", VERSIONING_PY)
+    assert spec and spec.loader
+    module = importlib.util.module_from_spec(spec)
+    # The dataclasses need to find their module in sys.modules
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+versioning = _import_versioning()
+
 
 @pytest.fixture(autouse=True)
 def disable_github_actions(monkeypatch: pytest.MonkeyPatch) -> None:
@@ -24,6 +55,16 @@ def disable_github_actions(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setenv("GITHUB_ACTIONS", "false")
 
 
+@pytest.fixture(autouse=True)
+def isolate_cache(
+    monkeypatch: pytest.MonkeyPatch, tmp_path_factory: pytest.TempPathFactory
+) -> Path:
+    """Keep the versioning cache out of the user's cache directory."""
+    cache_home = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache_home))
+    return cache_home
+
+
 # --- Declarative file tree helpers ---
 
 
@@ -73,12 +114,20 @@ def changelog(*versions: str) -> str:
     return content
 
 
-def write_files(path: Path, files: dict[str, str]) -> None:
-    """Create a file tree at 'path'."""
-    for filepath, content in files.items():
-        full_path = path / filepath
-        full_path.parent.mkdir(parents=True, exist_ok=True)
-        full_path.write_text(content)
+GIT_CONFIG = dedent(
+    """\
+    [user]
+        # Use test identity instead of user's global config
+        name = Test User
+        email = test@example.com
+    [commit]
+        # Disable GPG signing to avoid dependency on user's GPG setup
+        gpgsign = false
+    [core]
+        # Disable hooks to avoid interference from pre-commit, commit-msg, etc.
+        hooksPath = /dev/null
+    """
+)
 
 
 class TaskRepo:
@@ -86,29 +135,33 @@ class TaskRepo:
 
     def __init__(self, path: Path):
         self.path = path
-        self._run_git("init")
 
+    @classmethod
+    def init(cls, path: Path) -> TaskRepo:
+        """Create a new repo with an empty initial commit on the main branch."""
+        repo = cls(path)
+        repo._run_git("init")
         # Create local git config to isolate from user's global config
-        git_config = self.path / ".git" / "config"
-        git_config.write_text(
-            dedent(
-                """\
-                [user]
-                    # Use test identity instead of user's global config
-                    name = Test User
-                    email = test@example.com
-                [commit]
-                    # Disable GPG signing to avoid dependency on user's GPG setup
-                    gpgsign = false
-                [core]
-                    # Disable hooks to avoid interference from pre-commit, commit-msg, etc.
-                    hooksPath = /dev/null
-                """
-            )
-        )
+        (path / ".git" / "config").write_text(GIT_CONFIG)
+        repo._run_git("branch", "-M", "main")
+        repo._run_git("commit", "--allow-empty", "-m", "Initial commit")
+        return repo
+
+    @classmethod
+    def clone(cls, template: TaskRepo, path: Path) -> TaskRepo:
+        """Clone the template repo into 'path', which may already contain some files.
 
-        self._run_git("branch", "-M", "main")
-        self._run_git("commit", "--allow-empty", "-m", "Initial commit")
+        The initial commit is empty, so a bare clone of the .git directory is all it takes.
+        With --local, the clone hardlinks the objects instead of copying them.
+        """
+        subprocess.run(
+            ["git", "clone", "-q", "--bare", "--local", template.path / ".git", path / ".git"],
+            capture_output=True,
+            check=True,
+        )
+        # Replace the bare repo config (with the origin remote) by the same config as init()
+        (path / ".git" / "config").write_text(GIT_CONFIG)
+        return cls(path)
 
     def _run_git(self, *args: str) -> subprocess.CompletedProcess[str]:
         """Run a git command in the repo."""
@@ -128,6 +181,11 @@ class TaskRepo:
         """Wrapper for write_files, use when changing existing files (to make tests readable)."""
         write_files(self.path, files)
 
+    def move(self, src: str, dest: str) -> None:
+        """Move a file with 'git mv' (stages the rename)."""
+        (self.path / dest).parent.mkdir(parents=True, exist_ok=True)
+        self._run_git("mv", src, dest)
+
     def stage(self) -> None:
         """Stage all changes (both modifications and new files)."""
         self._run_git("add", ".")
@@ -143,19 +201,30 @@ class TaskRepo:
         self._run_git("checkout", "-b", name)
 
 
+@pytest.fixture(scope="session")
+def template_repo(tmp_path_factory: pytest.TempPathFactory) -> TaskRepo:
+    """The repo that repo_path clones, made once per session.
+
+    Each pytest-xdist worker has a base temp directory of its own, so each worker makes
+    its own template repo and the workers don't need to coordinate.
+    """
+    return TaskRepo.init(tmp_path_factory.mktemp("template-repo"))
+
+
 @pytest.fixture
-def repo_path(tmp_path: Path) -> Path:
-    """Temporary directory for a task repo."""
-    # Copy hack/versioning.py to the test repo so that we can execute it by relative path
-    # (the script path shows up in the script output, so this makes test assertions easier)
-    versioning_py = Path(__file__).parent.parent / "hack" / "versioning.py"
+def repo_path(tmp_path: Path, template_repo: TaskRepo) -> Path:
+    """Temporary directory for a task repo, a clone of the template repo."""
+    TaskRepo.clone(template_repo, tmp_path)
+    # Copy hack/versioning.py to the test repo so that the tests that need a separate process
+    # can execute it by relative path (the script path shows up in the script output, so this
+    # makes test assertions easier)
     (tmp_path / "hack").mkdir(exist_ok=True)
-    (tmp_path / "hack" / "versioning.py").write_text(versioning_py.read_text())
+    (tmp_path / "hack" / "versioning.py").write_text(VERSIONING_PY.read_text())
     return tmp_path
 
 
 def create_repo(repo_path: Path, files: dict[str, str] | None = None) -> TaskRepo:
-    """Create a git repo with optional initial files."""
+    """Wrap the repo at repo_path, commit the optional initial files."""
     repo = TaskRepo(repo_path)
     if files:
         repo.add_files(files)
@@ -171,13 +240,32 @@ def run_versioning_script(
     *args: str,
     expect_failure: bool = False,
 ) -> subprocess.CompletedProcess[str]:
-    """Run the versioning script and return the completed process."""
-    result = subprocess.run(
-        [sys.executable, "hack/versioning.py", *args],
-        cwd=repo_path,
-        capture_output=True,
-        text=True,
-    )
+    """Run the versioning script in-process and return the result like a completed process."""
+    argv = ["hack/versioning.py", *args]
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+
+    with (
+        pytest.MonkeyPatch.context() as mp,
+        contextlib.redirect_stdout(stdout),
+        contextlib.redirect_stderr(stderr),
+    ):
+        mp.chdir(repo_path)
+        mp.setattr(sys, "argv", argv)
+        mp.setattr(versioning, "SCRIPT_PATH", argv[0])
+        # Don't carry the state of one run over to the next, like separate processes wouldn't
+        mp.setattr(versioning, "PROFILER", versioning.Profiler())
+        versioning._is_file.cache_clear()
+        try:
+            returncode = versioning.main()
+        except SystemExit as e:
+            if isinstance(e.code, str):
+                print(e.code, file=sys.stderr)
+                returncode = 1
+            else:
+                returncode = e.code or 0
+
+    result = subprocess.CompletedProcess(argv, returncode, stdout.getvalue(), stderr.getvalue())
 
     if not expect_failure and result.returncode != 0:
         pytest.fail(
@@ -219,6 +307,36 @@ class TestCheckCommand:
             """
         )
 
+    def test_version_label_outside_metadata(self, repo_path: Path) -> None:
+        """Only the label in the metadata section counts, the rest of the file is not scanned."""
+        content = task("hello", version=None) + dedent(
+            """\
+                  - name: print-labels
+                    image: test:latest
+                    script: |
+                      echo "app.kubernetes.io/version: 0.1"
+            """
+        )
+        repo = create_repo(
+            repo_path,
+            {
+                "task/hello/hello.yaml": content,
+                "task/hello/CHANGELOG.md": changelog("0.1"),
+            },
+        )
+
+        result = run_versioning_script(
+            repo.path, "check", "--base-ref", "HEAD~1", expect_failure=True
+        )
+
+        assert result.returncode == 1
+        assert result.stdout == ""
+        assert result.stderr == dedent(
+            """\
+            Error: task/hello/hello.yaml: Missing app.kubernetes.io/version label
+            """
+        )
+
     def test_new_task_valid(self, repo_path: Path) -> None:
         """New task with version and CHANGELOG should pass."""
         repo = create_repo(
@@ -235,6 +353,27 @@ class TestCheckCommand:
         assert result.stdout == ""
         assert result.stderr == ""
 
+    def test_non_task_files_ignored(self, repo_path: Path) -> None:
+        """Changed files that don't match the task file pattern should be ignored."""
+        repo = create_repo(repo_path)
+        repo.add_files(
+            {
+                "task/hello/0.1/kustomization.yaml": "resources: [hello.yaml]\n",
+                "task/hello/0.1/hello-oci-ta.yaml": task("hello-oci-ta", None),
+                "task/hello/0.1/hello.yml": task("hello", None),
+                "task/hello/README.md": "# hello\n",
+                "hello/hello.yaml": task("hello", None),
+                "docs/task/hello/hello.yaml": task("hello", None),
+            }
+        )
+        repo.commit("Add non-task files")
+
+        result = run_versioning_script(repo.path, "check", "--base-ref", "HEAD~1")
+
+        assert result.returncode == 0
+        assert result.stdout == ""
+        assert result.stderr == ""
+
     def test_modified_task_warnings(self, repo_path: Path) -> None:
         """Test the warnings reported for modified tasks.
 
@@ -299,6 +438,112 @@ class TestCheckCommand:
         assert result.stdout == ""
         assert result.stderr == ""
 
+    def test_changelog_section(self, repo_path: Path, isolate_cache: Path) -> None:
+        """The CHANGELOG.md should have a section for the current version (cached with --cache)."""
+        repo = create_repo(
+            repo_path,
+            {
+                "task/hello/hello.yaml": task("hello", "0.1"),
+                "task/hello/CHANGELOG.md": changelog("0.1"),
+            },
+        )
+        repo.branch("test")
+
+        repo.modify_files(
+            {
+                "task/hello/hello.yaml": task("hello", "0.2"),
+                "task/hello/CHANGELOG.md": changelog("0.1.1", "0.1"),
+            }
+        )
+        repo.add_files(
+            {
+                "task/new/new.yaml": task("new", "0.2"),
+                "task/new/CHANGELOG.md": "# Changelog\n\n## Unreleased\n\n## [0.2.0] - 2025-01-01\n",
+                "task/other/other.yaml": task("other", "0.3"),
+                "task/other/CHANGELOG.md": changelog("0.1"),
+            }
+        )
+        repo.commit("Modify tasks")
+
+        for _ in range(2):
+            result = run_versioning_script(
+                repo.path, "check", "--base-ref", "main", "--cache", expect_failure=True
+            )
+
+            assert result.returncode == 1
+            assert result.stdout == ""
+            assert result.stderr == dedent(
+                """\
+                Warning: task/hello/hello.yaml:6: CHANGELOG.md at task/hello/CHANGELOG.md has no section for version 0.2. Please add a '## 0.2' section.
+                Error: task/other/other.yaml:6: CHANGELOG.md at task/other/CHANGELOG.md has no section for version 0.3. Please add a '## 0.3' section.
+                """
+            )
+
+        db_path = isolate_cache / "task-repo-shared-ci" / "versions.sqlite3"
+        with sqlite3.connect(db_path) as db:
+            cached = db.execute(
+                "SELECT version, line FROM changelog_sections ORDER BY version, line"
+            ).fetchall()
+        assert cached == [("0.2", None), ("0.2", 5), ("0.3", None)]
+
+    def test_many_modified_tasks(self, repo_path: Path) -> None:
+        """Base versions of all modified tasks should be compared correctly."""
+        tasks = [f"task{i}" for i in range(5)]
+        repo = create_repo(
+            repo_path,
+            {
+                **{f"task/{t}/{t}.yaml": task(t, "0.1") for t in tasks},
+                **{f"task/{t}/CHANGELOG.md": changelog("0.1") for t in tasks},
+            },
+        )
+        repo.branch("test")
+
+        # Bump the version for even-numbered tasks only
+        repo.modify_files(
+            {
+                f"task/{t}/{t}.yaml": task(t, "0.2" if i % 2 == 0 else "0.1", add_comment=True)
+                for i, t in enumerate(tasks)
+            }
+        )
+        repo.modify_files({f"task/{t}/CHANGELOG.md": changelog("0.2", "0.1") for t in tasks})
+        repo.commit("Modify tasks")
+
+        result = run_versioning_script(repo.path, "check", "--base-ref", "main")
+
+        assert result.returncode == 0
+        assert result.stdout == ""
+        assert result.stderr == dedent(
+            """\
+            Warning: task/task1/task1.yaml:6: app.kubernetes.io/version label is unchanged. CI pipeline may skip building the task.
+            Warning: task/task3/task3.yaml:6: app.kubernetes.io/version label is unchanged. CI pipeline may skip building the task.
+            """
+        )
+
+    @pytest.mark.parametrize("jobs", ["1", "4"])
+    def test_parallel_jobs_order(self, repo_path: Path, jobs: str) -> None:
+        """Results should be sorted by path regardless of the number of jobs."""
+        repo = create_repo(repo_path)
+        # Add in reverse order, the output should be sorted anyway
+        for i in reversed(range(10)):
+            repo.add_files({f"task/task{i}/task{i}.yaml": task(f"task{i}", version=None)})
+            repo.stage()
+
+        result = run_versioning_script(
+            repo.path, "check", "--base-ref", "main", "--jobs", jobs, expect_failure=True
+        )
+
+        assert result.returncode == 1
+        assert result.stdout == ""
+        assert result.stderr == "".join(
+            dedent(
+                f"""\
+                Error: task/task{i}/task{i}.yaml: Missing app.kubernetes.io/version label
+                Error: task/task{i}/task{i}.yaml: CHANGELOG.md missing at task/task{i}/CHANGELOG.md. Use 'hack/versioning.py new-changelog task/task{i}' to create one.
+                """
+            )
+            for i in range(10)
+        )
+
     def test_uncommitted_changes(self, repo_path: Path) -> None:
         """Should detect all uncommitted changes."""
         repo = create_repo(
@@ -348,6 +593,146 @@ class TestCheckCommand:
             """
         )
 
+    def test_untracked_task_dir(self, repo_path: Path) -> None:
+        """Should detect task files in untracked directories."""
+        repo = create_repo(
+            repo_path,
+            {
+                "task/hello/hello.yaml": task("hello", "0.1"),
+                "task/hello/CHANGELOG.md": changelog("0.1"),
+            },
+        )
+        repo.branch("test")
+
+        repo.add_files({"task/untracked/0.1/untracked.yaml": task("untracked", "0.1")})
+
+        result = run_versioning_script(
+            repo.path, "check", "--base-ref", "main", expect_failure=True
+        )
+
+        assert result.returncode == 1
+        assert result.stdout == ""
+        assert result.stderr == dedent(
+            """\
+            Error: task/untracked/0.1/untracked.yaml: CHANGELOG.md missing at task/untracked/CHANGELOG.md. Use 'hack/versioning.py new-changelog task/untracked' to create one.
+            """
+        )
+
+    def test_non_task_dirs(self, repo_path: Path) -> None:
+        """Only the tests/migrations dirs of task versions are skipped, not tasks named so."""
+        repo = create_repo(repo_path)
+        repo.add_files(
+            {
+                "task/tests/0.1/tests.yaml": task("tests", "0.1"),
+                "task/migrations/0.1/migrations.yaml": task("migrations", "0.1"),
+                "task/hello/0.1/hello.yaml": task("hello", "0.1"),
+                "task/hello/0.1/tests/hello.yaml": task("hello", None),
+                "task/hello/0.1/migrations/hello.yaml": task("hello", None),
+            }
+        )
+
+        expected_stderr = "".join(
+            f"Error: task/{name}/0.1/{name}.yaml: CHANGELOG.md missing at task/{name}/CHANGELOG.md. Use 'hack/versioning.py new-changelog task/{name}' to create one.\n"
+            for name in ["hello", "migrations", "tests"]
+        )
+        # The changeset, the directory walk and the task index should all agree
+        for args in [[], ["task"], ["--use-index"], ["--use-index", "task"]]:
+            result = run_versioning_script(
+                repo.path, "check", "--base-ref", "main", *args, expect_failure=True
+            )
+            assert result.stderr == expected_stderr
+
+    @pytest.mark.parametrize("commit", [True, False])
+    def test_renamed_task(self, repo_path: Path, commit: bool) -> None:
+        """Renamed task files should be treated as added at the new path."""
+        repo = create_repo(
+            repo_path,
+            {
+                "task/hello/hello.yaml": task("hello", "0.1"),
+            },
+        )
+        repo.branch("test")
+
+        repo.move("task/hello/hello.yaml", "task/hello/0.1/hello.yaml")
+        if commit:
+            repo.commit("Move task")
+
+        result = run_versioning_script(
+            repo.path, "check", "--base-ref", "main", expect_failure=True
+        )
+
+        assert result.returncode == 1
+        assert result.stdout == ""
+        assert result.stderr == dedent(
+            """\
+            Error: task/hello/0.1/hello.yaml: CHANGELOG.md missing at task/hello/CHANGELOG.md. Use 'hack/versioning.py new-changelog task/hello' to create one.
+            """
+        )
+
+    def test_version_cache(self, repo_path: Path, isolate_cache: Path) -> None:
+        """Cached versions should be reused for the same content, and only for the same content."""
+        repo = create_repo(
+            repo_path,
+            {
+                "task/hello/hello.yaml": task("hello", "0.1"),
+                "task/hello/CHANGELOG.md": changelog("0.1"),
+            },
+        )
+        repo.branch("test")
+        repo.modify_files({"task/hello/hello.yaml": task("hello", "0.1", add_comment=True)})
+
+        expected_stderr = dedent(
+            """\
+            Warning: task/hello/hello.yaml:6: app.kubernetes.io/version label is unchanged. CI pipeline may skip building the task.
+            Warning: task/hello/hello.yaml: CHANGELOG.md at task/hello/CHANGELOG.md is unchanged. Please consider updating it.
+            """
+        )
+        for _ in range(2):
+            result = run_versioning_script(repo.path, "check", "--base-ref", "main", "--cache")
+            assert result.stderr == expected_stderr
+
+        db_path = isolate_cache / "task-repo-shared-ci" / "versions.sqlite3"
+        with sqlite3.connect(db_path) as db:
+            cached = db.execute("SELECT version, line FROM versions ORDER BY version").fetchall()
+        # the base version and the current version have different content, same version
+        assert cached == [("0.1", 6), ("0.1", 6)]
+
+        repo.modify_files({"task/hello/hello.yaml": task("hello", "0.2")})
+        result = run_versioning_script(repo.path, "check", "--base-ref", "main", "--cache")
+        assert result.stderr == dedent(
+            """\
+            Warning: task/hello/hello.yaml: CHANGELOG.md at task/hello/CHANGELOG.md is unchanged. Please consider updating it.
+            """
+        )
+
+    def test_outdated_version_cache(self, repo_path: Path, isolate_cache: Path) -> None:
+        """A cache filled by an older version of the parsing should be cleared, not used."""
+        repo = create_repo(repo_path, {"task/hello/hello.yaml": task("hello", "0.1")})
+        repo.branch("test")
+        repo.modify_files({"task/hello/hello.yaml": task("hello", "0.2")})
+        run_versioning_script(
+            repo.path, "check", "--base-ref", "main", "--cache", expect_failure=True
+        )
+
+        db_path = isolate_cache / "task-repo-shared-ci" / "versions.sqlite3"
+        with sqlite3.connect(db_path) as db:
+            (format_version,) = db.execute("PRAGMA user_version").fetchone()
+            db.execute(f"PRAGMA user_version = {format_version - 1}")
+            db.execute("UPDATE versions SET version = 'outdated', line = 1")
+
+        result = run_versioning_script(
+            repo.path, "check", "--base-ref", "main", "--cache", expect_failure=True
+        )
+        assert result.stderr == dedent(
+            """\
+            Warning: task/hello/hello.yaml: CHANGELOG.md missing at task/hello/CHANGELOG.md. Use 'hack/versioning.py new-changelog task/hello' to create one.
+            """
+        )
+        with sqlite3.connect(db_path) as db:
+            assert db.execute("PRAGMA user_version").fetchone() == (format_version,)
+            cached = db.execute("SELECT version, line FROM versions ORDER BY version").fetchall()
+        assert cached == [("0.1", 6), ("0.2", 6)]
+
     def test_github_actions_format(self, repo_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
         """In GitHub Actions, output should use ::error format."""
         monkeypatch.setenv("GITHUB_ACTIONS", "true")
@@ -371,6 +756,319 @@ class TestCheckCommand:
             """
         )
 
+    @pytest.mark.parametrize("watch_args", [["--watch"], ["--watch", "--poll"]])
+    def test_watch(self, repo_path: Path, watch_args: list[str]) -> None:
+        """--watch should re-check the task directories that change, until interrupted."""
+        repo = create_repo(
+            repo_path,
+            {
+                "task/hello/hello.yaml": task("hello", "0.1"),
+                "task/hello/CHANGELOG.md": changelog("0.1"),
+                "task/other/other.yaml": task("other", "0.1"),
+                "task/other/CHANGELOG.md": changelog("0.1"),
+            },
+        )
+        repo.branch("test")
+        repo.modify_files({"task/hello/hello.yaml": task("hello", "0.2")})
+
+        proc = subprocess.Popen(
+            [sys.executable, "hack/versioning.py", "check", *watch_args],
+            cwd=repo.path,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        output_lines: queue.Queue[str] = queue.Queue()
+        assert proc.stderr is not None
+        reader = threading.Thread(target=lambda: list(map(output_lines.put, proc.stderr)))
+        reader.start()
+
+        def read_batch() -> list[str]:
+            """Read the output lines up to (including) the 'Checked'/'Re-checked' line."""
+            lines = [output_lines.get(timeout=10).rstrip("\n")]
+            while "hecked" not in lines[-1]:
+                lines.append(output_lines.get(timeout=10).rstrip("\n"))
+            return lines
+
+        try:
+            assert read_batch() == [
+                "Warning: task/hello/hello.yaml: CHANGELOG.md at task/hello/CHANGELOG.md is unchanged. Please consider updating it.",
+                "Info: task: Checked 1 task file(s). Watching for changes, press Ctrl+C to stop",
+            ]
+
+            repo.modify_files({"task/hello/CHANGELOG.md": changelog("0.2", "0.1")})
+            assert read_batch() == [
+                "Info: task: Re-checked 1 task file(s) after changes in task/hello",
+            ]
+
+            # Move the whole task in at once, the test would be racy if it came in piece by piece
+            write_files(repo.path / "new-task", {"new.yaml": task("new", "0.1")})
+            (repo.path / "new-task").rename(repo.path / "task" / "new")
+            assert read_batch() == [
+                "Error: task/new/new.yaml: CHANGELOG.md missing at task/new/CHANGELOG.md. Use 'hack/versioning.py new-changelog task/new' to create one.",
+                "Info: task: Re-checked 1 task file(s) after changes in task/new",
+            ]
+
+            # The base ref moves, e.g. to a commit with the same changes to task/hello.
+            # The next change should trigger a check of everything against the new base.
+            base_commit = repo._run_git("stash", "create").stdout.strip()
+            repo._run_git("update-ref", "refs/heads/main", base_commit)
+            repo.modify_files({"task/other/CHANGELOG.md": changelog("0.1") + "\n"})
+            assert read_batch() == [
+                "Warning: task/hello/hello.yaml:6: app.kubernetes.io/version label is unchanged. CI pipeline may skip building the task.",
+                "Error: task/new/new.yaml: CHANGELOG.md missing at task/new/CHANGELOG.md. Use 'hack/versioning.py new-changelog task/new' to create one.",
+                "Info: task: Checked 2 task file(s). Watching for changes, press Ctrl+C to stop",
+            ]
+        finally:
+            proc.send_signal(signal.SIGINT)
+            proc.wait(timeout=10)
+            reader.join()
+
+        assert proc.returncode == 1  # reported an error
+        assert output_lines.empty()
+
+
+class TestOutputFormats:
+    """Tests for the --format option."""
+
+    @pytest.fixture
+    def repo(self, repo_path: Path) -> TaskRepo:
+        return create_repo(
+            repo_path,
+            {
+                "task/hello/hello.yaml": task("hello", "invalid-version"),
+                # No changelog
+            },
+        )
+
+    def test_gh(self, repo: TaskRepo) -> None:
+        """--format=gh should work outside GitHub Actions too."""
+        result = run_versioning_script(
+            repo.path, "check", "--base-ref", "HEAD~1", "--format", "gh", expect_failure=True
+        )
+
+        assert result.returncode == 1
+        assert result.stdout == ""
+        assert result.stderr == dedent(
+            """\
+            ::error file=task/hello/hello.yaml,line=6::Invalid version: invalid-version
+            ::error file=task/hello/hello.yaml,line=1::CHANGELOG.md missing at task/hello/CHANGELOG.md. Use 'hack/versioning.py new-changelog task/hello' to create one.
+            """
+        )
+
+    def test_jsonl(self, repo: TaskRepo) -> None:
+        """--format=jsonl should write one JSON object per result to stdout."""
+        result = run_versioning_script(
+            repo.path, "check", "--base-ref", "HEAD~1", "--format", "jsonl", expect_failure=True
+        )
+
+        assert result.returncode == 1
+        assert result.stderr == ""
+        assert [json.loads(line) for line in result.stdout.splitlines()] == [
+            {
+                "kind": "error",
+                "message": "Invalid version: invalid-version",
+                "path": "task/hello/hello.yaml",
+                "line": 6,
+            },
+            {
+                "kind": "error",
+                "message": "CHANGELOG.md missing at task/hello/CHANGELOG.md. Use 'hack/versioning.py new-changelog task/hello' to create one.",
+                "path": "task/hello/hello.yaml",
+                "line": None,
+            },
+        ]
+
+    def test_jsonl_streaming(self, repo_path: Path) -> None:
+        """--format=jsonl should write each result right away, not when the process exits."""
+        repo = create_repo(repo_path)
+        repo.add_files(
+            {
+                "task/a/a.yaml": task("a", "0.1"),
+                "task/b/b.yaml": task("b", "0.1"),
+            }
+        )
+        # Reading the CHANGELOG.md of task b blocks until the test writes into the FIFO
+        changelog_fifo = repo.path / "task" / "b" / "CHANGELOG.md"
+        os.mkfifo(changelog_fifo)
+
+        proc = subprocess.Popen(
+            [sys.executable, "hack/versioning.py", "check", "--format", "jsonl", "--jobs", "1"],
+            cwd=repo.path,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        assert proc.stdout is not None
+        try:
+            ready, _, _ = select.select([proc.stdout], [], [], 10)
+            assert ready, "no output while the process is still running"
+            assert json.loads(proc.stdout.readline())["path"] == "task/a/a.yaml"
+            assert proc.poll() is None
+        finally:
+            if proc.poll() is None:
+                changelog_fifo.write_text(changelog("0.1"))
+            proc.wait(timeout=10)
+
+        assert proc.returncode == 1
+        assert proc.stdout.read() == ""
+        proc.stdout.close()
+
+    def test_sarif(self, repo: TaskRepo) -> None:
+        """--format=sarif should write a SARIF log to stdout."""
+        result = run_versioning_script(
+            repo.path, "check", "--base-ref", "HEAD~1", "--format", "sarif", expect_failure=True
+        )
+
+        assert result.returncode == 1
+        assert result.stderr == ""
+        sarif = json.loads(result.stdout)
+        assert sarif["version"] == "2.1.0"
+        [run] = sarif["runs"]
+        assert run["tool"]["driver"]["name"] == "versioning.py"
+        assert run["results"] == [
+            {
+                "level": "error",
+                "message": {"text": "Invalid version: invalid-version"},
+                "locations": [
+                    {
+                        "physicalLocation": {
+                            "artifactLocation": {"uri": "task/hello/hello.yaml"},
+                            "region": {"startLine": 6},
+                        }
+                    }
+                ],
+            },
+            {
+                "level": "error",
+                "message": {
+                    "text": "CHANGELOG.md missing at task/hello/CHANGELOG.md. Use 'hack/versioning.py new-changelog task/hello' to create one."
+                },
+                "locations": [
+                    {"physicalLocation": {"artifactLocation": {"uri": "task/hello/hello.yaml"}}}
+                ],
+            },
+        ]
+
+    def test_sarif_no_results(self, repo_path: Path) -> None:
+        """The SARIF log should be valid even with no results."""
+        repo = create_repo(repo_path)
+
+        result = run_versioning_script(repo.path, "check", "--base-ref", "HEAD", "--format", "sarif")
+
+        assert json.loads(result.stdout)["runs"][0]["results"] == []
+
+
+def test_profile(repo_path: Path, tmp_path_factory: pytest.TempPathFactory) -> None:
+    """--profile should save timing spans and counters in the Chrome trace event format."""
+    repo = create_repo(
+        repo_path,
+        {
+            "task/hello/hello.yaml": task("hello", "0.1"),
+            "task/hello/CHANGELOG.md": changelog("0.1"),
+        },
+    )
+    repo.branch("test")
+    repo.modify_files({"task/hello/hello.yaml": task("hello", "0.2")})
+    profile_path = tmp_path_factory.mktemp("profile") / "trace.json"
+
+    result = run_versioning_script(
+        repo.path, "check", "--base-ref", "main", "--profile", str(profile_path)
+    )
+    assert result.returncode == 0
+
+    trace = json.loads(profile_path.read_text())
+    spans = {event["name"]: event for event in trace["traceEvents"] if event["ph"] == "X"}
+    assert {"check", "get changeset", "read base versions", "check task"} <= spans.keys()
+    assert spans["check task"]["args"] == {"path": "task/hello/hello.yaml"}
+    assert spans["check"]["dur"] >= spans["check tasks"]["dur"]
+
+    counters = trace["otherData"]["counters"]
+    # git diff, git status, git cat-file
+    assert counters["subprocesses"] == 3
+    assert counters["file_bytes_read"] > 0
+    # Counter snapshots at the end of spans (and one on save), not one per count() call
+    span_events = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    counter_events = [event for event in trace["traceEvents"] if event["ph"] == "C"]
+    assert len(counter_events) <= len(span_events) + 1
+    assert counter_events[-1]["args"] == counters
+
+
+def test_version() -> None:
+    """Versions should compare x.y as x.y.0, but format the way they were written."""
+    Version = versioning.Version
+    assert [str(Version.parse(s)) for s in ["0.1", "0.1.0", "1.2.3"]] == ["0.1", "0.1.0", "1.2.3"]
+    assert str(Version(1, 2, 0)) == "1.2.0"
+    assert Version.parse("0.1") == Version.parse("0.1.0")
+    assert len({Version(0, 1), Version(0, 1, 0)}) == 1
+    assert sorted(map(Version.parse, ["0.10", "0.9.1", "0.9"])) == [
+        Version(0, 9),
+        Version(0, 9, 1),
+        Version(0, 10),
+    ]
+    assert max([Version(0, 2), Version(0, 10), Version(0, 9)]) == Version(0, 10)
+
+
+def test_read_git_objects(repo_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Missing objects should read as None, also when their names contain spaces."""
+    create_repo(repo_path, {"task/hello/hello.yaml": task("hello", "0.1")})
+    monkeypatch.chdir(repo_path)
+
+    names = [
+        "HEAD:task/hello/hello.yaml",
+        "HEAD:task/no such/file.yaml",
+        "HEAD:task/hello/hello.yaml",
+    ]
+    assert versioning.read_git_objects(names) == [task("hello", "0.1"), None, task("hello", "0.1")]
+
+
+def test_in_process_run(repo_path: Path) -> None:
+    """Running the script in-process should give the same results as a separate process."""
+    repo = create_repo(repo_path, {"task/hello/hello.yaml": task("hello", "invalid-version")})
+
+    # plain writes to stderr, jsonl to stdout
+    for output_format in ["plain", "jsonl"]:
+        args = ["check", "--base-ref", "HEAD~1", "--format", output_format]
+        separate_process = subprocess.run(
+            [sys.executable, "hack/versioning.py", *args],
+            cwd=repo.path,
+            capture_output=True,
+            text=True,
+        )
+        # The first run must not leave anything behind that would change the second one
+        for _ in range(2):
+            in_process = run_versioning_script(repo.path, *args, expect_failure=True)
+            assert in_process.returncode == separate_process.returncode == 1
+            assert in_process.stdout == separate_process.stdout
+            assert in_process.stderr == separate_process.stderr
+
+    result = run_versioning_script(repo.path, "check", "--jobs", "0", expect_failure=True)
+    assert result.returncode == 2
+    assert "argument -j/--jobs: must be a positive integer: 0" in result.stderr
+
+
+def test_startup_imports(repo_path: Path) -> None:
+    """Startup should not import modules that only some subcommands need."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "hack/versioning.py", "--help"],
+        cwd=repo_path,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # import time: self [us] | cumulative | imported package
+    imports = [
+        line.removeprefix("import time:").split("|")
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and not line.endswith("imported package")
+    ]
+    imported_modules = {module.strip() for _, _, module in imports}
+    lazy_modules = {"concurrent.futures", "hashlib", "json", "sqlite3", "subprocess", "threading"}
+    assert not lazy_modules & imported_modules
+
+    # Nested imports are indented, only sum up the top-level ones. The imports take ~40ms
+    # locally, the limit is generous to not be flaky on slow CI runners.
+    total_us = sum(int(cumulative) for _, cumulative, module in imports if module[1:3] != "  ")
+    assert total_us < 150_000
+
 
 class TestNewChangelogCommand:
     """Tests for the 'new-changelog' subcommand."""
@@ -583,3 +1281,159 @@ class TestNewChangelogCommand:
         assert (repo_path / "task" / "task1" / "CHANGELOG.md").exists()
         assert (repo_path / "task" / "task2" / "CHANGELOG.md").exists()
         assert (repo_path / "task" / "task3" / "CHANGELOG.md").exists()
+
+    def test_overlapping_paths(self, repo_path: Path) -> None:
+        """Each task should be handled once, files in tests/ and migrations/ are not task files."""
+        write_files(
+            repo_path,
+            {
+                "task/hello/0.1/hello.yaml": task("hello", "0.1"),
+                "task/hello/0.2/hello.yaml": task("hello", "0.2"),
+                "task/hello/0.2/migrations/hello.yaml": task("hello", "invalid-version"),
+                "task/hello/0.2/tests/hello.yaml": task("hello", "invalid-version"),
+            },
+        )
+
+        result = run_versioning_script(
+            repo_path, "new-changelog", "task/", "task/hello/0.1/hello.yaml", "task/hello"
+        )
+
+        assert result.returncode == 0
+        assert result.stdout == ""
+        assert result.stderr == dedent(
+            """\
+            Info: task/hello: Created CHANGELOG.md at task/hello/CHANGELOG.md
+            """
+        )
+        assert "## 0.2" in (repo_path / "task" / "hello" / "CHANGELOG.md").read_text()
+
+    def test_task_named_tests(self, repo_path: Path) -> None:
+        """A task named 'tests' is a task like any other."""
+        write_files(
+            repo_path,
+            {
+                "task/tests/0.1/tests.yaml": task("tests", "0.1"),
+                "task/tests/0.1/tests/tests.yaml": task("tests", "invalid-version"),
+            },
+        )
+
+        result = run_versioning_script(repo_path, "new-changelog", "task")
+
+        assert result.stderr == dedent(
+            """\
+            Info: task/tests: Created CHANGELOG.md at task/tests/CHANGELOG.md
+            """
+        )
+        assert "## 0.1" in (repo_path / "task" / "tests" / "CHANGELOG.md").read_text()
+
+
+class TestIndexCommand:
+    """Tests for the 'index' subcommand and the --use-index option."""
+
+    def test_build_and_refresh(self, repo_path: Path) -> None:
+        """The index should record task file info and only re-read changed files."""
+        repo = create_repo(
+            repo_path,
+            {
+                "task/hello/0.1/hello.yaml": task("hello", "0.1"),
+                "task/hello/0.2/hello.yaml": task("hello", "0.2"),
+                "task/hello/0.2/migrations/0.2.sh": "#!/bin/bash\n",
+                "task/hello/0.2/tests/test-hello.yaml": "kind: Pipeline\n",
+                "task/hello/CHANGELOG.md": changelog("0.1", "0.2"),
+                "task/hello-oci-ta/0.2/hello-oci-ta.yaml": task("hello-oci-ta", "0.2"),
+            },
+        )
+        repo.add_files({"task/untracked/untracked.yaml": task("untracked", None)})
+
+        result = run_versioning_script(repo.path, "index")
+        assert result.stderr == "Info: .git/task-index.json: Indexed 4 task files (4 re-read)\n"
+
+        index_data = json.loads((repo.path / ".git" / "task-index.json").read_text())
+        tasks = {t.pop("path"): t for t in index_data["tasks"]}
+        assert list(tasks) == [
+            "task/hello/0.1/hello.yaml",
+            "task/hello/0.2/hello.yaml",
+            "task/hello-oci-ta/0.2/hello-oci-ta.yaml",
+            "task/untracked/untracked.yaml",
+        ]
+        hello_0_2 = tasks["task/hello/0.2/hello.yaml"]
+        assert hello_0_2["version"] == "0.2"
+        assert hello_0_2["version_line"] == 6
+        blob_sha = repo._run_git("rev-parse", "HEAD:task/hello/0.2/hello.yaml").stdout.strip()
+        assert hello_0_2["blob_sha"] == blob_sha
+        assert hello_0_2["has_changelog"] is True
+        assert hello_0_2["migrations"] == ["task/hello/0.2/migrations/0.2.sh"]
+        assert hello_0_2["oci_ta_sibling"] == "task/hello-oci-ta/0.2/hello-oci-ta.yaml"
+        assert tasks["task/hello/0.1/hello.yaml"]["oci_ta_sibling"] is None
+        assert tasks["task/untracked/untracked.yaml"]["has_changelog"] is False
+
+        # Make the files look older than the index, avoid the "racily clean" re-reads
+        for path in tasks:
+            os.utime(repo.path / path, ns=(0, 0))
+        result = run_versioning_script(repo.path, "index", "--rebuild")
+        assert result.stderr == "Info: .git/task-index.json: Indexed 4 task files (4 re-read)\n"
+
+        result = run_versioning_script(repo.path, "index")
+        assert result.stderr == "Info: .git/task-index.json: Indexed 4 task files (0 re-read)\n"
+
+        repo.modify_files({"task/hello/0.1/hello.yaml": task("hello", "0.1.1")})
+        (repo.path / "task" / "untracked" / "untracked.yaml").unlink()
+        result = run_versioning_script(repo.path, "index")
+        assert result.stderr == "Info: .git/task-index.json: Indexed 3 task files (1 re-read)\n"
+
+        index_data = json.loads((repo.path / ".git" / "task-index.json").read_text())
+        versions = {t["path"]: t["version"] for t in index_data["tasks"]}
+        assert versions["task/hello/0.1/hello.yaml"] == "0.1.1"
+
+    def test_crlf_blob_sha(self, repo_path: Path) -> None:
+        """The blob SHAs should match git's, also for files with CRLF line endings."""
+        repo = create_repo(
+            repo_path, {"task/hello/hello.yaml": task("hello", "0.1").replace("\n", "\r\n")}
+        )
+
+        run_versioning_script(repo.path, "index")
+
+        index_data = json.loads((repo.path / ".git" / "task-index.json").read_text())
+        [entry] = index_data["tasks"]
+        blob_sha = repo._run_git("rev-parse", "HEAD:task/hello/hello.yaml").stdout.strip()
+        assert entry["blob_sha"] == blob_sha
+        assert (entry["version"], entry["version_line"]) == ("0.1", 6)
+
+    def test_use_index(self, repo_path: Path) -> None:
+        """Commands should give the same results with and without the index."""
+        repo = create_repo(
+            repo_path,
+            {
+                "task/task1/task1.yaml": task("task1", "0.1"),
+                "task/task1/CHANGELOG.md": changelog("0.1"),
+                "task/task2/0.1/task2.yaml": task("task2", "0.1"),
+                "task/task2/0.2/task2.yaml": task("task2", "0.2"),
+            },
+        )
+        repo.branch("test")
+        repo.modify_files({"task/task1/task1.yaml": task("task1", "0.1", add_comment=True)})
+
+        for args in [["check", "--base-ref", "main"], ["check", "--base-ref", "main", "task/"]]:
+            without_index = run_versioning_script(repo.path, *args)
+            with_index = run_versioning_script(repo.path, *args, "--use-index")
+            assert with_index.stderr == without_index.stderr
+
+        result = run_versioning_script(repo.path, "new-changelog", "--use-index", "task/task2")
+        assert result.stderr == dedent(
+            """\
+            Info: task/task2: Created CHANGELOG.md at task/task2/CHANGELOG.md
+            """
+        )
+        assert "## 0.2" in (repo.path / "task" / "task2" / "CHANGELOG.md").read_text()
+
+        # The index knows about the new (untracked) and the deleted (unstaged) changelogs
+        result = run_versioning_script(repo.path, "new-changelog", "--use-index", "task/task2")
+        assert result.stderr == (
+            "Info: task/task2: task/task2/CHANGELOG.md already exists, skipping\n"
+        )
+        (repo.path / "task" / "task1" / "CHANGELOG.md").unlink()
+        args = ["check", "--base-ref", "main"]
+        without_index = run_versioning_script(repo.path, *args)
+        with_index = run_versioning_script(repo.path, *args, "--use-index")
+        assert "CHANGELOG.md missing at task/task1/CHANGELOG.md" in with_index.stderr
+        assert with_index.stderr == without_index.stderr
@@ -0,0 +1,16 @@
+"""Command line argument types shared by the Python scripts in hack/."""
+
+# <TEMPLATED FILE!>
+# This file comes from the templates at https://github.com/konflux-ci/task-repo-shared-ci.
+# Please consider sending a PR upstream instead of editing the file directly.
+# See the SHARED-CI.md document in this repo for more details.
+
+import argparse
+
+
+def positive_int(value: str) -> int:
+    """Argument type for counts like --jobs, rejects zero and negative numbers."""
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer: {value}")
+    return n
@@ -8,20 +8,46 @@
 
 from __future__ import annotations
 
+# This script runs on every PR and in pre-commit hooks, where the interpreter startup is most
+# of the runtime. Modules that only some of the subcommands need (subprocess, json, sqlite3,
+# threading, concurrent.futures, ...) are imported where they're used, not here. See
+# test_startup_imports.
+import abc
 import argparse
+import contextlib
 import functools
+import io
+import itertools
 import os
 import re
-import subprocess
 import sys
 import textwrap
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Callable, Iterable, Iterator, Literal, Mapping, Self
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import subprocess
+    import threading
+    from typing import Any, Callable, Iterable, Iterator, Literal, Mapping, Self, TextIO
 
 SCRIPT_PATH = sys.argv[0]
 VERSION_LABEL = "app.kubernetes.io/version"
 
+_VERSION_LABEL_LINE_RE = re.compile(
+    rf"""^\s*["']?{re.escape(VERSION_LABEL)}["']?\s*:\s*["']?([^"'\s#]+)"""
+)
+_VERSION_RE = re.compile(r"(\d+)\.(\d+)(?:\.(\d+))?")
+
+# Subdirectories of task versions (task/{task_name}/{version}/{dir}) that hold tests and
+# migration scripts, never the task files themselves
+NON_TASK_DIRS = frozenset({"tests", "migrations"})
+# task/{task_name}/**/{task_name}.yaml, for raw paths as git emits them (no '.', '..', '//').
+# Excludes the NON_TASK_DIRS right under the version directory.
+_TASK_FILE_RE = re.compile(
+    rf"task/([^/]+)/(?:[^/]+/(?!(?:{'|'.join(sorted(NON_TASK_DIRS))})/)(?:[^/]+/)*)?\1\.yaml"
+)
+
 
 # --- Utilities ---
 
@@ -30,11 +56,335 @@ class VersioningError(Exception):
     """Base type for versioning related errors."""
 
 
+class Profiler:
+    """Collects timing spans and counters, saves them in the Chrome trace event format.
+
+    Load the saved file in chrome://tracing or https://ui.perfetto.dev.
+    Disabled by default, in which case span() and count() do nothing.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._events: list[dict[str, Any]] = []
+        self._counters: dict[str, int] = {}
+        # Set by enable(), only profiled runs need the threading and time modules
+        self._lock: threading.Lock
+        self._clock: Callable[[], int]
+        self._thread_id: Callable[[], int]
+        self._start_ns = 0
+
+    def enable(self) -> None:
+        import threading
+        import time
+
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._clock = time.perf_counter_ns
+        self._thread_id = threading.get_ident
+        self._start_ns = self._clock()
+
+    def span(self, name: str, **args: Any) -> contextlib.AbstractContextManager[None]:
+        """Measure the duration of a 'with' block."""
+        if not self.enabled:
+            return _NO_SPAN
+        return self._span(name, args)
+
+    def count(self, counter: str, n: int = 1) -> None:
+        """Increment a counter (e.g. subprocesses, stats).
+
+        Cheap enough for hot loops, the trace only gets snapshots of the counters
+        at the end of each span.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + n
+
+    def save(self, path: Path) -> None:
+        import json
+
+        with self._lock:
+            self._snapshot_counters()
+        trace = {
+            "traceEvents": self._events,
+            "displayTimeUnit": "ms",
+            "otherData": {"counters": self._counters},
+        }
+        path.write_text(json.dumps(trace))
+
+    @contextlib.contextmanager
+    def _span(self, name: str, args: dict[str, Any]) -> Iterator[None]:
+        start_ns = self._clock()
+        try:
+            yield
+        finally:
+            duration_us = (self._clock() - start_ns) / 1000
+            event = self._event(name, "X", args=args, start_ns=start_ns, dur=duration_us)
+            with self._lock:
+                self._events.append(event)
+                self._snapshot_counters()
+
+    def _snapshot_counters(self) -> None:
+        if self._counters:
+            self._events.append(self._event("counters", "C", args=dict(self._counters)))
+
+    def _event(
+        self, name: str, phase: str, start_ns: int | None = None, **fields: Any
+    ) -> dict[str, Any]:
+        if start_ns is None:
+            start_ns = self._clock()
+        return {
+            "name": name,
+            "ph": phase,
+            "ts": (start_ns - self._start_ns) / 1000,
+            "pid": os.getpid(),
+            "tid": self._thread_id(),
+            **fields,
+        }
+
+
+_NO_SPAN = contextlib.nullcontext()
+PROFILER = Profiler()
+
+
+def _start_cmd(
+    cmd: list[str], *, text: bool = False, pipe_stdin: bool = False
+) -> subprocess.Popen[Any]:
+    """Start a command with piped stdout and stderr. The only place that imports subprocess."""
+    import subprocess
+
+    PROFILER.count("subprocesses")
+    return subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE if pipe_stdin else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=text,
+    )
+
+
+def _cmd_failed(cmd: list[str], stderr: str) -> RuntimeError:
+    return RuntimeError(f"{cmd[0]} failed ({cmd}):\n{textwrap.indent(stderr, '  ')}")
+
+
 def run_cmd(cmd: list[str]) -> str:
-    proc = subprocess.run(cmd, capture_output=True, text=True)
+    with PROFILER.span(" ".join(cmd[:2])), _start_cmd(cmd, text=True) as proc:
+        stdout, stderr = proc.communicate()
+    if proc.returncode != 0:
+        raise _cmd_failed(cmd, stderr)
+    return stdout
+
+
+def iter_nul_separated(cmd: list[str]) -> Iterator[str]:
+    """Run a command that produces NUL-separated output, yield the records as they come."""
+    with PROFILER.span(" ".join(cmd[:2])), _start_cmd(cmd) as proc:
+        assert proc.stdout is not None and proc.stderr is not None
+        pending = b""
+        while chunk := proc.stdout.read(64 * 1024):
+            PROFILER.count("subprocess_output_bytes", len(chunk))
+            *records, pending = (pending + chunk).split(b"\0")
+            for record in records:
+                yield record.decode()
+        if pending:
+            yield pending.decode()
+        stderr = proc.stderr.read().decode(errors="replace")
+
+    if proc.returncode != 0:
+        raise _cmd_failed(cmd, stderr)
+
+
+def read_git_objects(object_names: Iterable[str]) -> list[str | None]:
+    """Read the content of git objects (e.g. '{ref}:{path}') using a single git process.
+
+    Returns None in place of objects that don't exist.
+    """
+    object_names = list(object_names)
+    if not object_names:
+        return []
+
+    cmd = ["git", "cat-file", "--batch"]
+    stdin = "".join(f"{name}\n" for name in object_names).encode()
+    with (
+        PROFILER.span("git cat-file", objects=len(object_names)),
+        _start_cmd(cmd, pipe_stdin=True) as proc,
+    ):
+        output, stderr = proc.communicate(stdin)
+    PROFILER.count("subprocess_output_bytes", len(output))
     if proc.returncode != 0:
-        raise RuntimeError(f"{cmd[0]} failed ({cmd}):\n{textwrap.indent(proc.stderr, '  ')}")
-    return proc.stdout
+        raise _cmd_failed(cmd, stderr.decode(errors="replace"))
+
+    # Output format, for each object name:
+    #   <oid> <type> <size>\n<content>\n
+    # or, for objects that don't exist (or are ambiguous):
+    #   <object name> missing\n
+    contents: list[str | None] = []
+    pos = 0
+    for _ in object_names:
+        header_end = output.index(b"\n", pos)
+        header = output[pos:header_end]
+        pos = header_end + 1
+        # Check these first, the object name may contain spaces
+        if header.endswith((b" missing", b" ambiguous")):
+            contents.append(None)
+            continue
+
+        _, _, size_str = header.split(b" ")
+        size = int(size_str)
+        contents.append(output[pos : pos + size].decode())
+        pos += size + 1  # skip the trailing newline
+
+    return contents
+
+
+def read_index_blob_shas(pathspecs: list[str]) -> dict[str, str]:
+    """Get the blob SHAs of the files in the git index (the staged content)."""
+    blob_shas = {}
+    # records: <mode> SP <object> SP <stage> TAB <path>
+    for record in iter_nul_separated(["git", "ls-files", "-s", "-z", "--", *pathspecs]):
+        info, path = record.split("\t", 1)
+        blob_shas[path] = info.split(" ")[1]
+    return blob_shas
+
+
+def git_blob_sha(data: bytes) -> str:
+    """Compute the git blob SHA of the raw content (same as 'git hash-object')."""
+    import hashlib
+
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class VersionCache:
+    """Persistent cache of task versions (and their line numbers), keyed by git blob SHA.
+
+    Also caches the line numbers of the version sections in CHANGELOG.md files.
+
+    Since the key is the hash of the content, entries only need to be invalidated when the
+    parsing changes. The FORMAT_VERSION is stored in the database, a cache with a different
+    version gets cleared. Otherwise, only the least recently used entries get evicted once
+    the cache grows over 'max_entries'.
+
+    The cache is an SQLite database, which handles concurrent access from multiple processes.
+    Lookups go to the database directly, updates are collected in memory and written in one
+    transaction on close().
+    """
+
+    # Bump whenever the same content could parse differently (e.g. a change in _find_version)
+    FORMAT_VERSION = 1
+
+    def __init__(self, db_path: Path, max_entries: int = 100_000) -> None:
+        import sqlite3
+        import threading
+
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        # Lock the database right away, only one process should check (and clear) an old cache
+        self._db.execute("BEGIN IMMEDIATE")
+        (format_version,) = self._db.execute("PRAGMA user_version").fetchone()
+        if format_version != self.FORMAT_VERSION:
+            self._db.execute("DROP TABLE IF EXISTS versions")
+            self._db.execute("DROP TABLE IF EXISTS changelog_sections")
+            self._db.execute(f"PRAGMA user_version = {self.FORMAT_VERSION}")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS versions (
+                blob_sha TEXT PRIMARY KEY,
+                version TEXT,
+                line INTEGER,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS changelog_sections (
+                blob_sha TEXT NOT NULL,
+                version TEXT NOT NULL,
+                line INTEGER,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (blob_sha, version)
+            )
+            """
+        )
+        self._db.commit()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._used: dict[str, tuple[str | None, int | None]] = {}
+        self._used_sections: dict[tuple[str, str], int | None] = {}
+
+    @staticmethod
+    def default_path() -> Path:
+        cache_home = os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache"
+        return Path(cache_home) / "task-repo-shared-ci" / "versions.sqlite3"
+
+    def get(self, blob_sha: str) -> tuple[str | None, int | None] | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT version, line FROM versions WHERE blob_sha = ?", (blob_sha,)
+            ).fetchone()
+            if row is not None:
+                self._used[blob_sha] = row
+        return row
+
+    def put(self, blob_sha: str, version: str | None, line: int | None) -> None:
+        with self._lock:
+            self._used[blob_sha] = (version, line)
+
+    def get_changelog_section(self, blob_sha: str, version: str) -> tuple[int | None] | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT line FROM changelog_sections WHERE blob_sha = ? AND version = ?",
+                (blob_sha, version),
+            ).fetchone()
+            if row is not None:
+                self._used_sections[blob_sha, version] = row[0]
+        return row
+
+    def put_changelog_section(self, blob_sha: str, version: str, line: int | None) -> None:
+        with self._lock:
+            self._used_sections[blob_sha, version] = line
+
+    def close(self) -> None:
+        import time
+
+        now = time.time()
+        with PROFILER.span("save version cache"), self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO versions VALUES (?, ?, ?, ?)",
+                [(sha, version, line, now) for sha, (version, line) in self._used.items()],
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO changelog_sections VALUES (?, ?, ?, ?)",
+                [(sha, version, line, now) for (sha, version), line in self._used_sections.items()],
+            )
+            self._db.execute(
+                """
+                DELETE FROM versions WHERE blob_sha NOT IN (
+                    SELECT blob_sha FROM versions ORDER BY last_used DESC LIMIT ?
+                )
+                """,
+                (self._max_entries,),
+            )
+            self._db.execute(
+                """
+                DELETE FROM changelog_sections WHERE rowid NOT IN (
+                    SELECT rowid FROM changelog_sections ORDER BY last_used DESC LIMIT ?
+                )
+                """,
+                (self._max_entries,),
+            )
+        self._db.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def open_version_cache(enabled: bool) -> contextlib.AbstractContextManager[VersionCache | None]:
+    if not enabled:
+        return contextlib.nullcontext()
+    return VersionCache(VersionCache.default_path())
 
 
 @dataclass
@@ -42,23 +392,94 @@ class TaskFile:
     """A task/{task_name}/**/{task_name}.yaml file."""
 
     path: Path
+    # Set for task files that come from the TaskIndex
+    index_entry: TaskIndexEntry | None = field(default=None, compare=False, repr=False)
 
     @property
     def task_dir(self) -> Path:
         task_name = self.path.stem
         return Path("task") / task_name
 
-    def read(self) -> TaskContent:
-        return TaskContent(self.path.read_text())
+    def changelog_exists(self) -> bool:
+        """Does the task have a CHANGELOG.md? Looked up in the TaskIndex entry if there is one."""
+        if self.index_entry is not None:
+            return self.index_entry.has_changelog
+        PROFILER.count("stats")
+        return (self.task_dir / "CHANGELOG.md").exists()
+
+    def read(self, version_cache: VersionCache | None = None) -> TaskContent:
+        known_version = None
+        if self.index_entry is not None:
+            known_version = (self.index_entry.version, self.index_entry.version_line)
+        return TaskContent(self.path, version_cache, known_version)
+
+    @staticmethod
+    def read_all_at_base_ref(
+        task_files: Iterable[TaskFile], base_ref: str, version_cache: VersionCache | None = None
+    ) -> dict[Path, TaskContent]:
+        """Read multiple task files at the base ref in one go.
+
+        Files that don't exist at the base ref are omitted from the result.
+        """
+        paths = [task_file.path for task_file in task_files]
+        contents = read_git_objects(f"{base_ref}:{path.as_posix()}" for path in paths)
+        return {
+            path: TaskContent(content, version_cache)
+            for path, content in zip(paths, contents)
+            if content is not None
+        }
 
-    def read_at_base_ref(self, base_ref: str) -> TaskContent:
-        content = run_cmd(["git", "show", f"{base_ref}:{self.path}"])
-        return TaskContent(content)
+
+class BaseRefTree:
+    """The task files at a base ref, kept in memory for repeated lookups (check --watch).
+
+    Lists the blob names of all the task files once and reads each blob at most once.
+    Git reads objects by blob name much faster than it resolves '{ref}:{path}' names.
+    """
+
+    def __init__(self, blob_shas: dict[str, str], version_cache: VersionCache | None) -> None:
+        self._blob_shas = blob_shas
+        self._version_cache = version_cache
+        self._contents: dict[str, TaskContent] = {}
+
+    @classmethod
+    def load(cls, base_ref: str, version_cache: VersionCache | None = None) -> Self:
+        blob_shas = {}
+        # records: <mode> SP <type> SP <object> TAB <path>
+        for record in iter_nul_separated(["git", "ls-tree", "-r", "-z", base_ref, "--", "task"]):
+            info, path = record.split("\t", 1)
+            _, object_type, object_name = info.split(" ")
+            if object_type == "blob":
+                blob_shas[path] = object_name
+        task_paths = filter_task_files(blob_shas)
+        return cls({path: blob_shas[path] for path in task_paths}, version_cache)
+
+    def read_all(self, task_files: Iterable[TaskFile]) -> dict[Path, TaskContent]:
+        """Read the task files at the base ref. Omit the ones that don't exist there."""
+        blob_shas = {
+            task_file.path: blob_sha
+            for task_file in task_files
+            if (blob_sha := self._blob_shas.get(task_file.path.as_posix()))
+        }
+        to_read = sorted(set(blob_shas.values()) - self._contents.keys())
+        for blob_sha, content in zip(to_read, read_git_objects(to_read)):
+            if content is not None:
+                self._contents[blob_sha] = TaskContent(content, self._version_cache)
+        return {
+            path: self._contents[blob_sha]
+            for path, blob_sha in blob_shas.items()
+            if blob_sha in self._contents
+        }
 
 
 def is_task_file(path: Path) -> bool:
-    """Does the path match the task/{task_name}/**/{task_name}.yaml format?"""
+    """Does the path match the task/{task_name}/**/{task_name}.yaml format?
+
+    Files in the NON_TASK_DIRS of task versions don't count, e.g. task/foo/0.1/tests/foo.yaml.
+    """
     match path.parts:
+        case ["task", _, _, non_task_dir, *_] if non_task_dir in NON_TASK_DIRS:
+            return False
         case ["task", task_dir, *_, task_file] if task_file.endswith(".yaml"):
             task_name = task_file.removesuffix(".yaml")
             return task_name == task_dir
@@ -66,11 +487,46 @@ def is_task_file(path: Path) -> bool:
             return False
 
 
+def filter_task_files(paths: Iterable[str]) -> list[str]:
+    """Pick the paths that match the task/{task_name}/**/{task_name}.yaml format.
+
+    A fast alternative to is_task_file() for large numbers of raw path strings (e.g. git output).
+    The paths must be normalized and use '/' as the separator.
+    """
+    task_file_match = _TASK_FILE_RE.fullmatch
+    return [p for p in paths if p.endswith(".yaml") and task_file_match(p)]
+
+
 @dataclass
 class TaskContent:
-    """The YAML content of a task file. Processed as raw text to avoid dependencies."""
+    """The YAML content of a task file. Processed as raw text to avoid dependencies.
 
-    content: str
+    The source can be the content itself or the path to the file. For paths, the version
+    lookup only reads the file up to the end of the metadata section, the full content
+    is read only when accessed.
+    """
+
+    source: str | Path
+    version_cache: VersionCache | None = field(default=None, compare=False, repr=False)
+    # The (version, line number) if already known, e.g. from the TaskIndex
+    known_version: tuple[str | None, int | None] | None = field(
+        default=None, compare=False, repr=False
+    )
+
+    @functools.cached_property
+    def data(self) -> bytes:
+        """The raw content, e.g. for hashing (no newline translation, unlike read_text())."""
+        if isinstance(self.source, Path):
+            data = self.source.read_bytes()
+            PROFILER.count("file_bytes_read", len(data))
+            return data
+        return self.source.encode()
+
+    @functools.cached_property
+    def content(self) -> str:
+        if isinstance(self.source, Path):
+            return self.data.decode()
+        return self.source
 
     @property
     def version(self) -> str | None:
@@ -89,23 +545,65 @@ class TaskContent:
 
     @functools.cached_property
     def _version_with_line_number(self) -> tuple[str | None, int | None]:
-        version_line_re = re.compile(
-            rf"""^\s*["']?{re.escape(VERSION_LABEL)}["']?\s*:\s*["']?([^"'\s#]+)"""
-        )
-        for i, line in enumerate(self.content.splitlines(), start=1):
-            if match := version_line_re.match(line):
-                version = match.group(1)
-                return version, i
+        if self.known_version is not None:
+            return self.known_version
+        if self.version_cache is None:
+            return self._find_version()
+
+        blob_sha = git_blob_sha(self.data)
+        if (cached := self.version_cache.get(blob_sha)) is not None:
+            return cached
+
+        version, line_number = self._find_version()
+        self.version_cache.put(blob_sha, version, line_number)
+        return version, line_number
+
+    def _find_version(self) -> tuple[str | None, int | None]:
+        with self._open_lines() as lines:
+            seen_metadata = False
+            for i, line in enumerate(lines, start=1):
+                # The substring check is much cheaper than the regex, skip most lines with it
+                if VERSION_LABEL in line and (match := _VERSION_LABEL_LINE_RE.match(line)):
+                    version = match.group(1)
+                    return version, i
+
+                if not line.strip() or line[0].isspace() or line.startswith(("#", "-")):
+                    continue
+                # A top-level key. The label can only be in metadata, stop once we get past it.
+                if seen_metadata:
+                    break
+                seen_metadata = line.startswith("metadata:")
 
         return None, None
 
+    @contextlib.contextmanager
+    def _open_lines(self) -> Iterator[Iterable[str]]:
+        if not isinstance(self.source, Path) or "data" in self.__dict__:
+            yield io.StringIO(self.content)
+            return
+
+        with _open_counting_bytes(self.source) as f:
+            yield f
+
+
+@contextlib.contextmanager
+def _open_counting_bytes(path: Path) -> Iterator[TextIO]:
+    """Open a text file, count the bytes read from it (when profiling) once it's closed."""
+    with path.open() as f:
+        try:
+            yield f
+        finally:
+            if PROFILER.enabled:
+                # Position of the underlying binary file: bytes, not decoded characters
+                PROFILER.count("file_bytes_read", f.buffer.tell())
+
 
 class VersionParseError(VersioningError, ValueError):
     """Invalid version string."""
 
 
-@dataclass(frozen=True)
 @functools.total_ordering
+@dataclass(frozen=True, slots=True, eq=False)
 class Version:
     """Represents x.y[.z] version numbers.
 
@@ -117,15 +615,22 @@ class Version:
     major: int
     minor: int
     patch: int | None = None
+    # The comparison key, computed once (versions get compared and sorted a lot)
+    _key: tuple[int, int, int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "_key", (self.major, self.minor, self.patch or 0))
 
-    def __lt__(self, other: Self) -> bool:
-        return self._tuple() < other._tuple()
+    def __lt__(self, other: Version) -> bool:
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self._key < other._key
 
     def __eq__(self, other: Any) -> bool:
-        return isinstance(other, Version) and self._tuple() == other._tuple()
+        return isinstance(other, Version) and self._key == other._key
 
     def __hash__(self) -> int:
-        return hash(self._tuple())
+        return hash(self._key)
 
     def __str__(self) -> str:
         s = f"{self.major}.{self.minor}"
@@ -135,76 +640,452 @@ class Version:
 
     @classmethod
     def parse(cls, version_str: str) -> Self:
-        if not re.fullmatch(r"\d+\.\d+(\.\d+)?", version_str):
+        match = _VERSION_RE.fullmatch(version_str)
+        if not match:
             raise VersionParseError(f"Invalid version: {version_str}")
 
-        parts = map(int, version_str.split("."))
-        return cls(*parts)
+        major, minor, patch = match.groups()
+        return cls(int(major), int(minor), int(patch) if patch is not None else None)
+
+
+# '## 0.2', also '## [0.2]' and '## 0.2 - 2025-01-01'
+_CHANGELOG_SECTION_RE = re.compile(r"## \[?(\d+\.\d+(?:\.\d+)?)\]?(?:\s|$)")
 
-    def _tuple(self) -> tuple[int, ...]:
-        return self.major, self.minor, self.patch or 0
 
+def find_changelog_section(lines: Iterable[str], version: Version) -> int | None:
+    """Find the line number of the '## {version}' heading in the lines of a CHANGELOG.md.
 
-FileStatus = Literal["added", "modified"]
+    Consumes the lines only up to the heading. The newest versions come first, so the search
+    also stops at the first heading of an older version.
+    """
+    for line_number, line in enumerate(lines, 1):
+        if not line.startswith("## "):
+            continue
+        match = _CHANGELOG_SECTION_RE.match(line)
+        if not match:
+            continue  # e.g. '## Unreleased'
+        section_version = Version.parse(match.group(1))
+        if section_version == version:
+            return line_number
+        if section_version < version:
+            return None
+    return None
+
+
+class ChangelogSections:
+    """Finds the version sections in CHANGELOG.md files, reading each file only from the top.
+
+    With a version_cache, remembers the results by the blob SHA of the file. Only for the files
+    whose SHA git already knows (unchanged since staged), hashing a file means reading all of it.
+    """
+
+    def __init__(
+        self,
+        blob_shas: Mapping[str, str] | None = None,
+        version_cache: VersionCache | None = None,
+    ) -> None:
+        self._blob_shas = blob_shas or {}
+        self._version_cache = version_cache
+
+    @classmethod
+    def for_changeset(cls, changeset: ChangeSet, version_cache: VersionCache | None) -> Self:
+        if version_cache is None:
+            return cls()
+        blob_shas = {
+            path: blob_sha
+            for path, blob_sha in read_index_blob_shas([":(glob)task/*/CHANGELOG.md"]).items()
+            if not changeset.is_dirty(Path(path))
+        }
+        return cls(blob_shas, version_cache)
+
+    def find(self, changelog_path: Path, version: Version) -> int | None:
+        """Find the line number of the section for the version. None if there's none."""
+        blob_sha = self._blob_shas.get(changelog_path.as_posix())
+        if blob_sha and self._version_cache:
+            if cached := self._version_cache.get_changelog_section(blob_sha, str(version)):
+                return cached[0]
+
+        with _open_counting_bytes(changelog_path) as f:
+            line_number = find_changelog_section(f, version)
+
+        if blob_sha and self._version_cache:
+            self._version_cache.put_changelog_section(blob_sha, str(version), line_number)
+        return line_number
+
+
+if TYPE_CHECKING:
+    FileStatus = Literal["added", "modified"]
 
 
 @dataclass(frozen=True)
 class ChangeSet:
     """Represents the relevant changes between current state and base ref."""
 
-    _changes: Mapping[Path, FileStatus]
+    # Keyed by the paths as reported by git, most of them are not going to be looked up
+    _changes: Mapping[str, FileStatus]
+    # The files whose working tree content differs from the git index (or that are untracked)
+    _dirty: frozenset[str] = frozenset()
 
     @classmethod
     def for_base_ref(cls, base_ref: str) -> Self:
-        # committed changes
-        diff_output = run_cmd(["git", "diff", "--name-status", f"{base_ref}...HEAD"])
-        # uncommitted changes (staged, unstaged, untracked)
-        status_output = run_cmd(["git", "status", "--porcelain"])
-
-        file_statuses: dict[Path, FileStatus] = {}
-
-        for line in diff_output.splitlines() + status_output.splitlines():
-            status, filepath, *_ = line.split()
-            filepath = Path(filepath)
+        return cls.from_changes(
+            cls.committed_changes(base_ref), cls.uncommitted_changes([Path("task")])
+        )
 
-            if "A" in status or status == "??":
+    @classmethod
+    def from_changes(
+        cls, committed: Iterable[tuple[str, str]], uncommitted: Iterable[tuple[str, str]]
+    ) -> Self:
+        """Make a ChangeSet from the (git status, path) pairs of the committed/uncommitted changes."""
+        uncommitted = list(uncommitted)
+        file_statuses: dict[str, FileStatus] = {}
+        for status, filepath in itertools.chain(committed, uncommitted):
+            if "A" in status or "R" in status or "C" in status or status == "??":
                 # ?? == untracked, treat as added
+                # R/C == renamed/copied, the new path is effectively an added file
                 file_statuses[filepath] = "added"
             elif "M" in status:
                 # The file may have been added in a commit and then modified in the working tree
                 # and/or index. Want to treat this as added => added takes precedence over modified.
                 file_statuses.setdefault(filepath, "modified")
-
-        return cls(file_statuses)
+        # <XY> statuses, Y is the working tree status. ' ' == same as in the index.
+        dirty = frozenset(filepath for status, filepath in uncommitted if status[1] != " ")
+        return cls(file_statuses, dirty)
+
+    # Only changes in the task/ directory are relevant, don't make git report anything else.
+    # NUL-separated output (-z) is unambiguous for any filename, no quoting or escaping.
+
+    @staticmethod
+    def committed_changes(base_ref: str) -> list[tuple[str, str]]:
+        """Get the (git status, path) pairs for the task files changed since base_ref in HEAD."""
+        changes = []
+        # records: <status> NUL <path> NUL, or <R|C><score> NUL <old path> NUL <new path> NUL
+        records = iter_nul_separated(
+            ["git", "diff", "--name-status", "-z", f"{base_ref}...HEAD", "--", "task"]
+        )
+        for status in records:
+            if status.startswith(("R", "C")):
+                next(records)  # skip the old path
+            changes.append((status, next(records)))
+        return changes
+
+    @staticmethod
+    def uncommitted_changes(paths: Iterable[Path]) -> list[tuple[str, str]]:
+        """Get the (git status, path) pairs for the staged, unstaged and untracked changes."""
+        changes = []
+        # records: <XY> <path> NUL, followed by <old path> NUL for renames/copies
+        records = iter_nul_separated(
+            ["git", "status", "--porcelain", "-z", "--untracked-files=all", "--", *map(str, paths)]
+        )
+        for record in records:
+            status, filepath = record[:2], record[3:]
+            if "R" in status or "C" in status:
+                next(records)  # skip the old path
+            changes.append((status, filepath))
+        return changes
 
     def status(self, path: Path) -> FileStatus | None:
-        return self._changes.get(path)
+        return self._changes.get(path.as_posix())
 
     def did_change(self, path: Path) -> bool:
-        return path in self._changes
+        return path.as_posix() in self._changes
+
+    def is_dirty(self, path: Path) -> bool:
+        return path.as_posix() in self._dirty
 
     def get_task_files(self) -> list[TaskFile]:
-        return [TaskFile(path) for path in self._changes if is_task_file(path)]
+        task_paths = sorted(map(Path, filter_task_files(self._changes)))
+        return [TaskFile(path) for path in task_paths]
 
 
-def list_task_files(paths: Iterable[Path]) -> list[TaskFile]:
+def list_task_files(
+    paths: Iterable[Path], task_index: TaskIndex | None = None
+) -> list[TaskFile]:
     """List the task files found in or under 'paths'.
 
     - Pick the paths that are regular files and match the task file path pattern
     - Recursively search for task files in paths that are directories
+      (look them up in the task_index instead, if provided)
     """
-    task_paths = []
+    task_files = []
     for path in paths:
+        PROFILER.count("stats")
         if path.is_dir():
-            task_paths.extend(filter(is_task_file, path.rglob("*.yaml")))
+            task_files.extend(_find_task_files(path, task_index))
         elif is_task_file(path):
-            task_paths.append(path)
+            task_files.append(task_index.lookup(path) if task_index else TaskFile(path))
+
+    task_files.sort(key=lambda task_file: task_file.path)
+    return task_files
+
+
+def group_task_files(
+    paths: Iterable[Path], task_index: TaskIndex | None = None
+) -> dict[Path, list[TaskFile]]:
+    """Find all the task files of the tasks in or under 'paths', grouped by task directory.
+
+    Unlike list_task_files, includes all the task files of a task even if 'paths' only
+    point to some of them. E.g. task/foo/0.1/foo.yaml => all of task/foo/**/foo.yaml.
+    Walks each directory only once (or looks the files up in the task_index, if provided).
+    """
+    walk_roots: set[Path] = set()
+    for path in paths:
+        PROFILER.count("stats")
+        if is_task_file(path) or (path.parts[:1] == ("task",) and path.is_dir()):
+            # Anything inside a task directory => the whole task directory
+            walk_roots.add(Path(*path.parts[:2]))
+        elif path.is_dir():
+            walk_roots.add(path)
+
+    # Don't walk the same subtree twice (e.g. for 'task/ task/foo')
+    walk_roots = {
+        root
+        for root in walk_roots
+        if not any(root != other and root.is_relative_to(other) for other in walk_roots)
+    }
+
+    task_files_by_dir: dict[Path, list[TaskFile]] = {}
+    for root in walk_roots:
+        for task_file in _find_task_files(root, task_index):
+            task_files_by_dir.setdefault(task_file.task_dir, []).append(task_file)
+
+    for task_files in task_files_by_dir.values():
+        task_files.sort(key=lambda task_file: task_file.path)
+
+    return dict(sorted(task_files_by_dir.items()))
+
+
+def _find_task_files(directory: Path, task_index: TaskIndex | None) -> Iterator[TaskFile]:
+    if task_index:
+        yield from task_index.task_files_under(directory)
+    else:
+        yield from map(TaskFile, filter(is_task_file, _find_yaml_files(directory)))
+
+
+def _find_yaml_files(directory: Path) -> Iterator[Path]:
+    for dirpath, dirnames, filenames in os.walk(directory):
+        PROFILER.count("dirs_walked")
+        _prune_non_task_dirs(dirpath, dirnames)
+        for filename in filenames:
+            if filename.endswith(".yaml"):
+                yield Path(dirpath, filename)
+
+
+def _prune_non_task_dirs(dirpath: str, dirnames: list[str]) -> None:
+    """Don't let os.walk() descend into the NON_TASK_DIRS of task versions."""
+    match Path(dirpath).parts:
+        case ["task", _, _]:
+            dirnames[:] = [dirname for dirname in dirnames if dirname not in NON_TASK_DIRS]
+
+
+def _is_non_task_dir(dir_path: str) -> bool:
+    """Is the directory one of the NON_TASK_DIRS of a task version?"""
+    match Path(dir_path).parts:
+        case ["task", _, _, dirname]:
+            return dirname in NON_TASK_DIRS
+        case _:
+            return False
+
+
+@dataclass(frozen=True)
+class TaskIndexEntry:
+    """Information about a task file, as recorded in the TaskIndex."""
+
+    path: Path
+    version: str | None
+    version_line: int | None
+    blob_sha: str
+    mtime_ns: int
+    size: int
+    has_changelog: bool
+    # The checks don't need these two, they're recorded for other tools that read the index
+    migrations: list[Path]
+    oci_ta_sibling: Path | None
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "path": self.path.as_posix(),
+            "version": self.version,
+            "version_line": self.version_line,
+            "blob_sha": self.blob_sha,
+            "mtime_ns": self.mtime_ns,
+            "size": self.size,
+            "has_changelog": self.has_changelog,
+            "migrations": [p.as_posix() for p in self.migrations],
+            "oci_ta_sibling": self.oci_ta_sibling.as_posix() if self.oci_ta_sibling else None,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> Self:
+        oci_ta_sibling = data["oci_ta_sibling"]
+        return cls(
+            path=Path(data["path"]),
+            version=data["version"],
+            version_line=data["version_line"],
+            blob_sha=data["blob_sha"],
+            mtime_ns=data["mtime_ns"],
+            size=data["size"],
+            has_changelog=data["has_changelog"],
+            migrations=[Path(p) for p in data["migrations"]],
+            oci_ta_sibling=Path(oci_ta_sibling) if oci_ta_sibling else None,
+        )
+
+
+class TaskIndex:
+    """On-disk index of all the task/{task_name}/**/{task_name}.yaml files in the repo.
+
+    The list of files comes from the git index ('git ls-files', tracked + untracked files),
+    not from walking the tree. On refresh, only the task files whose mtime or size changed
+    since the last refresh get re-read.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(
+        self, path: Path, entries: dict[Path, TaskIndexEntry], saved_at_ns: int = 0
+    ) -> None:
+        self.path = path
+        self.changed = False
+        self._entries = entries
+        self._saved_at_ns = saved_at_ns
+
+    @staticmethod
+    def default_path() -> Path:
+        return Path(run_cmd(["git", "rev-parse", "--git-path", "task-index.json"]).strip())
+
+    @classmethod
+    def load(cls, path: Path) -> Self:
+        """Load the index from 'path'. Start with an empty index if it's missing or outdated."""
+        import json
+
+        try:
+            data = json.loads(path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls(path, {})
+
+        if data.get("format_version") != cls.FORMAT_VERSION:
+            return cls(path, {})
+
+        entries = map(TaskIndexEntry.from_json, data["tasks"])
+        return cls(path, {entry.path: entry for entry in entries}, data["saved_at_ns"])
+
+    def save(self) -> None:
+        with PROFILER.span("save task index"):
+            self._save()
+
+    def _save(self) -> None:
+        import json
+
+        import time
+
+        saved_at_ns = time.time_ns()
+        data = {
+            "format_version": self.FORMAT_VERSION,
+            "saved_at_ns": saved_at_ns,
+            "tasks": [entry.to_json() for entry in self._entries.values()],
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(data, separators=(",", ":")))
+        tmp_path.replace(self.path)
+        self._saved_at_ns = saved_at_ns
+        self.changed = False
+
+    def refresh(self) -> int:
+        """Bring the index up to date with the working tree. Return the number of re-read files."""
+        with PROFILER.span("refresh task index"):
+            return self._refresh()
+
+    def _refresh(self) -> int:
+        ls_files_cmd = ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"]
+        # Keep these as strings, most of them are not task files (no need for Path objects)
+        repo_paths = set(iter_nul_separated([*ls_files_cmd, "--", "task"]))
+        # Deleted in the working tree, but still in the git index
+        repo_paths.difference_update(
+            iter_nul_separated(["git", "ls-files", "-z", "--deleted", "--", "task"])
+        )
+        migrations_by_dir: dict[str, list[Path]] = {}
+        for p in repo_paths:
+            version_dir, sep, _ = p.rpartition("/migrations/")
+            if sep:
+                migrations_by_dir.setdefault(version_dir, []).append(Path(p))
+
+        task_paths = sorted(map(Path, filter_task_files(repo_paths)))
+
+        entries: dict[Path, TaskIndexEntry] = {}
+        n_updated = 0
+
+        for path in task_paths:
+            PROFILER.count("stats")
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # deleted in the working tree, but not in the git index yet
+                continue
+
+            entry = self._entries.get(path)
+            # Like git, treat files modified at (or after) the time of the last save as "racily
+            # clean" - they could have changed again within the mtime granularity.
+            if (
+                entry is None
+                or entry.mtime_ns != stat.st_mtime_ns
+                or entry.size != stat.st_size
+                or stat.st_mtime_ns >= self._saved_at_ns
+            ):
+                task_content = TaskContent(path)
+                # Read the full content first, then the version lookup doesn't read the file again
+                blob_sha = git_blob_sha(task_content.data)
+                version, version_line = task_content.version, task_content.version_line
+                n_updated += 1
+            else:
+                version, version_line, blob_sha = entry.version, entry.version_line, entry.blob_sha
+
+            task_name = path.stem
+            oci_ta_name = f"{task_name}-oci-ta"
+            oci_ta_path = "/".join(["task", oci_ta_name, *path.parts[2:-1], f"{oci_ta_name}.yaml"])
+
+            entries[path] = TaskIndexEntry(
+                path=path,
+                version=version,
+                version_line=version_line,
+                blob_sha=blob_sha,
+                mtime_ns=stat.st_mtime_ns,
+                size=stat.st_size,
+                has_changelog=f"task/{task_name}/CHANGELOG.md" in repo_paths,
+                migrations=sorted(migrations_by_dir.get(path.parent.as_posix(), [])),
+                oci_ta_sibling=Path(oci_ta_path) if oci_ta_path in repo_paths else None,
+            )
+
+        self.changed = n_updated > 0 or entries.keys() != self._entries.keys()
+        self._entries = entries
+        return n_updated
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, path: Path) -> TaskFile:
+        return TaskFile(path, self._entries.get(path))
 
-    task_paths.sort()
-    return [TaskFile(p) for p in task_paths]
+    def task_files_under(self, directory: Path) -> Iterator[TaskFile]:
+        for path, entry in self._entries.items():
+            if path.is_relative_to(directory):
+                yield TaskFile(path, entry)
 
 
-ResultKind = Literal["info", "warning", "error"]
+def load_task_index(enabled: bool) -> TaskIndex | None:
+    """Load and refresh the task index (if enabled)."""
+    if not enabled:
+        return None
+    with PROFILER.span("load task index"):
+        task_index = TaskIndex.load(TaskIndex.default_path())
+        task_index.refresh()
+        if task_index.changed:
+            task_index.save()
+    return task_index
+
+
+if TYPE_CHECKING:
+    ResultKind = Literal["info", "warning", "error"]
 
 
 @dataclass(frozen=True)
@@ -222,7 +1103,7 @@ class Result:
         attrs = [f"file={self.path}"]
         if self.line is not None:
             attrs.append(f"line={self.line}")
-        elif self.path.is_file():
+        elif _is_file(self.path):
             # Need this anyway to make the result appear in the changed files view in the GitHub UI
             attrs.append("line=1")
 
@@ -248,77 +1129,592 @@ class Result:
 
         return f"{color}{self.kind.title()}{reset}: {':'.join(attrs)}: {self.message}"
 
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "message": self.message,
+            "path": self.path.as_posix(),
+            "line": self.line,
+        }
+
+
+@functools.cache
+def _is_file(path: Path) -> bool:
+    # Many results point to the same few paths, don't stat them over and over
+    PROFILER.count("stats")
+    return path.is_file()
+
+
+if TYPE_CHECKING:
+    OutputFormat = Literal["plain", "gh", "jsonl", "sarif"]
+
+
+class Reporter(abc.ABC):
+    """Writes results to an output stream in a specific format.
+
+    Buffers the output and writes it to the stream in large chunks. Note that sys.stderr
+    is line-buffered, writing each result directly would mean a write() syscall per result.
+    """
+
+    BUFFER_SIZE = 64 * 1024
+
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+        self.buffer_size = self.BUFFER_SIZE
+        self._buffer: list[str] = []
+        self._buffered_size = 0
+
+    @abc.abstractmethod
+    def report(self, result: Result) -> None:
+        """Write (or buffer) a single result."""
+
+    def finish(self) -> None:
+        self.flush()
+
+    def write(self, text: str) -> None:
+        self._buffer.append(text)
+        self._buffered_size += len(text)
+        if self._buffered_size >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        # Empty the buffer first, an interrupted write must not be repeated by finish()
+        text = "".join(self._buffer)
+        self._buffer.clear()
+        self._buffered_size = 0
+        with PROFILER.span("write output"):
+            self.stream.write(text)
+            self.stream.flush()
+
+
+class PlainReporter(Reporter):
+    def __init__(self, stream: TextIO, use_color: bool) -> None:
+        super().__init__(stream)
+        self.use_color = use_color
+
+    def report(self, result: Result) -> None:
+        self.write(result.format_plain(self.use_color) + "\n")
+
+
+class GitHubReporter(Reporter):
+    def report(self, result: Result) -> None:
+        self.write(result.format_gh() + "\n")
+
+
+class JsonLinesReporter(Reporter):
+    """Writes one JSON object per line, unbuffered (consumers get each result as it comes)."""
+
+    BUFFER_SIZE = 0
+
+    def __init__(self, stream: TextIO) -> None:
+        import json
+
+        super().__init__(stream)
+        self._dumps = json.dumps
+
+    def report(self, result: Result) -> None:
+        self.write(self._dumps(result.to_json()) + "\n")
+
+
+class SarifReporter(Reporter):
+    """Writes a SARIF 2.1.0 log. Streams the results as they come, one per line."""
+
+    _LEVELS = {"info": "note", "warning": "warning", "error": "error"}
+
+    def __init__(self, stream: TextIO) -> None:
+        import json
+
+        super().__init__(stream)
+        self._dumps = json.dumps
+        self._n_results = 0
+        header = {
+            "version": "2.1.0",
+            "$schema": "https://json.schemastore.org/sarif-2.1.0.json",
+            "runs": [
+                {
+                    "tool": {
+                        "driver": {
+                            "name": "versioning.py",
+                            "informationUri": "https://github.com/konflux-ci/task-repo-shared-ci",
+                        }
+                    },
+                    "results": [],
+                }
+            ],
+        }
+        # Split the document at the (empty) results array, fill it in as results come
+        self._head, self._tail = self._dumps(header).split('"results": []')
+        self.write(self._head + '"results": [')
+
+    def report(self, result: Result) -> None:
+        location: dict[str, Any] = {"artifactLocation": {"uri": result.path.as_posix()}}
+        if result.line is not None:
+            location["region"] = {"startLine": result.line}
+
+        sarif_result = {
+            "level": self._LEVELS[result.kind],
+            "message": {"text": result.message},
+            "locations": [{"physicalLocation": location}],
+        }
+        separator = ",\n" if self._n_results else "\n"
+        self.write(separator + self._dumps(sarif_result))
+        self._n_results += 1
+
+    def finish(self) -> None:
+        self.write("\n]" + self._tail + "\n")
+        super().finish()
+
+
+def make_reporter(output_format: OutputFormat) -> Reporter:
+    """Make a reporter for the format.
+
+    Human-readable formats go to stderr, machine-readable formats to stdout.
+    """
+    match output_format:
+        case "plain":
+            return PlainReporter(sys.stderr, use_color=sys.stderr.isatty())
+        case "gh":
+            return GitHubReporter(sys.stderr)
+        case "jsonl":
+            return JsonLinesReporter(sys.stdout)
+        case "sarif":
+            return SarifReporter(sys.stdout)
+
+
+class Watcher(abc.ABC):
+    """Watches a directory tree for file changes."""
+
+    @abc.abstractmethod
+    def wait(self) -> set[str]:
+        """Block until something changes, return the paths of the changed files and dirs.
+
+        Returning the root path itself means that anything could have changed.
+        """
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+class InotifyWatcher(Watcher):
+    """Watches a directory tree using inotify (Linux only). Skips the NON_TASK_DIRS of versions."""
+
+    # See inotify(7)
+    IN_MODIFY = 0x2
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_Q_OVERFLOW = 0x4000
+    IN_ISDIR = 0x40000000
+    IN_CLOEXEC = 0o2000000
+
+    EVENT_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    # Editors tend to save in several steps (write a temp file, rename it, ...). Collect the
+    # events until the tree has been quiet for this long, then report them as one change.
+    SETTLE_TIME = 0.02
+
+    def __init__(self, root: Path) -> None:
+        import ctypes
+
+        self.root = root
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: dict[int, str] = {}
+        try:
+            self._watch_tree(str(root))
+        except OSError:
+            self.close()
+            raise
+
+    def _watch_tree(self, directory: str) -> None:
+        import ctypes
+
+        for dirpath, dirnames, _ in os.walk(directory):
+            _prune_non_task_dirs(dirpath, dirnames)
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dirpath), self.EVENT_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {dirpath}")
+            self._dirs[wd] = dirpath
+
+    def wait(self) -> set[str]:
+        import select
+        import struct
+
+        changed: set[str] = set()
+        data = os.read(self._fd, 64 * 1024)
+        while True:
+            offset = 0
+            while offset < len(data):
+                # struct inotify_event { int wd; uint32_t mask, cookie, len; char name[]; }
+                wd, mask, _, name_len = struct.unpack_from("iIII", data, offset)
+                name = data[offset + 16 : offset + 16 + name_len].rstrip(b"\0")
+                offset += 16 + name_len
+                if mask & self.IN_Q_OVERFLOW:
+                    changed.add(str(self.root))
+                    continue
+                if wd not in self._dirs:
+                    continue  # the watch was removed along with its directory
+                path = os.path.join(self._dirs[wd], os.fsdecode(name))
+                changed.add(path)
+                new_dir = mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO)
+                if new_dir and not _is_non_task_dir(path):
+                    with contextlib.suppress(OSError):  # it may already be gone again
+                        self._watch_tree(path)
+            ready, _, _ = select.select([self._fd], [], [], self.SETTLE_TIME)
+            if not ready:
+                return changed
+            data = os.read(self._fd, 64 * 1024)
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher(Watcher):
+    """Watches a directory tree by comparing the file mtimes and sizes periodically.
+
+    Skips the NON_TASK_DIRS of versions.
+    """
+
+    def __init__(self, root: Path, interval: float = 0.5) -> None:
+        self.root = root
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        snapshot = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            _prune_non_task_dirs(dirpath, dirnames)
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                with contextlib.suppress(FileNotFoundError):
+                    stat = os.stat(path)
+                    snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self) -> set[str]:
+        import time
+
+        while True:
+            time.sleep(self.interval)
+            snapshot = self._scan()
+            old_snapshot, self._snapshot = self._snapshot, snapshot
+            changed = old_snapshot.keys() ^ snapshot.keys()
+            changed.update(
+                path
+                for path in snapshot.keys() & old_snapshot.keys()
+                if snapshot[path] != old_snapshot[path]
+            )
+            if changed:
+                return changed
+
+
+def make_watcher(root: Path, poll: bool = False) -> Watcher:
+    """Watch the root directory with inotify if possible, fall back to polling otherwise."""
+    if sys.platform == "linux" and not poll:
+        try:
+            return InotifyWatcher(root)
+        except OSError:
+            pass
+    return PollingWatcher(root)
+
 
 # --- CLI ---
 
 
-def check(base_ref: str = "main", paths: list[Path] | None = None) -> Iterator[Result]:
+def check(
+    base_ref: str = "main",
+    paths: list[Path] | None = None,
+    jobs: int | None = None,
+    cache: bool = False,
+    use_index: bool = False,
+    watch: bool = False,
+    poll: bool = False,
+) -> Iterator[Result]:
     """Check versioning requirements for tasks in the changeset."""
-    changeset = ChangeSet.for_base_ref(base_ref)
+    task_index = load_task_index(use_index)
+    with open_version_cache(cache) as version_cache:
+        if watch:
+            yield from _watch(base_ref, paths, jobs, version_cache, task_index, poll)
+        else:
+            yield from _check(base_ref, paths, jobs, version_cache, task_index)
+
+
+def _check(
+    base_ref: str,
+    paths: list[Path] | None,
+    jobs: int | None,
+    version_cache: VersionCache | None,
+    task_index: TaskIndex | None,
+) -> Iterator[Result]:
+    with PROFILER.span("get changeset"):
+        changeset = ChangeSet.for_base_ref(base_ref)
+
+    with PROFILER.span("list task files"):
+        if paths:
+            task_files = list_task_files(paths, task_index)
+        else:
+            task_files = changeset.get_task_files()
+            if task_index:
+                task_files = [task_index.lookup(task_file.path) for task_file in task_files]
+
+    # Read all the base versions up front, spawning one git process rather than one per file
+    with PROFILER.span("read base versions"):
+        base_contents = TaskFile.read_all_at_base_ref(
+            (tf for tf in task_files if changeset.status(tf.path) == "modified"),
+            base_ref,
+            version_cache,
+        )
+
+    yield from _check_task_files(
+        task_files, changeset, base_ref, base_contents, jobs, version_cache
+    )
+
+
+def _watch(
+    base_ref: str,
+    paths: list[Path] | None,
+    jobs: int | None,
+    version_cache: VersionCache | None,
+    task_index: TaskIndex | None,
+    poll: bool = False,
+) -> Iterator[Result]:
+    """Check the tasks, then re-check the task directories that change until interrupted (Ctrl+C).
+
+    Keeps the base ref state and the committed changes in memory, only asks git for the
+    uncommitted changes in the changed directories. Recomputes everything if HEAD or the
+    base ref moves (noticed on the next change in the task directories).
+    """
+    task_root = Path("task")
+    # Start watching first, so that nothing changes unnoticed during the initial check
+    with make_watcher(task_root, poll) as watcher:
+        base_tree: BaseRefTree | None = None
+        # None => all task directories
+        changed_dirs: set[Path] | None = None
+        head = base = None
+        committed_changes: list[tuple[str, str]] = []
+        uncommitted_changes: dict[str, str] = {}
+
+        while True:
+            # Files may have appeared or disappeared since the last check
+            _is_file.cache_clear()
+            with PROFILER.span("re-check" if base_tree else "check"):
+                current_head, current_base = run_cmd(["git", "rev-parse", "HEAD", base_ref]).split()
+                if current_base != base:
+                    base = current_base
+                    base_tree = BaseRefTree.load(base, version_cache)
+                    # The committed changes are relative to the base, recompute them too
+                    head = None
+                if current_head != head:
+                    head = current_head
+                    changed_dirs = None
+                    committed_changes = ChangeSet.committed_changes(base)
+
+                if changed_dirs is None:
+                    uncommitted_changes = {
+                        path: status
+                        for status, path in ChangeSet.uncommitted_changes([task_root])
+                    }
+                elif changed_dirs:
+                    for path in list(uncommitted_changes):
+                        if Path(*Path(path).parts[:2]) in changed_dirs:
+                            del uncommitted_changes[path]
+                    for status, path in ChangeSet.uncommitted_changes(sorted(changed_dirs)):
+                        uncommitted_changes[path] = status
+
+                changeset = ChangeSet.from_changes(
+                    committed_changes,
+                    [(status, path) for path, status in uncommitted_changes.items()],
+                )
+                task_files = _task_files_to_watch(paths, changeset, changed_dirs, task_index)
+                base_contents = base_tree.read_all(
+                    tf for tf in task_files if changeset.status(tf.path) == "modified"
+                )
+                yield from _check_task_files(
+                    task_files, changeset, base_ref, base_contents, jobs, version_cache
+                )
+
+            if changed_dirs is None:
+                message = (
+                    f"Checked {len(task_files)} task file(s). "
+                    "Watching for changes, press Ctrl+C to stop"
+                )
+            else:
+                changed = ", ".join(map(str, sorted(changed_dirs)))
+                message = f"Re-checked {len(task_files)} task file(s) after changes in {changed}"
+            yield Result("info", message, task_root)
+
+            # The index is only valid for the initial check, the files change from now on
+            task_index = None
+            changed_dirs = set()
+            for changed_path in map(Path, watcher.wait()):
+                if changed_path == task_root:
+                    changed_dirs = None
+                    break
+                # Any change in a task directory => re-check the whole task directory
+                changed_dirs.add(Path(*changed_path.parts[:2]))
+
+
+def _task_files_to_watch(
+    paths: list[Path] | None,
+    changeset: ChangeSet,
+    task_dirs: set[Path] | None,
+    task_index: TaskIndex | None,
+) -> list[TaskFile]:
+    """Pick the task files to check, out of the task_dirs (or all of them, if None)."""
+    if task_dirs is None:
+        if paths:
+            return list_task_files(paths, task_index)
+        return changeset.get_task_files()
+
+    def in_task_dirs(task_file: TaskFile) -> bool:
+        return Path(*task_file.path.parts[:2]) in task_dirs
+
     if paths:
-        task_files = list_task_files(paths)
-    else:
-        task_files = changeset.get_task_files()
+        return [
+            task_file
+            for task_file in list_task_files(task_dirs)
+            if any(task_file.path == path or task_file.path.is_relative_to(path) for path in paths)
+        ]
+    return list(filter(in_task_dirs, changeset.get_task_files()))
+
+
+def _check_task_files(
+    task_files: list[TaskFile],
+    changeset: ChangeSet,
+    base_ref: str,
+    base_contents: dict[Path, TaskContent],
+    jobs: int | None,
+    version_cache: VersionCache | None,
+) -> Iterator[Result]:
+    from concurrent.futures import ThreadPoolExecutor
+
+    if not task_files:
+        return
+
+    changelogs = ChangelogSections.for_changeset(changeset, version_cache)
+
+    def check_one(task_file: TaskFile) -> list[Result]:
+        base_content = base_contents.get(task_file.path)
+        with PROFILER.span("check task", path=str(task_file.path)):
+            return list(
+                _check_task_file(
+                    task_file, changeset, base_ref, base_content, changelogs, version_cache
+                )
+            )
+
+    # The checks are I/O-bound, threads are enough. Executor.map() preserves the input order,
+    # so the results come out in the same (sorted) order regardless of the number of workers.
+    with (
+        PROFILER.span("check tasks", n_tasks=len(task_files)),
+        ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor,
+    ):
+        for results in executor.map(check_one, task_files):
+            yield from results
+
+
+def _check_task_file(
+    task_file: TaskFile,
+    changeset: ChangeSet,
+    base_ref: str,
+    base_content: TaskContent | None,
+    changelogs: ChangelogSections,
+    version_cache: VersionCache | None,
+) -> Iterator[Result]:
+    status = changeset.status(task_file.path)
+    if not status:
+        yield Result(
+            "info",
+            f"File did not change between {base_ref} and HEAD, nothing to check",
+            task_file.path,
+        )
+        return
+
+    task_content = task_file.read(version_cache)
+    result_kind: ResultKind = "warning" if status == "modified" else "error"
+
+    version = None
+    try:
+        version = task_content.require_valid_version()
+    except VersioningError as e:
+        yield Result(result_kind, str(e), task_file.path, task_content.version_line)
+
+    changelog_path = task_file.task_dir / "CHANGELOG.md"
+    changelog_exists = task_file.changelog_exists()
+    if not changelog_exists:
+        yield Result(
+            result_kind,
+            f"CHANGELOG.md missing at {changelog_path}. Use '{SCRIPT_PATH} new-changelog {task_file.task_dir}' to create one.",
+            task_file.path,
+        )
+    # An unchanged CHANGELOG.md of a modified task gets its own warning below
+    elif (
+        version
+        and (status == "added" or changeset.did_change(changelog_path))
+        and changelogs.find(changelog_path, version) is None
+    ):
+        yield Result(
+            result_kind,
+            f"CHANGELOG.md at {changelog_path} has no section for version {version}. Please add a '## {version}' section.",
+            task_file.path,
+            task_content.version_line,
+        )
 
-    for task_file in task_files:
-        status = changeset.status(task_file.path)
-        if not status:
+    # For modified tasks, also check that the version label and the CHANGELOG.md changed
+    if status == "modified":
+        has_version = task_content.version is not None
+        if has_version and base_content and task_content.version == base_content.version:
             yield Result(
-                "info",
-                f"File did not change between {base_ref} and HEAD, nothing to check",
+                "warning",
+                f"{VERSION_LABEL} label is unchanged. CI pipeline may skip building the task.",
                 task_file.path,
+                task_content.version_line,
             )
-            continue
-
-        task_content = task_file.read()
-        result_kind: ResultKind = "warning" if status == "modified" else "error"
-
-        try:
-            task_content.require_valid_version()
-        except VersioningError as e:
-            yield Result(result_kind, str(e), task_file.path, task_content.version_line)
-
-        changelog_path = task_file.task_dir / "CHANGELOG.md"
-        changelog_exists = changelog_path.exists()
-        if not changelog_exists:
+        if changelog_exists and not changeset.did_change(changelog_path):
             yield Result(
-                result_kind,
-                f"CHANGELOG.md missing at {changelog_path}. Use '{SCRIPT_PATH} new-changelog {task_file.task_dir}' to create one.",
+                "warning",
+                f"CHANGELOG.md at {changelog_path} is unchanged. Please consider updating it.",
                 task_file.path,
             )
 
-        # For modified tasks, also check that the version label and the CHANGELOG.md changed
-        if status == "modified":
-            has_version = task_content.version is not None
-            if has_version and task_content.version == task_file.read_at_base_ref(base_ref).version:
-                yield Result(
-                    "warning",
-                    f"{VERSION_LABEL} label is unchanged. CI pipeline may skip building the task.",
-                    task_file.path,
-                    task_content.version_line,
-                )
-            if changelog_exists and not changeset.did_change(changelog_path):
-                yield Result(
-                    "warning",
-                    f"CHANGELOG.md at {changelog_path} is unchanged. Please consider updating it.",
-                    task_file.path,
-                )
-
 
-def new_changelog(paths: list[Path]) -> Iterator[Result]:
+def new_changelog(
+    paths: list[Path], cache: bool = False, use_index: bool = False
+) -> Iterator[Result]:
     """Create CHANGELOG.md for tasks that don't have one."""
-    task_dirs = {task_file.task_dir for task_file in list_task_files(paths)}
+    task_index = load_task_index(use_index)
+    with open_version_cache(cache) as version_cache:
+        yield from _new_changelog(paths, version_cache, task_index)
+
+
+def _new_changelog(
+    paths: list[Path], version_cache: VersionCache | None, task_index: TaskIndex | None
+) -> Iterator[Result]:
     max_version_by_task_dir: dict[Path, Version] = {}
 
+    with PROFILER.span("group task files"):
+        task_files_by_dir = group_task_files(paths, task_index)
+
     # Find highest version for each task
-    for task_dir in sorted(task_dirs):
+    for task_dir, task_files in task_files_by_dir.items():
         changelog_path = task_dir / "CHANGELOG.md"
-        if changelog_path.exists():
+        if task_files[0].changelog_exists():
             yield Result("info", f"{changelog_path} already exists, skipping", task_dir)
             continue
 
-        for task_file in list_task_files([task_dir]):
-            task_content = task_file.read()
+        for task_file in task_files:
+            task_content = task_file.read(version_cache)
             try:
                 version = task_content.require_valid_version()
             except VersioningError as e:
@@ -348,6 +1744,18 @@ def new_changelog(paths: list[Path]) -> Iterator[Result]:
         yield Result("info", f"Created CHANGELOG.md at {changelog_path}", task_dir)
 
 
+def index(rebuild: bool = False) -> Iterator[Result]:
+    """Build or refresh the task index."""
+    index_path = TaskIndex.default_path()
+    task_index = TaskIndex(index_path, {}) if rebuild else TaskIndex.load(index_path)
+    n_updated = task_index.refresh()
+    if task_index.changed:
+        task_index.save()
+    yield Result(
+        "info", f"Indexed {len(task_index)} task files ({n_updated} re-read)", index_path
+    )
+
+
 def _new_changelog_content(version: str, added_what: str) -> str:
     return textwrap.dedent(
         f"""\
@@ -375,47 +1783,141 @@ def make_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Versioning script for managing task versions")
     subcommands = parser.add_subparsers(title="subcommands", required=True)
 
+    common_parser = argparse.ArgumentParser(add_help=False)
+    common_parser.add_argument(
+        "--profile",
+        type=Path,
+        metavar="PATH",
+        help="Save timing and counters for this run to PATH (Chrome trace event format)",
+    )
+    common_parser.add_argument(
+        "--format",
+        choices=["plain", "gh", "jsonl", "sarif"],
+        default=None,
+        help=(
+            "Output format (default: gh in GitHub Actions, plain otherwise). "
+            "plain and gh write to stderr, jsonl and sarif write to stdout."
+        ),
+    )
+
     def set_command(
         subparser: argparse.ArgumentParser, cmd: Callable[..., Iterable[Result]]
     ) -> None:
         subparser.set_defaults(__cmd__=cmd)
 
-    check_parser = subcommands.add_parser("check", help="Check versioning requirements")
+    def add_index_option(subparser: argparse.ArgumentParser) -> None:
+        subparser.add_argument(
+            "--use-index",
+            action="store_true",
+            help="Find task files via the task index instead of walking the directory tree",
+        )
+
+    def add_cache_option(subparser: argparse.ArgumentParser) -> None:
+        subparser.add_argument(
+            "--cache",
+            action="store_true",
+            help=(
+                "Cache the versions parsed from task files, keyed by content hash "
+                f"(stored in {VersionCache.default_path()})"
+            ),
+        )
+
+    check_parser = subcommands.add_parser(
+        "check", help="Check versioning requirements", parents=[common_parser]
+    )
     check_parser.add_argument("--base-ref", default="main", help="Base git ref (default: main)")
+    check_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=_positive_int,
+        default=None,
+        help="Number of tasks to check in parallel (default: number of CPUs)",
+    )
+    check_parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running, re-check the task directories whenever their files change",
+    )
+    check_parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="With --watch, poll for changes instead of using inotify (e.g. on network mounts)",
+    )
     check_parser.add_argument(
         "paths", nargs="*", type=Path, metavar="path", help="Files/directories to handle"
     )
+    add_cache_option(check_parser)
+    add_index_option(check_parser)
     set_command(check_parser, check)
 
-    new_changelog_parser = subcommands.add_parser("new-changelog", help="Create CHANGELOG.md")
+    new_changelog_parser = subcommands.add_parser(
+        "new-changelog", help="Create CHANGELOG.md", parents=[common_parser]
+    )
     new_changelog_parser.add_argument(
         "paths", nargs="+", type=Path, metavar="path", help="Files/directories to handle"
     )
+    add_cache_option(new_changelog_parser)
+    add_index_option(new_changelog_parser)
     set_command(new_changelog_parser, new_changelog)
 
+    index_parser = subcommands.add_parser(
+        "index",
+        help="Build or refresh the task index (stored in the .git directory)",
+        parents=[common_parser],
+    )
+    index_parser.add_argument(
+        "--rebuild", action="store_true", help="Discard the existing index, build from scratch"
+    )
+    set_command(index_parser, index)
+
     return parser
 
 
+# Same as cli_args.positive_int, this script doesn't import it to stay a single file
+# (see dist/versioning.pyz in the Makefile)
+def _positive_int(value: str) -> int:
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer: {value}")
+    return n
+
+
 def main() -> int:
     """Run the CLI."""
     parser = make_parser()
     args = vars(parser.parse_args())
     cmd = args.pop("__cmd__")
 
-    results: Iterable[Result] = cmd(**args)
-    exitcode = 0
+    output_format = args.pop("format")
+    if not output_format:
+        output_format = "gh" if os.getenv("GITHUB_ACTIONS") == "true" else "plain"
 
-    in_gh_actions = os.getenv("GITHUB_ACTIONS") == "true"
-    stderr_is_tty = sys.stderr.isatty()
+    profile_path: Path | None = args.pop("profile")
+    if profile_path:
+        PROFILER.enable()
 
-    for result in results:
-        if in_gh_actions:
-            print(result.format_gh(), file=sys.stderr)
-        else:
-            print(result.format_plain(use_color=stderr_is_tty), file=sys.stderr)
+    results: Iterable[Result] = cmd(**args)
+    exitcode = 0
 
-        if result.kind == "error":
-            exitcode = 1
+    reporter = make_reporter(output_format)
+    watch = args.get("watch", False)
+    if watch:
+        # The results come in bursts, whenever something changes. Don't hold them back.
+        reporter.buffer_size = 0
+    try:
+        with PROFILER.span(cmd.__name__):
+            for result in results:
+                reporter.report(result)
+                if result.kind == "error":
+                    exitcode = 1
+    except KeyboardInterrupt:
+        # The way to stop watching
+        if not watch:
+            raise
+    finally:
+        reporter.finish()
+        if profile_path:
+            PROFILER.save(profile_path)
 
     return exitcode
 